@@ -0,0 +1,107 @@
+"""Throughput of POST /predictions/batch for JSON-lines and npz bodies.
+
+Starts the model consumer once per `--workers` value and scores a synthetic
+feature matrix around the scaler means, posted as JSON lines and as an npz archive.
+The producer is not involved. Reports scored vectors per second end to end,
+including request upload and reading the streamed results:
+
+    python -m benchmarks.batch_scoring --rows 200000 --workers 1,4
+"""
+import argparse
+import io
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import requests
+
+from services.entities.feature_matrix import FeatureMatrix
+
+from .harness import BenchmarkResult, format_table, run_benchmark
+from .load_driver import spawn
+
+_MODEL_DIR = Path(__file__).resolve().parent.parent / "model"
+
+
+def _synthetic_matrix(rows: int, sensors: int) -> FeatureMatrix:
+    with open(_MODEL_DIR / "hmm_config.pkl", "rb") as fh:
+        feature_cols = list(pickle.load(fh)["feature_cols"])
+    with open(_MODEL_DIR / "hmm_scaler.pkl", "rb") as fh:
+        scaler = pickle.load(fh)
+    matrix = FeatureMatrix.empty()
+    rng = np.random.default_rng(0)
+    values = np.zeros((rows, len(matrix.columns)), dtype=np.float64)
+    values[:, matrix.column_indices(feature_cols)] = scaler.mean_ + rng.normal(size=(rows, len(feature_cols))) * scaler.scale_
+    return FeatureMatrix(
+        sensor_ids=np.array([f"sensor-{idx % sensors:03d}" for idx in range(rows)], dtype=object),
+        timestamps=1_717_200_000 + np.arange(rows, dtype=np.int64) * 60,
+        values=values,
+    )
+
+
+def _npz(matrix: FeatureMatrix) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        columns=np.array(matrix.columns),
+        values=matrix.values,
+        sensor_ids=matrix.sensor_ids.astype(str),
+        timestamps=matrix.timestamps,
+    )
+    return buffer.getvalue()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="POST /predictions/batch throughput")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--sensors", type=int, default=100)
+    parser.add_argument("--chunk-rows", type=int, default=65536)
+    parser.add_argument("--workers", default="1", help="Comma-separated batch_workers values to compare")
+    parser.add_argument("--port", type=int, default=9320)
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    matrix = _synthetic_matrix(args.rows, args.sensors)
+    bodies = {
+        "ndjson": ("application/x-ndjson", "\n".join(json.dumps(record) for record in matrix.to_records()).encode()),
+        "npz": ("application/x-npz", _npz(matrix)),
+    }
+    url = f"http://127.0.0.1:{args.port}"
+    session = requests.Session()
+
+    results: List[BenchmarkResult] = []
+    for workers in args.workers.split(","):
+        env = dict(
+            os.environ,
+            FEATURE_PRODUCER_LOG_LEVEL="WARNING",
+            FEATURE_PRODUCER_BATCH_WORKERS=workers,
+            FEATURE_PRODUCER_BATCH_CHUNK_ROWS=str(args.chunk_rows),
+            FEATURE_PRODUCER_REQUEST_DEADLINE_SECONDS="0",
+        )
+        cmd = [
+            sys.executable, "-m", "uvicorn", "services.model_consumer.app:app",
+            "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning",
+        ]
+        with spawn(cmd, f"{url}/ready", env=env):
+            for name, (content_type, body) in bodies.items():
+
+                def score() -> None:
+                    response = session.post(f"{url}/predictions/batch", data=body, headers={"Content-Type": content_type}, stream=True)
+                    response.raise_for_status()
+                    scored = sum(1 for line in response.iter_lines() if line)
+                    if scored != args.rows:
+                        raise RuntimeError(f"Expected {args.rows} results, got {scored}")
+
+                results.append(run_benchmark(f"{name} workers={workers}", score, items_per_call=args.rows, iterations=args.iterations, warmup=1))
+
+    print(f"bodies: ndjson {len(bodies['ndjson'][1]) / 1e6:.1f} MB, npz {len(bodies['npz'][1]) / 1e6:.1f} MB, CPUs: {os.cpu_count()}")
+    print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
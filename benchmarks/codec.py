@@ -0,0 +1,89 @@
+"""Compare the batch codec with per-object JSON (+zlib) serialization of measurements.
+
+Encodes the flattened measurements of a synthetic payload with every codec and
+reports the encoded size and encode/decode throughput (measurements per second):
+
+    python -m benchmarks.codec --sensors 50 --window-hours 24
+"""
+import argparse
+import json
+import sys
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.entities.sensor import Sensor
+from services.feature_producer.batch_codec import BatchCodec
+from services.feature_producer.measurement_parser import flatten_measurements
+from services.feature_producer.sensor_serializer import SensorSerializer
+
+from .harness import BenchmarkResult, format_table, run_benchmark
+from .payload_generator import PayloadConfig, PayloadGenerator
+
+
+def _per_object(serializer: SensorSerializer, sensors: Sequence[Sensor]) -> Tuple[Callable[[], object], Callable[[], object], int]:
+    encoded = [serializer.serialize(sensor) for sensor in sensors]
+    return (
+        lambda: [serializer.serialize(sensor) for sensor in sensors],
+        lambda: [serializer.deserialize(payload) for payload in encoded],
+        sum(len(payload) for payload in encoded),
+    )
+
+
+def _json_batch(sensors: Sequence[Sensor]) -> Tuple[Callable[[], object], Callable[[], object], int]:
+    def encode() -> bytes:
+        return zlib.compress(json.dumps([sensor.model_dump(by_alias=True) for sensor in sensors]).encode("utf-8"))
+
+    encoded = encode()
+    return encode, lambda: [Sensor.model_validate(item) for item in json.loads(zlib.decompress(encoded))], len(encoded)
+
+
+def _batch(codec: BatchCodec, sensors: Sequence[Sensor], columnar: bool) -> Tuple[Callable[[], object], Callable[[], object], int]:
+    encoded = codec.encode(sensors)
+    decode = (lambda: codec.decode_series(encoded)) if columnar else (lambda: codec.decode(encoded))
+    return lambda: codec.encode(sensors), decode, len(encoded)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch codec vs. per-object JSON serialization")
+    parser.add_argument("--sensors", type=int, default=PayloadConfig.sensor_count)
+    parser.add_argument("--window-hours", type=float, default=24.0)
+    parser.add_argument("--interval", type=int, default=PayloadConfig.interval_seconds, help="Sampling interval in seconds")
+    parser.add_argument("--missing-rate", type=float, default=PayloadConfig.missing_rate)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    config = PayloadConfig(
+        sensor_count=args.sensors,
+        window_seconds=int(args.window_hours * 3600),
+        interval_seconds=args.interval,
+        missing_rate=args.missing_rate,
+    )
+    sensors = flatten_measurements(PayloadGenerator(config).generate())
+    codec = BatchCodec()
+    codecs: Dict[str, Tuple[Callable[[], object], Callable[[], object], int]] = {
+        "json per object": _per_object(SensorSerializer(), sensors),
+        "json+zlib per object": _per_object(SensorSerializer(compress=True), sensors),
+        "json+zlib whole batch": _json_batch(sensors),
+        "batch codec": _batch(codec, sensors, columnar=False),
+        "batch codec (columns)": _batch(codec, sensors, columnar=True),
+    }
+
+    results: List[BenchmarkResult] = []
+    sizes: Dict[str, int] = {}
+    for name, (encode, decode, size) in codecs.items():
+        sizes[name] = size
+        results.append(run_benchmark(f"{name} encode", encode, items_per_call=len(sensors), iterations=args.iterations))
+        results.append(run_benchmark(f"{name} decode", decode, items_per_call=len(sensors), iterations=args.iterations))
+
+    print(f"{len(sensors)} measurements of {args.sensors} sensors")
+    print(f"{'codec':<28} {'bytes':>12} {'bytes/item':>12} {'ratio':>8}")
+    reference = sizes["json+zlib per object"]
+    for name, size in sizes.items():
+        print(f"{name:<28} {size:>12} {size / len(sensors):>12.2f} {reference / size:>7.1f}x")
+    print()
+    print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
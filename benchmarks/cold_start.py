@@ -0,0 +1,92 @@
+"""Measure how long each service takes from process start until it is ready.
+
+For every service this reports the import time of its app module, the time until
+`/health` answers (port bound) and until `/ready` passes (warm-up finished), and
+fails when readiness exceeds the startup budget:
+
+    python -m benchmarks.cold_start --runs 3 --budget 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from services.settings import get_settings
+
+SERVICES = {
+    "feature-producer": "services.feature_producer.app",
+    "model-consumer": "services.model_consumer.app",
+}
+
+
+def measure_import(module: str, env: Dict[str, str]) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_startup(module: str, port: int, env: Dict[str, str], timeout: float) -> Tuple[float, float, Optional[float]]:
+    """Return (seconds to /health, seconds to /ready, startup seconds reported by the service)."""
+    base_url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", f"{module}:app"]
+    started = time.perf_counter()
+    with tempfile.TemporaryFile() as log_file:
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=log_file)
+        try:
+            healthy_after: Optional[float] = None
+            while time.perf_counter() - started < timeout:
+                try:
+                    if healthy_after is None and requests.get(f"{base_url}/health", timeout=1).ok:
+                        healthy_after = time.perf_counter() - started
+                    if healthy_after is not None:
+                        response = requests.get(f"{base_url}/ready", timeout=1)
+                        if response.ok:
+                            return healthy_after, time.perf_counter() - started, response.json().get("startup_seconds")
+                        if response.json().get("status") == "failed":
+                            raise RuntimeError(f"Warm-up failed: {response.json().get('detail')}")
+                except requests.exceptions.ConnectionError:
+                    pass
+                time.sleep(0.02)
+            raise RuntimeError(f"{module} was not ready within {timeout:.0f}s")
+        except RuntimeError:
+            log_file.seek(0)
+            sys.stderr.write(log_file.read().decode(errors="replace"))
+            raise
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import-to-ready time of both services")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--budget", type=float, default=None, help="Seconds; defaults to FEATURE_PRODUCER_STARTUP_BUDGET_SECONDS")
+    args = parser.parse_args(argv)
+    budget = args.budget or get_settings().startup_budget_seconds
+    env = dict(os.environ, FEATURE_PRODUCER_LOG_LEVEL="WARNING")
+
+    print(f"{'service':<18}{'import s':>10}{'health s':>10}{'ready s':>10}{'reported s':>12}")
+    print("-" * 60)
+    over_budget = False
+    for name, module in SERVICES.items():
+        for _ in range(args.runs):
+            imported = measure_import(module, env)
+            healthy, ready, reported = measure_startup(module, args.port, env, args.timeout)
+            over_budget |= ready > budget
+            reported_text = f"{reported:.2f}" if reported is not None else "-"
+            print(f"{name:<18}{imported:>10.2f}{healthy:>10.2f}{ready:>10.2f}{reported_text:>12}")
+    print(f"budget: {budget:.0f}s -> {'EXCEEDED' if over_budget else 'ok'}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Local stand-in for the HM-Sense open data API used for load testing.
+
+Serves the endpoints `APIClient` calls with generated (or recorded) payloads and
+injects configurable latency and errors:
+
+    python -m benchmarks.fake_hm_sense --port 9000 --sensors 100 --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from .payload_generator import MEASUREMENT_TYPES, PayloadConfig, PayloadGenerator
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+@dataclass(frozen=True)
+class FakeServerConfig:
+    payload: PayloadConfig = PayloadConfig()
+    latency_distribution: str = "lognormal"
+    latency_ms: float = 50.0
+    latency_spread: float = 0.5
+    error_rate: float = 0.0
+    error_status: int = 503
+    recorded_payload: Optional[Path] = None
+    seed: int = 0
+
+
+class LatencyModel:
+    """Samples per-request delays; `spread` is sigma for lognormal and +/- fraction for uniform."""
+
+    def __init__(self, distribution: str, median_ms: float, spread: float, seed: int = 0) -> None:
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}; expected one of {LATENCY_DISTRIBUTIONS}")
+        self.distribution = distribution
+        self.median_ms = median_ms
+        self.spread = spread
+        self._rng = random.Random(seed)
+
+    def sample_seconds(self) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        if self.distribution == "fixed":
+            delay = self.median_ms
+        elif self.distribution == "uniform":
+            delay = self.median_ms * self._rng.uniform(1.0 - self.spread, 1.0 + self.spread)
+        else:
+            delay = self._rng.lognormvariate(0.0, self.spread) * self.median_ms
+        return max(delay, 0.0) / 1000.0
+
+
+class PayloadSource:
+    """Produces measurement blocks for a window, from a recording or the generator."""
+
+    def __init__(self, config: FakeServerConfig) -> None:
+        self.config = config
+        self._recorded: Optional[List[Dict[str, Any]]] = None
+        if config.recorded_payload is not None:
+            raw = json.loads(Path(config.recorded_payload).read_text())
+            self._recorded = raw.get("responseData", []) if isinstance(raw, dict) else raw
+        self._cached_blocks = lru_cache(maxsize=32)(self._generate_blocks)
+
+    def sensor_ids(self) -> List[str]:
+        if self._recorded is not None:
+            return [block["sensorId"] for block in self._recorded]
+        return PayloadGenerator(self.config.payload).sensor_ids()
+
+    def blocks(self, start: Optional[int], end: Optional[int]) -> List[Dict[str, Any]]:
+        if self._recorded is not None:
+            return self._recorded
+        window_end = end if end is not None else self.config.payload.end
+        window_start = start if start is not None else window_end - self.config.payload.window_seconds
+        # Round to the minute so repeated "latest" requests hit the cache.
+        return self._cached_blocks(window_start // 60 * 60, window_end // 60 * 60)
+
+    def _generate_blocks(self, start: int, end: int) -> List[Dict[str, Any]]:
+        payload_config = replace(self.config.payload, end=end, window_seconds=max(end - start, 60))
+        return PayloadGenerator(payload_config).blocks()
+
+
+def _project(blocks: List[Dict[str, Any]], sensor_type: str) -> List[Dict[str, Any]]:
+    if sensor_type not in MEASUREMENT_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown sensor type {sensor_type}")
+    return [
+        {
+            "sensorId": block["sensorId"],
+            "measurements": [
+                {"timestamp": item["timestamp"], sensor_type: item[sensor_type]}
+                for item in block["measurements"]
+                if sensor_type in item
+            ],
+        }
+        for block in blocks
+    ]
+
+
+def _select(blocks: List[Dict[str, Any]], sensor_id: str) -> List[Dict[str, Any]]:
+    selected = [block for block in blocks if block["sensorId"] == sensor_id]
+    if not selected:
+        raise HTTPException(status_code=404, detail=f"Unknown sensor {sensor_id}")
+    return selected
+
+
+def create_app(config: Optional[FakeServerConfig] = None) -> FastAPI:
+    config = config or FakeServerConfig()
+    source = PayloadSource(config)
+    latency = LatencyModel(config.latency_distribution, config.latency_ms, config.latency_spread, config.seed)
+    error_rng = random.Random(config.seed + 1)
+
+    app = FastAPI(title="Fake HM Sense API")
+
+    async def simulate() -> None:
+        await asyncio.sleep(latency.sample_seconds())
+        if config.error_rate and error_rng.random() < config.error_rate:
+            raise HTTPException(status_code=config.error_status, detail="Injected upstream failure")
+
+    @app.get("/roomclimate/sensors")
+    async def sensors() -> JSONResponse:
+        await simulate()
+        return JSONResponse(source.sensor_ids())
+
+    @app.get("/roomclimate/measurements/all")
+    async def all_measurements(start: Optional[int] = Query(None), end: Optional[int] = Query(None), format: str = "json"):
+        await simulate()
+        return JSONResponse({"responseData": source.blocks(start, end)})
+
+    @app.get("/roomclimate/measurements/all/{sensor_type}")
+    async def all_measurements_by_type(
+        sensor_type: str, start: Optional[int] = Query(None), end: Optional[int] = Query(None), format: str = "json"
+    ):
+        await simulate()
+        return JSONResponse({"responseData": _project(source.blocks(start, end), sensor_type)})
+
+    @app.get("/roomclimate/measurements/{sensor_id}")
+    async def sensor_measurements(
+        sensor_id: str, start: Optional[int] = Query(None), end: Optional[int] = Query(None), format: str = "json"
+    ):
+        await simulate()
+        return JSONResponse({"responseData": _select(source.blocks(start, end), sensor_id)})
+
+    @app.get("/roomclimate/measurements/{sensor_id}/{sensor_type}")
+    async def sensor_measurements_by_type(
+        sensor_id: str,
+        sensor_type: str,
+        start: Optional[int] = Query(None),
+        end: Optional[int] = Query(None),
+        format: str = "json",
+    ):
+        await simulate()
+        blocks = _select(source.blocks(start, end), sensor_id)
+        return JSONResponse({"responseData": _project(blocks, sensor_type)})
+
+    @app.get("/metadata")
+    async def metadata() -> PlainTextResponse:
+        await simulate()
+        return PlainTextResponse(
+            "Fake HM Sense API\nmeasurement types: " + ", ".join(MEASUREMENT_TYPES) + "\n"
+        )
+
+    return app
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Fake HM Sense API for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--sensors", type=int, default=PayloadConfig.sensor_count)
+    parser.add_argument("--interval", type=int, default=PayloadConfig.interval_seconds)
+    parser.add_argument("--missing-rate", type=float, default=PayloadConfig.missing_rate)
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Median injected latency")
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--recorded-payload", type=Path, help="Serve a recorded measurements/all JSON response")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def config_from_args(args: argparse.Namespace) -> FakeServerConfig:
+    return FakeServerConfig(
+        payload=PayloadConfig(
+            sensor_count=args.sensors,
+            interval_seconds=args.interval,
+            missing_rate=args.missing_rate,
+            seed=args.seed or PayloadConfig.seed,
+        ),
+        latency_distribution=args.latency_distribution,
+        latency_ms=args.latency_ms,
+        latency_spread=args.latency_spread,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        recorded_payload=args.recorded_payload,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    import uvicorn
+
+    args = build_arg_parser().parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
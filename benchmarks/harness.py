@@ -0,0 +1,83 @@
+import gc
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    name: str
+    iterations: int
+    items_per_call: int
+    throughput_per_s: float
+    p50_ms: float
+    p99_ms: float
+    peak_memory_kib: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def run_benchmark(
+    name: str,
+    func: Callable[[], Any],
+    items_per_call: int,
+    iterations: int = 20,
+    warmup: int = 2,
+) -> BenchmarkResult:
+    """Time `func` repeatedly, then measure its peak allocation in a separate traced run.
+
+    Memory is traced in its own call because tracemalloc slows down every
+    allocation and would distort the latency samples.
+    """
+    for _ in range(warmup):
+        func()
+
+    samples: List[float] = []
+    gc.collect()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total = sum(samples)
+    return BenchmarkResult(
+        name=name,
+        iterations=iterations,
+        items_per_call=items_per_call,
+        throughput_per_s=(items_per_call * iterations / total) if total else 0.0,
+        p50_ms=statistics.median(samples) * 1000,
+        p99_ms=percentile(samples, 99) * 1000,
+        peak_memory_kib=peak / 1024,
+    )
+
+
+def format_table(results: List[BenchmarkResult]) -> str:
+    header = f"{'benchmark':<28} {'items':>8} {'items/s':>12} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result.name:<28} {result.items_per_call:>8} {result.throughput_per_s:>12.1f} "
+            f"{result.p50_ms:>10.2f} {result.p99_ms:>10.2f} {result.peak_memory_kib:>10.1f}"
+        )
+    return "\n".join(lines)
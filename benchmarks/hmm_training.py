@@ -0,0 +1,72 @@
+"""Wall-clock time of the offline HMM training, serial vs. parallel.
+
+Generates a synthetic measurement history, builds the feature history and fits
+all candidates once per `--workers` value. Reports both stages and the speedup
+over `--workers 1`, which featurizes and fits serially in this process:
+
+    python -m benchmarks.hmm_training --sensors 20 --days 3 --workers 1,4
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+from typing import Dict, List, Optional
+
+from services.feature_producer.measurement_parser import flatten_measurements
+from services.model_training.history import build_matrix, featurizer_for
+from services.model_training.trainer import HMMTrainer, TrainingConfig, parse_states
+
+from .payload_generator import PayloadConfig, PayloadGenerator
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serial vs. parallel HMM training")
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--days", type=float, default=3)
+    parser.add_argument("--interval", type=int, default=300, help="Seconds between measurements")
+    parser.add_argument("--states", default="3-6")
+    parser.add_argument("--restarts", type=int, default=2)
+    parser.add_argument("--n-iter", type=int, default=50)
+    parser.add_argument("--workers", default="1,4", help="Comma-separated worker counts; the first is the baseline")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    warnings.simplefilter("ignore")
+
+    config = TrainingConfig(candidate_states=parse_states(args.states), restarts=args.restarts, n_iter=args.n_iter)
+    featurizer = featurizer_for(config.feature_cols)
+    window = int(args.days * 24 * 60 * 60)
+    payload = PayloadConfig(sensor_count=args.sensors, window_seconds=window, interval_seconds=args.interval)
+    sensors = flatten_measurements(PayloadGenerator(payload).generate())
+    start = payload.end - window + featurizer.max_lookback_seconds
+
+    timings: Dict[int, Dict[str, float]] = {}
+    selected: Dict[int, str] = {}
+    for workers in (int(value) for value in args.workers.split(",")):
+        started = time.perf_counter()
+        matrix = build_matrix(featurizer, sensors, start, payload.end, workers)
+        featurized = time.perf_counter() - started
+        result = HMMTrainer(config, workers=workers).fit(matrix)
+        timings[workers] = {"featurize": featurized, "fit": result.wall_seconds, "total": featurized + result.wall_seconds}
+        selected[workers] = f"{result.best.n_states} states, seed {result.best.seed}"
+
+    baseline = timings[next(iter(timings))]
+    print(
+        f"{len(sensors)} measurements, {len(matrix)} feature vectors, "
+        f"{len(HMMTrainer(config).candidates())} candidates, CPUs: {os.cpu_count()}"
+    )
+    header = f"{'workers':>7} {'featurize s':>12} {'fit s':>8} {'total s':>8} {'speedup':>8}  selected"
+    print(header)
+    print("-" * len(header))
+    for workers, timing in timings.items():
+        speedup = baseline["total"] / timing["total"] if timing["total"] else float("nan")
+        print(
+            f"{workers:>7} {timing['featurize']:>12.2f} {timing['fit']:>8.2f} {timing['total']:>8.2f} "
+            f"{speedup:>7.2f}x  {selected[workers]}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Per-request cost of the JSON response paths with and without `fast_json_responses`.
+
+Serves precomputed latest feature vectors through the real `/api/feature-vectors`
+route and scores them through the real `/predictions` route, once validating
+against the response models (default) and once with the fast path. Upstream
+fetching and featurization are stubbed out, so the numbers show what encoding,
+decoding and validation cost per request:
+
+    python -m benchmarks.json_responses --sensors 100,1000
+"""
+import argparse
+import sys
+import time
+import warnings
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+from fastapi.testclient import TestClient
+
+from services.entities.feature_matrix_result import FeatureMatrixResult
+from services.feature_producer import feature_endpoint
+from services.feature_producer.api_client import APIClient
+from services.feature_producer.app import app as producer_app
+from services.feature_producer.featurizer import Featurizer
+from services.feature_producer.measurement_parser import flatten_measurements
+from services.model_consumer import prediction_endpoint
+from services.model_consumer.app import app as consumer_app
+from services.model_consumer.feature_vector_client import FeatureVectorClient
+from services.model_consumer.model_consumer import HMMPredictor
+from services.settings import get_settings
+from services.utils import fast_json
+
+from .harness import BenchmarkResult, format_table, run_benchmark
+from .payload_generator import PayloadConfig, PayloadGenerator
+
+_PRODUCER_URL = "http://producer.invalid/api"
+
+
+class _StaticAdapter(requests.adapters.BaseAdapter):
+    """Answers every request with the same producer body, so the client decodes it without a network."""
+
+    def __init__(self, body: bytes) -> None:
+        super().__init__()
+        self.body = body
+
+    def send(self, request, **kwargs) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.body
+        response.headers["Content-Type"] = "application/json"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def _latest_vectors(sensor_count: int) -> FeatureMatrixResult:
+    config = PayloadConfig(sensor_count=sensor_count, window_seconds=3600, interval_seconds=300)
+    sensors = flatten_measurements(PayloadGenerator(config).generate())
+    matrix = Featurizer().extract_matrix(sensors)
+    # The last vector of each sensor, as returned for the latest window.
+    last = len(matrix) - 1 - np.unique(matrix.sensor_ids[::-1].astype(str), return_index=True)[1]
+    return FeatureMatrixResult(
+        feature_matrix=matrix.take(np.sort(last)),
+        current_sensors=feature_endpoint.FeatureEndpoint._latest_measurements(sensors, None),
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Response model validation vs. the fast JSON path")
+    parser.add_argument("--sensors", default="100,1000", help="Comma-separated sensor counts")
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    with warnings.catch_warnings():
+        # The shipped artifacts may have been pickled with another scikit-learn release.
+        warnings.simplefilter("ignore")
+        predictor = HMMPredictor()
+    producer_endpoint = feature_endpoint.FeatureEndpoint(APIClient(base_url="http://upstream.invalid"), Featurizer())
+    producer = TestClient(producer_app)
+    consumer = TestClient(consumer_app)
+    producer_app.dependency_overrides[feature_endpoint.get_endpoint] = lambda: producer_endpoint
+
+    results: List[BenchmarkResult] = []
+    cpu_ms: Dict[str, float] = {}
+    for count in (int(value) for value in args.sensors.split(",")):
+        vectors = _latest_vectors(count)
+        producer_endpoint.cached_vectors = lambda **kwargs: vectors
+        for label, fast in (("validated", False), ("fast", True)):
+            settings.fast_json_responses = fast
+            body = producer.get("/api/feature-vectors").content
+            client = FeatureVectorClient(base_url=_PRODUCER_URL, settings=settings)
+            client.session.mount(_PRODUCER_URL, _StaticAdapter(body))
+            endpoint = prediction_endpoint.PredictionEndpoint(client, predictor)
+            consumer_app.dependency_overrides[prediction_endpoint.get_endpoint] = lambda: endpoint
+            cases = {
+                f"{count} producer {label}": lambda: producer.get("/api/feature-vectors"),
+                f"{count} client decode {label}": lambda: client._request(_PRODUCER_URL, {}),
+                f"{count} consumer {label}": lambda: consumer.get("/predictions", params={"end": 1_717_408_800}),
+            }
+            for name, func in cases.items():
+                results.append(run_benchmark(name, func, items_per_call=count, iterations=args.iterations))
+                started = time.process_time()
+                for _ in range(args.iterations):
+                    func()
+                cpu_ms[name] = (time.process_time() - started) * 1000 / args.iterations
+    settings.fast_json_responses = False
+
+    print(f"JSON encoder: {'orjson' if fast_json.orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'case':<36} {'CPU ms/request':>15}")
+    for name, value in cpu_ms.items():
+        print(f"{name:<36} {value:>15.2f}")
+    print()
+    print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
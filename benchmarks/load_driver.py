@@ -0,0 +1,207 @@
+"""End-to-end load test of both services against the fake HM-Sense API.
+
+Starts the fake API, the feature producer and the model consumer as local
+uvicorn processes (unless `--no-spawn` is given), drives concurrent traffic
+against each endpoint and reports throughput and tail latency per endpoint:
+
+    python -m benchmarks.load_driver --concurrency 8 --duration 30 --latency-ms 80
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import requests
+
+from .harness import percentile
+from .payload_generator import PayloadConfig, PayloadGenerator
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+
+@dataclass(frozen=True)
+class Target:
+    name: str
+    url: str
+    params: Dict[str, str]
+
+
+def wait_until_healthy(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Service at {url} did not become healthy within {timeout:.0f}s")
+
+
+@contextmanager
+def spawn(command: Sequence[str], health_url: str, env: Dict[str, str]) -> Iterator[subprocess.Popen]:
+    # Service logs go to a temp file so a full pipe can never block the process under load.
+    log_file = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=log_file)
+    try:
+        try:
+            wait_until_healthy(health_url)
+        except RuntimeError:
+            process.terminate()
+            process.wait(timeout=10)
+            log_file.seek(0)
+            sys.stderr.write(log_file.read().decode(errors="replace"))
+            raise
+        yield process
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log_file.close()
+
+
+def drive(targets: Sequence[Target], concurrency: int, duration: float, timeout: float) -> Dict[str, EndpointStats]:
+    stats: Dict[str, EndpointStats] = {target.name: EndpointStats() for target in targets}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(offset: int) -> None:
+        session = requests.Session()
+        idx = offset
+        while time.monotonic() < stop_at:
+            target = targets[idx % len(targets)]
+            idx += 1
+            started = time.perf_counter()
+            try:
+                response = session.get(target.url, params=target.params, timeout=timeout)
+                error = None if response.ok else str(response.status_code)
+            except requests.exceptions.RequestException as exc:
+                error = type(exc).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                entry = stats[target.name]
+                entry.latencies.append(elapsed)
+                if error:
+                    entry.errors[error] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def format_report(stats: Dict[str, EndpointStats], duration: float) -> str:
+    header = f"{'endpoint':<30} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  errors"
+    lines = [header, "-" * len(header)]
+    for name, entry in stats.items():
+        errors = ", ".join(f"{code}={count}" for code, count in sorted(entry.errors.items())) or "-"
+        lines.append(
+            f"{name:<30} {entry.requests:>9} {entry.requests / duration:>8.1f} "
+            f"{percentile(entry.latencies, 50) * 1000:>9.1f} {percentile(entry.latencies, 95) * 1000:>9.1f} "
+            f"{percentile(entry.latencies, 99) * 1000:>9.1f}  {errors}"
+        )
+    return "\n".join(lines)
+
+
+def build_targets(producer_url: str, consumer_url: str, sensor_id: str) -> List[Target]:
+    return [
+        Target("producer /api/feature-vectors", f"{producer_url}/api/feature-vectors", {}),
+        Target("producer ?sensor_id", f"{producer_url}/api/feature-vectors", {"sensor_id": sensor_id}),
+        Target("consumer /predictions", f"{consumer_url}/predictions", {}),
+        Target("consumer ?sensor_id", f"{consumer_url}/predictions", {"sensor_id": sensor_id}),
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test both services against the fake HM Sense API")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of traffic")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--no-spawn", action="store_true", help="Use already running services")
+    parser.add_argument("--fake-port", type=int, default=9000)
+    parser.add_argument("--producer-port", type=int, default=8000)
+    parser.add_argument("--consumer-port", type=int, default=8002)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers per service")
+    parser.add_argument("--sensors", type=int, default=PayloadConfig.sensor_count)
+    parser.add_argument("--interval", type=int, default=PayloadConfig.interval_seconds)
+    parser.add_argument("--latency-distribution", default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=0.0,
+        help="Shared cache TTL of the spawned services; 0 measures the uncached pipeline",
+    )
+    args = parser.parse_args(argv)
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    producer_url = f"http://127.0.0.1:{args.producer_port}"
+    consumer_url = f"http://127.0.0.1:{args.consumer_port}"
+    env = dict(
+        os.environ,
+        FEATURE_PRODUCER_API_BASE_URL=fake_url,
+        FEATURE_PRODUCER_FEATURE_ENDPOINT_BASE_URL=f"{producer_url}/api",
+        FEATURE_PRODUCER_LOG_LEVEL="WARNING",
+        FEATURE_PRODUCER_SHARED_CACHE_TTL_SECONDS=str(args.cache_ttl),
+    )
+    uvicorn_cmd = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning", "--workers", str(args.workers)]
+
+    with ExitStack() as stack:
+        # Fresh cache files per run so no entries leak in from an earlier run.
+        env["FEATURE_PRODUCER_SHARED_CACHE_DIR"] = stack.enter_context(tempfile.TemporaryDirectory())
+        if not args.no_spawn:
+            fake_cmd = [
+                sys.executable, "-m", "benchmarks.fake_hm_sense",
+                "--port", str(args.fake_port),
+                "--sensors", str(args.sensors),
+                "--interval", str(args.interval),
+                "--latency-distribution", args.latency_distribution,
+                "--latency-ms", str(args.latency_ms),
+                "--latency-spread", str(args.latency_spread),
+                "--error-rate", str(args.error_rate),
+            ]
+            stack.enter_context(spawn(fake_cmd, f"{fake_url}/roomclimate/sensors", env))
+            stack.enter_context(spawn(
+                uvicorn_cmd + ["--port", str(args.producer_port), "services.feature_producer.app:app"],
+                f"{producer_url}/ready",
+                env,
+            ))
+            stack.enter_context(spawn(
+                uvicorn_cmd + ["--port", str(args.consumer_port), "services.model_consumer.app:app"],
+                f"{consumer_url}/ready",
+                env,
+            ))
+
+        sensor_id = PayloadGenerator(PayloadConfig(sensor_count=args.sensors)).sensor_ids()[0]
+        targets = build_targets(producer_url, consumer_url, sensor_id)
+        stats = drive(targets, args.concurrency, args.duration, args.timeout)
+
+    print(f"concurrency={args.concurrency} duration={args.duration:.0f}s upstream_latency={args.latency_distribution}:{args.latency_ms}ms")
+    print(format_report(stats, args.duration))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Measure how much request latency logging adds to a feature request.
+
+Records the log calls one `FeatureEndpoint.compute_vectors` request makes at
+the chosen level, then replays exactly those calls with logging disabled, with
+the former synchronous `basicConfig` setup and with the queue based structured
+logging from `services.utils.logging_setup`. Replaying isolates the logging
+cost, which is far below the run-to-run noise of the full request:
+
+    python -m benchmarks.logging_overhead --level DEBUG --sensors 50
+"""
+import argparse
+import logging
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.feature_producer.feature_endpoint import FeatureEndpoint
+from services.feature_producer.featurizer import Featurizer
+from services.utils.logging_setup import _stop_listener, configure_logging
+
+from .harness import BenchmarkResult, format_table, run_benchmark
+from .payload_generator import PayloadConfig, PayloadGenerator
+
+MODES = ("disabled", "basicConfig", "queue")
+
+
+class _StaticClient:
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        self.payload = payload
+
+    def get_all_measurements(self, start: int, end: int, **_: Any) -> Dict[str, Any]:
+        return self.payload
+
+
+class _Recorder(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(level=logging.DEBUG)
+        self.calls: List[Tuple[str, int, str, tuple]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.calls.append((record.name, record.levelno, record.msg, record.args or ()))
+
+
+def record_request_log_calls(endpoint: FeatureEndpoint, config: PayloadConfig) -> List[Tuple[str, int, str, tuple]]:
+    recorder = _Recorder()
+    logging.basicConfig(level=logging.DEBUG, handlers=[recorder], force=True)
+    endpoint.compute_vectors(config.end - config.window_seconds, config.end, None)
+    return recorder.calls
+
+
+def _configure(mode: str, level: str, stream) -> None:
+    _stop_listener()
+    if mode == "disabled":
+        logging.basicConfig(level=logging.CRITICAL + 1, stream=stream, force=True)
+    elif mode == "basicConfig":
+        logging.basicConfig(
+            level=getattr(logging, level),
+            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            stream=stream,
+            force=True,
+        )
+    else:
+        configure_logging("benchmark", level=level, log_format="json", debug_sample_rate=0.1, stream=stream)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Logging overhead per feature request")
+    parser.add_argument("--sensors", type=int, default=PayloadConfig.sensor_count)
+    parser.add_argument("--level", default="DEBUG", choices=("DEBUG", "INFO", "WARNING"))
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    config = PayloadConfig(sensor_count=args.sensors)
+    endpoint = FeatureEndpoint(client=_StaticClient(PayloadGenerator(config).generate()), featurizer=Featurizer())
+    request_time = run_benchmark("compute_vectors", lambda: endpoint.compute_vectors(
+        config.end - config.window_seconds, config.end, None
+    ), items_per_call=1, iterations=5)
+    calls = record_request_log_calls(endpoint, config)
+    loggers = {name: logging.getLogger(name) for name, *_ in calls}
+
+    def replay() -> None:
+        for name, level, msg, call_args in calls:
+            loggers[name].log(level, msg, *call_args)
+
+    results: List[BenchmarkResult] = []
+    with tempfile.TemporaryFile("w+") as sink:
+        for mode in MODES:
+            _configure(mode, args.level, sink)
+            results.append(run_benchmark(f"{mode} ({args.level})", replay, items_per_call=1, iterations=args.iterations))
+        _stop_listener()
+
+    print(f"{len(calls)} log calls per request; full request p50 {request_time.p50_ms:.1f} ms")
+    print(format_table(results))
+    baseline = results[0].p50_ms
+    for result in results[1:]:
+        print(f"{result.name}: +{(result.p50_ms - baseline) * 1000:.1f} us p50 per request over disabled logging")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import math
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+MEASUREMENT_TYPES = ("humidity", "temperature", "co2", "motion", "light")
+
+
+@dataclass(frozen=True)
+class PayloadConfig:
+    sensor_count: int = 50
+    window_seconds: int = 3 * 60 * 60
+    interval_seconds: int = 60
+    missing_rate: float = 0.02
+    fraction_digits: Sequence[int] = (0, 3, 6, 7, 9)
+    end: int = 1_717_408_800  # Mon 2024-06-03 10:00:00 UTC, inside lecture hours
+    seed: int = 42
+
+
+class PayloadGenerator:
+    """Deterministic generator of `/roomclimate/measurements/all` style payloads."""
+
+    def __init__(self, config: Optional[PayloadConfig] = None) -> None:
+        self.config = config or PayloadConfig()
+
+    def sensor_ids(self) -> List[str]:
+        return [f"R{1 + idx // 20}.{idx % 20:03d}" for idx in range(self.config.sensor_count)]
+
+    def generate(self) -> Dict[str, Any]:
+        return {"responseData": self.blocks()}
+
+    def blocks(self, sensor_ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        wanted = set(sensor_ids) if sensor_ids is not None else None
+        return [
+            {"sensorId": sensor_id, "measurements": self._series(idx, sensor_id)}
+            for idx, sensor_id in enumerate(self.sensor_ids())
+            if wanted is None or sensor_id in wanted
+        ]
+
+    def _series(self, idx: int, sensor_id: str) -> List[Dict[str, Any]]:
+        cfg = self.config
+        rng = random.Random(f"{cfg.seed}:{sensor_id}")
+        start = cfg.end - cfg.window_seconds
+        capacity = rng.uniform(0.3, 1.0)
+        base_temperature = rng.uniform(19.0, 23.0)
+        base_humidity = rng.uniform(35.0, 55.0)
+        co2 = rng.uniform(420.0, 600.0)
+        occupied = False
+        measurements: List[Dict[str, Any]] = []
+        for ts in range(start + rng.randrange(cfg.interval_seconds), cfg.end, cfg.interval_seconds):
+            hour = datetime.fromtimestamp(ts, tz=timezone.utc).hour
+            lecture_hours = 7 <= hour < 19
+            if rng.random() < 0.05:
+                occupied = lecture_hours and rng.random() < capacity
+            co2 += (35.0 * capacity if occupied else -12.0) + rng.gauss(0.0, 6.0)
+            co2 = min(max(co2, 400.0), 3000.0)
+            daylight = max(0.0, math.sin(math.pi * (hour - 6) / 14.0)) if 6 <= hour <= 20 else 0.0
+            values = {
+                "humidity": round(base_humidity + (4.0 if occupied else 0.0) + rng.gauss(0.0, 0.8), 2),
+                "temperature": round(base_temperature + (1.5 if occupied else 0.0) + rng.gauss(0.0, 0.2), 2),
+                "co2": round(co2, 1),
+                "motion": float(occupied and rng.random() < 0.7),
+                "light": round(1800.0 * daylight + (450.0 if occupied else 0.0) + abs(rng.gauss(0.0, 20.0)), 1),
+            }
+            item: Dict[str, Any] = {"timestamp": self._iso_timestamp(ts, rng)}
+            for name in MEASUREMENT_TYPES:
+                if rng.random() < cfg.missing_rate:
+                    continue
+                item[name] = values[name]
+            measurements.append(item)
+        return measurements
+
+    def _iso_timestamp(self, ts: int, rng: random.Random) -> str:
+        digits = rng.choice(list(self.config.fraction_digits))
+        base = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        if digits:
+            base += "." + "".join(str(rng.randrange(10)) for _ in range(digits))
+        return base + ("Z" if rng.random() < 0.5 else "+00:00")
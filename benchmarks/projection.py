@@ -0,0 +1,104 @@
+"""Compare full upstream fetches with fetches projected onto the measurement types the features need.
+
+Starts the fake HM-Sense API and computes feature vectors for all sensors and for a
+small sensor subset, once with every measurement type and once with only the types
+required by `--features` (default: the model's `feature_cols`). Reports the upstream
+calls and bytes per request and the latency:
+
+    python -m benchmarks.projection --sensors 100 --latency-ms 20
+"""
+import argparse
+import pickle
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from services.feature_producer.api_client import APIClient
+from services.feature_producer.feature_endpoint import FeatureEndpoint
+from services.feature_producer.featurizer import Featurizer
+from services.settings import Settings
+
+from .harness import BenchmarkResult, format_table, run_benchmark
+from .load_driver import spawn
+from .payload_generator import PayloadConfig, PayloadGenerator
+
+_MODEL_CONFIG = Path(__file__).resolve().parent.parent / "model" / "hmm_config.pkl"
+
+
+def _model_features() -> List[str]:
+    with open(_MODEL_CONFIG, "rb") as fh:
+        return list(pickle.load(fh)["feature_cols"])
+
+
+class _ByteCounter:
+    def __init__(self) -> None:
+        self.bytes = 0
+        self.requests = 0
+
+    def __call__(self, response: requests.Response, *args, **kwargs) -> requests.Response:
+        self.bytes += len(response.content)
+        self.requests += 1
+        return response
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Projected vs. full upstream measurement fetches")
+    parser.add_argument("--sensors", type=int, default=PayloadConfig.sensor_count)
+    parser.add_argument("--subset", type=int, default=3, help="Sensors in the subset case")
+    parser.add_argument("--interval", type=int, default=PayloadConfig.interval_seconds)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=9310)
+    parser.add_argument("--features", help="Comma-separated feature names (default: the model's feature_cols)")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    features = args.features.split(",") if args.features else _model_features()
+    base_url = f"http://127.0.0.1:{args.port}"
+    settings = Settings(shared_cache_ttl_seconds=0, log_level="WARNING")
+    client = APIClient(base_url=base_url, settings=settings)
+    counter = _ByteCounter()
+    client.session.hooks["response"].append(counter)
+    endpoint = FeatureEndpoint(client, Featurizer(), settings=settings)
+    types = endpoint.featurizer.required_measurements(features)
+
+    end = PayloadConfig.end
+    start = end - 3600
+    subset = PayloadGenerator(PayloadConfig(sensor_count=args.sensors)).sensor_ids()[: args.subset]
+    cases: Dict[str, Optional[Sequence[str]]] = {"all sensors": None, f"{len(subset)} sensors": subset}
+    fake_cmd = [
+        sys.executable, "-m", "benchmarks.fake_hm_sense",
+        "--port", str(args.port),
+        "--sensors", str(args.sensors),
+        "--interval", str(args.interval),
+        "--latency-ms", str(args.latency_ms),
+    ]
+
+    results: List[BenchmarkResult] = []
+    traffic: Dict[str, Tuple[int, int]] = {}
+    with spawn(fake_cmd, f"{base_url}/roomclimate/sensors", env=None):
+        for case, sensor_ids in cases.items():
+            for label, measurement_types in (("full", None), ("projected", types)):
+                name = f"{case} {label}"
+
+                def compute() -> None:
+                    endpoint.compute_vectors(start, end, None, sensor_ids=sensor_ids, measurement_types=measurement_types)
+
+                counter.bytes = counter.requests = 0
+                compute()
+                traffic[name] = (counter.requests, counter.bytes)
+                results.append(run_benchmark(name, compute, items_per_call=1, iterations=args.iterations))
+
+    print(f"features: {', '.join(features)}")
+    print(f"measurement types fetched when projected: {', '.join(types)}")
+    print(f"{'case':<28} {'upstream calls':>15} {'upstream bytes':>16}")
+    for name, (request_count, size) in traffic.items():
+        print(f"{name:<28} {request_count:>15} {size:>16}")
+    print()
+    print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
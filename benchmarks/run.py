@@ -0,0 +1,97 @@
+"""Run the pipeline benchmarks and compare them against stored baselines.
+
+Usage (from the repository root):
+    python -m benchmarks.run                     # run and compare against baselines.json
+    python -m benchmarks.run --update-baseline   # store the current numbers as new baseline
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .harness import BenchmarkResult, format_table
+from .payload_generator import PayloadConfig
+from .stages import run_stage_benchmarks
+
+DEFAULT_BASELINE = Path(__file__).with_name("baselines.json")
+
+
+def scenario_key(config: PayloadConfig) -> str:
+    return f"sensors={config.sensor_count},interval={config.interval_seconds}s,window={config.window_seconds}s"
+
+
+def find_regressions(
+    results: List[BenchmarkResult],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+) -> List[str]:
+    """Return a message per benchmark whose p50 latency or peak memory grew beyond `threshold`."""
+    regressions: List[str] = []
+    for result in results:
+        reference = baseline.get(result.name)
+        if not reference:
+            continue
+        for metric in ("p50_ms", "peak_memory_kib"):
+            current = getattr(result, metric)
+            allowed = reference[metric] * (1.0 + threshold)
+            if current > allowed:
+                regressions.append(
+                    f"{result.name}: {metric} {current:.2f} exceeds baseline {reference[metric]:.2f} "
+                    f"by more than {threshold:.0%}"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="HM Sense pipeline benchmarks")
+    parser.add_argument("--sensors", type=int, default=PayloadConfig.sensor_count)
+    parser.add_argument("--interval", type=int, default=PayloadConfig.interval_seconds, help="Sampling interval in seconds")
+    parser.add_argument("--window-hours", type=float, default=PayloadConfig.window_seconds / 3600)
+    parser.add_argument("--missing-rate", type=float, default=PayloadConfig.missing_rate)
+    parser.add_argument("--seed", type=int, default=PayloadConfig.seed)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="Run only the named benchmarks")
+    parser.add_argument("--model-dir", default="model")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    config = PayloadConfig(
+        sensor_count=args.sensors,
+        interval_seconds=args.interval,
+        window_seconds=int(args.window_hours * 3600),
+        missing_rate=args.missing_rate,
+        seed=args.seed,
+    )
+    results = run_stage_benchmarks(config, iterations=args.iterations, model_dir=args.model_dir, only=args.only)
+    if args.json:
+        print(json.dumps([result.to_dict() for result in results], indent=2))
+    else:
+        print(f"Scenario: {scenario_key(config)}")
+        print(format_table(results))
+
+    baselines: Dict[str, Any] = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    key = scenario_key(config)
+    if args.update_baseline:
+        stored = baselines.setdefault(key, {})
+        stored.update({result.name: result.to_dict() for result in results})
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline updated for scenario {key} in {args.baseline}")
+        return 0
+
+    if key not in baselines:
+        print(f"No baseline stored for scenario {key}; run with --update-baseline to create one.")
+        return 0
+    regressions = find_regressions(results, baselines[key], args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
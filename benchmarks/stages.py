@@ -0,0 +1,46 @@
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.feature_producer.featurizer import Featurizer
+from services.feature_producer.measurement_parser import flatten_measurements
+from services.model_consumer.model_consumer import HMMPredictor
+
+from .harness import BenchmarkResult, run_benchmark
+from .payload_generator import PayloadConfig, PayloadGenerator
+
+
+def _load_predictor(model_dir: str) -> HMMPredictor:
+    # The shipped artifacts may have been pickled with another scikit-learn release.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return HMMPredictor(model_dir=model_dir)
+
+
+def run_stage_benchmarks(
+    config: PayloadConfig,
+    iterations: int = 20,
+    model_dir: str = "model",
+    only: Optional[List[str]] = None,
+) -> List[BenchmarkResult]:
+    payload = PayloadGenerator(config).generate()
+    measurement_count = sum(len(block["measurements"]) for block in payload["responseData"])
+    sensors = flatten_measurements(payload)
+    featurizer = Featurizer()
+    matrix = featurizer.extract_matrix(sensors)
+    predictor = _load_predictor(model_dir)
+
+    def end_to_end() -> None:
+        predictor.predict_matrix(featurizer.extract_matrix(flatten_measurements(payload)))
+
+    stages: Dict[str, Tuple[Callable[[], object], int]] = {
+        "flatten_measurements": (lambda: flatten_measurements(payload), measurement_count),
+        "extract_features": (lambda: featurizer.extract_matrix(sensors), len(matrix)),
+        "predict": (lambda: predictor.predict_matrix(matrix), len(matrix)),
+        "end_to_end": (end_to_end, len(matrix)),
+    }
+    results: List[BenchmarkResult] = []
+    for name, (func, items) in stages.items():
+        if only and name not in only:
+            continue
+        results.append(run_benchmark(name, func, items_per_call=items, iterations=iterations))
+    return results
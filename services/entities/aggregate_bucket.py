@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+
+class AggregateBucket(BaseModel):
+    """Statistics of one sensor's measurement type over one bucket of an /api/aggregates response."""
+
+    sensor_id: str
+    measurement_type: str
+    bucket_start: int
+    count: int
+    sum: float
+    sum_squares: float
+    min: float
+    max: float
+    first: float
+    last: float
+    mean: float
+    std: float
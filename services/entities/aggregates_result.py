@@ -0,0 +1,13 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from .aggregate_bucket import AggregateBucket
+
+
+class AggregatesResult(BaseModel):
+    start: int
+    end: int
+    step: Optional[int] = None
+    levels: List[str]
+    buckets: List[AggregateBucket]
@@ -0,0 +1,171 @@
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .feature_vector import FeatureVector
+
+_KEY_FIELDS = ("sensor_id", "timestamp", "schema_version")
+_SCHEDULE_COLUMNS = ("lecture_scheduled", "minutes_to_next_lecture")
+
+# Column order of the float block per schema version. Version 1 follows the
+# field order of FeatureVector so both representations stay in sync; version 2
+# appends the schedule features.
+_SENSOR_COLUMNS = tuple(f.name for f in fields(FeatureVector) if f.name not in _KEY_FIELDS + _SCHEDULE_COLUMNS)
+FEATURE_COLUMNS: Dict[int, Tuple[str, ...]] = {
+    1: _SENSOR_COLUMNS,
+    2: _SENSOR_COLUMNS + _SCHEDULE_COLUMNS,
+}
+
+INTEGER_COLUMNS = frozenset(
+    f.name for f in fields(FeatureVector) if f.type in (int, "int") and f.name not in _KEY_FIELDS
+) | {"lecture_scheduled"}
+
+
+@dataclass(frozen=True)
+class FeatureMatrix:
+    """Feature vectors of many sensors stored as one contiguous float64 block."""
+
+    sensor_ids: np.ndarray
+    timestamps: np.ndarray
+    values: np.ndarray
+    schema_version: int = 1
+
+    def __post_init__(self) -> None:
+        columns = self.columns_for(self.schema_version)
+        if self.values.ndim != 2 or self.values.shape[1] != len(columns):
+            raise ValueError(
+                f"Expected values of shape (n, {len(columns)}) for schema {self.schema_version}, "
+                f"got {self.values.shape}"
+            )
+        if not (len(self.sensor_ids) == len(self.timestamps) == self.values.shape[0]):
+            raise ValueError("sensor_ids, timestamps and values must have the same number of rows")
+
+    @staticmethod
+    def columns_for(schema_version: int) -> Tuple[str, ...]:
+        try:
+            return FEATURE_COLUMNS[schema_version]
+        except KeyError:
+            raise ValueError(f"Unknown feature schema version: {schema_version}") from None
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return self.columns_for(self.schema_version)
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    @classmethod
+    def empty(cls, schema_version: int = 1) -> "FeatureMatrix":
+        width = len(cls.columns_for(schema_version))
+        return cls(
+            sensor_ids=np.empty(0, dtype=object),
+            timestamps=np.empty(0, dtype=np.int64),
+            values=np.empty((0, width), dtype=np.float64),
+            schema_version=schema_version,
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        sensor_ids: Sequence[str],
+        timestamps: Sequence[int],
+        rows: Sequence[Sequence[float]],
+        schema_version: int = 1,
+    ) -> "FeatureMatrix":
+        if len(rows) == 0:
+            return cls.empty(schema_version)
+        return cls(
+            sensor_ids=np.asarray(sensor_ids, dtype=object),
+            timestamps=np.asarray(timestamps, dtype=np.int64),
+            values=np.ascontiguousarray(rows, dtype=np.float64),
+            schema_version=schema_version,
+        )
+
+    @classmethod
+    def concat(cls, matrices: Sequence["FeatureMatrix"]) -> "FeatureMatrix":
+        parts = [matrix for matrix in matrices if len(matrix)]
+        if not parts:
+            return matrices[0] if matrices else cls.empty()
+        versions = {matrix.schema_version for matrix in parts}
+        if len(versions) > 1:
+            raise ValueError(f"Cannot concatenate feature matrices of schema versions {sorted(versions)}")
+        return cls(
+            sensor_ids=np.concatenate([matrix.sensor_ids for matrix in parts]),
+            timestamps=np.concatenate([matrix.timestamps for matrix in parts]),
+            values=np.concatenate([matrix.values for matrix in parts]),
+            schema_version=parts[0].schema_version,
+        )
+
+    @classmethod
+    def from_records(cls, records: Sequence[Mapping[str, Any]]) -> "FeatureMatrix":
+        """Build a matrix from row dicts such as the feature endpoint JSON payload."""
+        if not records:
+            return cls.empty()
+        schema_version = int(records[0].get("schema_version", 1))
+        columns = cls.columns_for(schema_version)
+        try:
+            rows = [[record[col] for col in columns] for record in records]
+            sensor_ids = [record["sensor_id"] for record in records]
+            timestamps = [record["timestamp"] for record in records]
+        except KeyError as exc:
+            raise ValueError(f"Feature record is missing column {exc.args[0]!r}") from exc
+        return cls.from_rows(sensor_ids, timestamps, rows, schema_version)
+
+    @classmethod
+    def from_vectors(cls, vectors: Sequence[FeatureVector]) -> "FeatureMatrix":
+        if not vectors:
+            return cls.empty()
+        columns = cls.columns_for(vectors[0].schema_version)
+        return cls.from_rows(
+            [vector.sensor_id for vector in vectors],
+            [vector.timestamp for vector in vectors],
+            [[getattr(vector, col) for col in columns] for vector in vectors],
+            vectors[0].schema_version,
+        )
+
+    def column_indices(self, columns: Iterable[str]) -> np.ndarray:
+        positions = {name: idx for idx, name in enumerate(self.columns)}
+        missing = [col for col in columns if col not in positions]
+        if missing:
+            raise ValueError(f"Missing features for inference: {missing}")
+        return np.fromiter((positions[col] for col in columns), dtype=np.intp)
+
+    def select(self, columns: Sequence[str]) -> np.ndarray:
+        """Return a contiguous (n, len(columns)) block in the given column order."""
+        return np.ascontiguousarray(self.values[:, self.column_indices(columns)])
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self.columns.index(name)]
+
+    def take(self, mask_or_indices: np.ndarray) -> "FeatureMatrix":
+        return FeatureMatrix(
+            sensor_ids=self.sensor_ids[mask_or_indices],
+            timestamps=self.timestamps[mask_or_indices],
+            values=np.ascontiguousarray(self.values[mask_or_indices]),
+            schema_version=self.schema_version,
+        )
+
+    def filter_sensors(self, sensor_ids: Optional[Iterable[str]]) -> "FeatureMatrix":
+        if sensor_ids is None:
+            return self
+        wanted = set(sensor_ids)
+        mask = np.fromiter((sid in wanted for sid in self.sensor_ids), dtype=bool, count=len(self))
+        return self.take(mask)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Row dicts in the FeatureVectorResponse layout, ints restored for integer columns."""
+        columns = self.columns
+        int_positions = [idx for idx, col in enumerate(columns) if col in INTEGER_COLUMNS]
+        records: List[Dict[str, Any]] = []
+        for sensor_id, timestamp, row in zip(self.sensor_ids, self.timestamps.tolist(), self.values.tolist()):
+            for idx in int_positions:
+                row[idx] = int(row[idx])
+            record: Dict[str, Any] = {"sensor_id": sensor_id, "timestamp": timestamp}
+            record.update(zip(columns, row))
+            record["schema_version"] = self.schema_version
+            records.append(record)
+        return records
+
+    def to_vectors(self) -> List[FeatureVector]:
+        return [FeatureVector(**record) for record in self.to_records()]
@@ -0,0 +1,13 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from .feature_matrix import FeatureMatrix
+from .partial_window_report import PartialWindowReport
+from .sensor import Sensor
+
+
+@dataclass(frozen=True)
+class FeatureMatrixResult:
+    feature_matrix: FeatureMatrix
+    current_sensors: List[Sensor]
+    partial_windows: List[PartialWindowReport] = field(default_factory=list)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass(frozen=True)
 class FeatureVector:
@@ -53,4 +54,7 @@ class FeatureVector:
     motion_off_hours: float # motion x is_off_hours
     light_on_at_night: float # light threshhold x is_night
     
-    schema_version: int = 1
\ No newline at end of file
+    schema_version: int = 1
+    # Schedule (schema version 2, needs the lecture index)
+    lecture_scheduled: Optional[int] = None # (bool, lecture in the sensor's room right now)
+    minutes_to_next_lecture: Optional[float] = None # 0 during a lecture
\ No newline at end of file
@@ -1,4 +1,6 @@
 from dataclasses import asdict
+from typing import Optional
+
 from pydantic import BaseModel
 
 from .feature_vector import FeatureVector
@@ -49,6 +51,8 @@ class FeatureVectorResponse(BaseModel):
     motion_off_hours: float
     light_on_at_night: float
     schema_version: int
+    lecture_scheduled: Optional[int] = None
+    minutes_to_next_lecture: Optional[float] = None
 
     @classmethod
     def from_model(cls, vector: FeatureVector) -> "FeatureVectorResponse":
@@ -1,11 +1,51 @@
-from typing import List
+from typing import Any, Dict, List
 
 from pydantic import BaseModel
 
+from .feature_matrix_result import FeatureMatrixResult
 from .feature_vector_response import FeatureVectorResponse
+from .partial_window_report import PartialWindowReport
 from .sensor import Sensor
 
 
+# Response fields in declaration order; schema version 1 records lack the optional ones.
+_VECTOR_FIELDS = tuple(getattr(FeatureVectorResponse, "model_fields", None) or FeatureVectorResponse.__fields__)
+
+
+def _plain(model: BaseModel, by_alias: bool) -> Dict[str, Any]:
+    dump = getattr(model, "model_dump", None)
+    if callable(dump):
+        return dump(by_alias=by_alias)
+    return model.dict(by_alias=by_alias)
+
+
 class FeatureVectorsResult(BaseModel):
     feature_vectors: List[FeatureVectorResponse]
     current_sensors: List[Sensor]
+    partial_windows: List[PartialWindowReport] = []
+
+    @classmethod
+    def from_matrix_result(cls, result: FeatureMatrixResult) -> "FeatureVectorsResult":
+        return cls(
+            feature_vectors=result.feature_matrix.to_records(),
+            current_sensors=result.current_sensors,
+            partial_windows=result.partial_windows,
+        )
+
+    @staticmethod
+    def payload_from_matrix_result(result: FeatureMatrixResult, by_alias: bool = True) -> Dict[str, Any]:
+        """The JSON layout of `from_matrix_result(result)`, built without validating the parts again.
+
+        `by_alias` selects `sensorId` or `sensor_id` for the current sensors, as
+        `response_model_by_alias` does on the default path.
+        """
+        records = result.feature_matrix.to_records()
+        absent = [name for name in _VECTOR_FIELDS if records and name not in records[0]]
+        if absent:
+            for record in records:
+                record.update(dict.fromkeys(absent))
+        return {
+            "feature_vectors": records,
+            "current_sensors": [_plain(sensor, by_alias) for sensor in result.current_sensors],
+            "partial_windows": [_plain(report, by_alias) for report in result.partial_windows],
+        }
@@ -0,0 +1,15 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class OccupancyGroup(BaseModel):
+    """Expected state distribution of one room, floor or building."""
+
+    group_id: str
+    parent_id: Optional[str] = None
+    sensor_count: int
+    room_count: int
+    state_distribution: Dict[str, float]
+    most_likely_state: str
+    expected_occupancy: Optional[float] = None
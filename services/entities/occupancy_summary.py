@@ -0,0 +1,14 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from .occupancy_group import OccupancyGroup
+
+
+class OccupancySummary(BaseModel):
+    computed_at: int
+    sensor_count: int
+    state_labels: List[str]
+    buildings: List[OccupancyGroup] = []
+    floors: List[OccupancyGroup] = []
+    rooms: List[OccupancyGroup] = []
@@ -0,0 +1,11 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class PartialWindowReport(BaseModel):
+    """A feature vector whose look-back windows were not fully covered by measurements."""
+
+    sensor_id: str
+    timestamp: int
+    window_minutes: List[int]
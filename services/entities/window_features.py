@@ -0,0 +1,13 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class WindowFeatures(BaseModel):
+    """Long-window mean/std features of one sensor, e.g. `avg_co2_24h` and `std_co2_24h`.
+
+    Values are None when the sensor has no measurements of that type in the window.
+    """
+
+    sensor_id: str
+    features: Dict[str, Optional[float]]
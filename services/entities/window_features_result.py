@@ -0,0 +1,11 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from .window_features import WindowFeatures
+
+
+class WindowFeaturesResult(BaseModel):
+    end: int
+    windows: List[str]
+    window_features: List[WindowFeatures]
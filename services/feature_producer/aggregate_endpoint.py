@@ -0,0 +1,189 @@
+import logging
+import math
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from .feature_endpoint import get_endpoint
+from .measurement_parser import MEASUREMENT_TYPES
+from .rollups import RollupIngestion, RollupStore, bucket_statistics, parse_duration
+from ..entities.aggregate_bucket import AggregateBucket
+from ..entities.aggregates_result import AggregatesResult
+from ..entities.sensor import Sensor
+from ..entities.window_features import WindowFeatures
+from ..entities.window_features_result import WindowFeaturesResult
+from ..settings import get_settings
+from ..utils.metrics import observe_stage
+from ..utils.sensor_selection import resolve_sensor_selection
+from ..utils.shared_cache import LeaderLock, open_leader_lock
+
+logger = logging.getLogger(__name__)
+
+
+def _fetch_owned(start: int, end: int) -> List[Sensor]:
+    endpoint = get_endpoint()
+    if endpoint.sharded:
+        # Like feature vectors, a shard keeps rollups of its own sensors only.
+        return endpoint._fetch_sensor_subset(start, end, endpoint.owned_sensor_ids(endpoint.shard_index))
+    return endpoint._fetch_measurements(start, end, None)
+
+
+@lru_cache(maxsize=1)
+def _rollups_leader() -> Optional[LeaderLock]:
+    settings = get_settings()
+    # One worker per pod fetches and shares its rollups through the snapshot; that needs a snapshot to share.
+    return open_leader_lock("rollups", settings) if settings.rollup_snapshot_path else None
+
+
+@lru_cache(maxsize=1)
+def get_rollups() -> RollupIngestion:
+    settings = get_settings()
+    store = RollupStore({level: hours * 3600 for level, hours in settings.rollup_retention_hours.items()})
+    snapshot_path = os.path.expanduser(settings.rollup_snapshot_path) if settings.rollup_snapshot_path else None
+    leader = _rollups_leader()
+    return RollupIngestion(
+        store,
+        fetch=_fetch_owned,
+        refresh_seconds=settings.rollup_refresh_seconds,
+        backfill_seconds=int(settings.rollup_backfill_hours * 3600),
+        snapshot_path=snapshot_path,
+        snapshot_seconds=0.0 if leader is not None else 900.0,
+        is_leader=leader.try_acquire if leader is not None else None,
+    )
+
+
+def start_rollups() -> None:
+    """Restore the rollups and keep them current in a background thread."""
+    get_rollups().start()
+
+
+def stop_rollups() -> None:
+    """Stop the background ingestion and hand the leader lock to the other workers."""
+    if get_rollups.cache_info().currsize:
+        get_rollups().stop()
+        get_rollups.cache_clear()
+    if _rollups_leader.cache_info().currsize:
+        leader = _rollups_leader()
+        if leader is not None:
+            leader.close()
+        _rollups_leader.cache_clear()
+
+
+def get_rollup_store() -> RollupStore:
+    if not get_settings().rollups_enabled:
+        raise HTTPException(status_code=404, detail="Rollups are disabled (FEATURE_PRODUCER_ROLLUPS_ENABLED)")
+    return get_rollups().store
+
+
+def _split(values: Optional[Sequence[str]]) -> List[str]:
+    return [part.strip() for entry in values or [] for part in entry.split(",") if part.strip()]
+
+
+def _measurement_types(types: Optional[Sequence[str]]) -> List[str]:
+    selected = _split(types) or list(MEASUREMENT_TYPES)
+    unknown = sorted(set(selected) - set(MEASUREMENT_TYPES))
+    if unknown:
+        raise ValueError(f"Unknown measurement types: {unknown}")
+    return list(dict.fromkeys(selected))
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+router = APIRouter()
+settings = get_settings()
+
+
+@router.get("/aggregates", response_model=AggregatesResult)
+def get_aggregates(
+    start: int = Query(..., description="Range start timestamp (epoch seconds)"),
+    end: Optional[int] = Query(None, description="Range end timestamp (epoch seconds), now by default"),
+    step: Optional[str] = Query(
+        None,
+        description="Bucket width such as 15m, 1h, 1d or seconds; without it the whole range is one bucket",
+    ),
+    types: Optional[List[str]] = Query(None, description="Measurement types (repeat or comma separated); all by default"),
+    sensor_id: Optional[str] = Query(None, description="Optional sensor ID filter"),
+    sensor_ids: Optional[List[str]] = Query(None, description="Sensor IDs to include (repeat or comma separated)"),
+    group: Optional[str] = Query(None, description="Named sensor group from the sensor_groups setting"),
+    store: RollupStore = Depends(get_rollup_store),
+):
+    """Count, sum, sum of squares, min, max, first, last, mean and std per sensor, type and bucket.
+
+    The range is answered from the coarsest rollup level that fits and widened to
+    that level's bucket boundaries; `start`/`end` of the response give the range
+    actually covered.
+    """
+    window_end = end or int(datetime.now(tz=timezone.utc).timestamp())
+    try:
+        kinds = _measurement_types(types)
+        selection = resolve_sensor_selection(sensor_id, sensor_ids, group, settings.sensor_groups)
+        plan = store.plan(start, window_end, parse_duration(step) if step else None)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    selected = selection if selection is not None else store.sensor_ids()
+    per_series = (plan.end - plan.start) // plan.step if plan.step else 1
+    if per_series * len(selected) * len(kinds) > settings.rollup_max_buckets:
+        raise HTTPException(
+            status_code=400,
+            detail=f"The request spans more than {settings.rollup_max_buckets} buckets; use a larger step or fewer sensors",
+        )
+    logger.debug("Aggregating %d sensors %s..%s step=%s from levels %s", len(selected), plan.start, plan.end, plan.step, plan.levels)
+
+    buckets: List[AggregateBucket] = []
+    with observe_stage("aggregate_rollups"):
+        for sensor in selected:
+            for kind in kinds:
+                starts, rows = store.query(plan, sensor, kind)
+                if not len(starts):
+                    continue
+                stats = {name: values.tolist() for name, values in bucket_statistics(rows).items()}
+                buckets.extend(
+                    AggregateBucket(
+                        sensor_id=sensor,
+                        measurement_type=kind,
+                        bucket_start=bucket_start,
+                        **{name: values[idx] for name, values in stats.items()},
+                    )
+                    for idx, bucket_start in enumerate(starts.tolist())
+                )
+    return AggregatesResult(start=plan.start, end=plan.end, step=plan.step, levels=plan.levels, buckets=buckets)
+
+
+@router.get("/aggregates/windows", response_model=WindowFeaturesResult)
+def get_window_features(
+    end: Optional[int] = Query(None, description="Window end timestamp (epoch seconds), now by default"),
+    windows: List[str] = Query(["24h", "7d"], description="Window lengths (repeat or comma separated), e.g. 24h,7d"),
+    types: Optional[List[str]] = Query(None, description="Measurement types (repeat or comma separated); all by default"),
+    sensor_id: Optional[str] = Query(None, description="Optional sensor ID filter"),
+    sensor_ids: Optional[List[str]] = Query(None, description="Sensor IDs to include (repeat or comma separated)"),
+    group: Optional[str] = Query(None, description="Named sensor group from the sensor_groups setting"),
+    store: RollupStore = Depends(get_rollup_store),
+):
+    """Long-window `avg_<type>_<window>` and `std_<type>_<window>` features computed from the rollups."""
+    window_end = end or int(datetime.now(tz=timezone.utc).timestamp())
+    try:
+        kinds = _measurement_types(types)
+        labels = _split(windows)
+        lengths = [parse_duration(label) for label in labels]
+        selection = resolve_sensor_selection(sensor_id, sensor_ids, group, settings.sensor_groups)
+        selected = selection if selection is not None else store.sensor_ids()
+        with observe_stage("aggregate_rollups"):
+            features = [dict() for _ in selected]
+            for label, seconds in zip(labels, lengths):
+                for kind in kinds:
+                    _, stats = store.window_statistics(selected, kind, window_end, seconds)
+                    for row, (mean, std) in enumerate(zip(stats["mean"].tolist(), stats["std"].tolist())):
+                        features[row][f"avg_{kind}_{label}"] = _optional(mean)
+                        features[row][f"std_{kind}_{label}"] = _optional(std) if not math.isnan(mean) else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return WindowFeaturesResult(
+        end=window_end,
+        windows=labels,
+        window_features=[WindowFeatures(sensor_id=sensor, features=values) for sensor, values in zip(selected, features)],
+    )
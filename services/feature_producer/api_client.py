@@ -5,6 +5,9 @@ import requests
 from typing import List, Optional, Dict, Any
 
 from ..settings import Settings, get_settings
+from ..utils import deadline
+from ..utils.logging_setup import debug_sampled
+from ..utils.metrics import PAYLOAD_BYTES, UPSTREAM_ERRORS, observe_stage
 
 logger = logging.getLogger(__name__)
 
@@ -33,22 +36,32 @@ class APIClient:
     def _make_request(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         url = f"{self.base_url}{endpoint}"
         start_time = time.perf_counter()
-        logger.debug("Requesting %s params=%s", url, params)
+        debug_sampled(logger, "Requesting %s params=%s", url, params)
+        # Never wait for HM-Sense longer than the caller still waits for us.
+        timeout = deadline.timeout(self.request_timeout, "upstream_fetch")
         try:
-            response = self.session.get(url, params=params, timeout=self.request_timeout)
-            response.raise_for_status()
-            duration_ms = (time.perf_counter() - start_time) * 1000
-            logger.debug(
+            with observe_stage("upstream_fetch"):
+                response = self.session.get(url, params=params, timeout=timeout)
+                response.raise_for_status()
+                payload = response.json()
+            PAYLOAD_BYTES.labels(source="hm_sense").observe(len(response.content))
+            debug_sampled(
+                logger,
                 "Successful response %s status=%s duration=%.2fms",
                 url,
                 response.status_code,
-                duration_ms,
+                (time.perf_counter() - start_time) * 1000,
             )
-            return response.json()
+            return payload
         except requests.exceptions.HTTPError as e:
+            UPSTREAM_ERRORS.labels(target="hm_sense", status=str(e.response.status_code)).inc()
             logger.error("HTTP error for %s status=%s", url, e.response.status_code)
             raise RuntimeError(f"HTTP error {e.response.status_code}: {e.response.text}") from e
         except requests.exceptions.RequestException as e:
+            UPSTREAM_ERRORS.labels(target="hm_sense", status=type(e).__name__).inc()
+            if deadline.expired():
+                logger.warning("Abandoned %s at the request deadline", url)
+                raise deadline.DeadlineExceeded("upstream_fetch") from e
             logger.error("Request failure for %s: %s", url, e)
             raise RuntimeError(f"API request failed: {str(e)}") from e
     
@@ -98,7 +111,8 @@ class APIClient:
             params["start"] = str(start)
         if end is not None:
             params["end"] = str(end)
-        logger.debug(
+        debug_sampled(
+            logger,
             "Fetching sensor measurements sensor_id=%s start=%s end=%s format=%s",
             sensor_id,
             params.get("start"),
@@ -120,7 +134,8 @@ class APIClient:
             params["start"] = str(start)
         if end is not None:
             params["end"] = str(end)
-        logger.debug(
+        debug_sampled(
+            logger,
             "Fetching sensor measurements by type sensor_id=%s type=%s start=%s end=%s format=%s",
             sensor_id,
             sensor_type,
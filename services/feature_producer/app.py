@@ -1,21 +1,57 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from .aggregate_endpoint import router as aggregate_router
+from .aggregate_endpoint import start_rollups, stop_rollups
 from .feature_endpoint import router as feature_router
+from .feature_endpoint import warm_up
 from ..settings import get_settings
+from ..utils.admission import AdmissionControlMiddleware
+from ..utils.deadline import DeadlineMiddleware
+from ..utils.logging_setup import RequestIdMiddleware, configure_logging
+from ..utils.metrics import MetricsMiddleware
+from ..utils.metrics import router as metrics_router
+from ..utils.profiling import router as profiling_router
+from ..utils.readiness import get_readiness
+from ..utils.readiness import router as readiness_router
+from ..utils.server_timing import ServerTimingMiddleware
 
 # Configure logging
 settings = get_settings()
-logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper()),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+configure_logging(
+    service="feature-producer",
+    level=settings.log_level,
+    log_format=settings.log_format,
+    debug_sample_rate=settings.log_debug_sample_rate,
 )
 logger = logging.getLogger(__name__)
 logger.info("Starting Feature Producer Service with log level: %s", settings.log_level)
 
-app = FastAPI(title="Feature Producer Service", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_readiness().start(warm_up)
+    if settings.rollups_enabled:
+        start_rollups()
+    yield
+    if settings.rollups_enabled:
+        stop_rollups()
+
+
+app = FastAPI(title="Feature Producer Service", version="1.0.0", lifespan=lifespan)
+app.add_middleware(ServerTimingMiddleware)
+# Admission runs inside the deadline so queued requests give up at their deadline.
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 app.include_router(feature_router, prefix="/api")
+app.include_router(aggregate_router, prefix="/api")
+app.include_router(metrics_router)
+app.include_router(profiling_router)
+app.include_router(readiness_router)
 
 
 @app.get("/health", tags=["health"])
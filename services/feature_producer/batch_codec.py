@@ -0,0 +1,311 @@
+import io
+import struct
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..entities.sensor import Sensor
+from .measurement_parser import MEASUREMENT_TYPES as MEASUREMENT_COLUMNS
+
+# magic, format version, sensor schema version, sensor id length, payload length,
+# row count, first timestamp, last timestamp, crc32 of the payload
+_FRAME = struct.Struct("<4sBBHIIqqI")
+_FRAME_MAGIC = b"HMSF"
+_FORMAT_VERSION = 1
+_SECTION = struct.Struct("<I")
+
+_ALL_NULL, _ALL_PRESENT, _BITMAP = 0, 1, 2
+_FIXED, _XOR = 1, 2
+
+_SHIFTS = np.arange(0, 70, 7, dtype=np.uint64)
+_THRESHOLDS = np.uint64(1) << _SHIFTS[1:]
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -((values & np.uint64(1)).view(np.int64))
+
+
+def _encode_varints(values: np.ndarray) -> bytes:
+    """LEB128 varints of unsigned 64-bit values, built for the whole array at once."""
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b""
+    lengths = 1 + (values[:, None] >= _THRESHOLDS[None, :]).sum(axis=1)
+    groups = ((values[:, None] >> _SHIFTS[None, :]) & np.uint64(0x7F)).astype(np.uint8)
+    positions = np.arange(len(_SHIFTS))[None, :]
+    groups[positions < (lengths - 1)[:, None]] |= 0x80
+    return groups[positions < lengths[:, None]].tobytes()
+
+
+def _decode_varints(data: bytes, count: int) -> np.ndarray:
+    raw = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(raw < 0x80)
+    if len(ends) != count:
+        raise ValueError(f"Expected {count} varints, found {len(ends)}")
+    if not count:
+        return np.empty(0, dtype=np.uint64)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    offsets = np.arange(len(raw)) - np.repeat(starts, ends - starts + 1)
+    parts = (raw & 0x7F).astype(np.uint64) << (offsets.astype(np.uint64) * np.uint64(7))
+    return np.add.reduceat(parts, starts)
+
+
+def _encode_xor(values: np.ndarray) -> bytes:
+    """Byte-aligned XOR compression: each value is XORed with its predecessor and
+    only the bytes between the leading and trailing zero bytes are kept, after one
+    control byte per value (leading << 4 | trailing)."""
+    bits = values.astype(np.float64).view(np.uint64)
+    xored = bits ^ np.concatenate(([np.uint64(0)], bits[:-1]))
+    as_bytes = xored.astype("<u8").view(np.uint8).reshape(-1, 8)
+    nonzero = as_bytes != 0
+    any_set = nonzero.any(axis=1)
+    trailing = np.where(any_set, nonzero.argmax(axis=1), 0)
+    leading = np.where(any_set, nonzero[:, ::-1].argmax(axis=1), 8)
+    control = ((leading << 4) | trailing).astype(np.uint8)
+    columns = np.arange(8)[None, :]
+    keep = (columns >= trailing[:, None]) & (columns < (8 - leading)[:, None])
+    return control.tobytes() + as_bytes[keep].tobytes()
+
+
+def _decode_xor(data: bytes, count: int) -> np.ndarray:
+    control = np.frombuffer(data, dtype=np.uint8, count=count)
+    leading = (control >> 4).astype(np.int64)
+    trailing = (control & 0x0F).astype(np.int64)
+    columns = np.arange(8)[None, :]
+    keep = (columns >= trailing[:, None]) & (columns < (8 - leading)[:, None])
+    as_bytes = np.zeros((count, 8), dtype=np.uint8)
+    as_bytes[keep] = np.frombuffer(data, dtype=np.uint8, offset=count)
+    xored = as_bytes.view("<u8").reshape(-1).astype(np.uint64)
+    return np.bitwise_xor.accumulate(xored).view(np.float64)
+
+
+def _fixed_precision(values: np.ndarray, max_decimals: int) -> Optional[Tuple[int, np.ndarray]]:
+    """Smallest number of decimals that reproduces every value bit for bit, with the scaled integers."""
+    if not np.isfinite(values).all():
+        return None
+    for decimals in range(max_decimals + 1):
+        scale = 10.0 ** decimals
+        scaled = np.round(values * scale)
+        if np.abs(scaled).max(initial=0.0) >= 2.0 ** 53:
+            return None
+        integers = scaled.astype(np.int64)
+        # Decoded exactly like _decode_payload and compared as bits, so -0.0 does not become 0.0.
+        if np.array_equal((integers / scale).view(np.uint64), values.view(np.uint64)):
+            return decimals, integers
+    return None
+
+
+def _sections(payload: memoryview) -> Iterator[bytes]:
+    offset = 0
+    while offset < len(payload):
+        (length,) = _SECTION.unpack_from(payload, offset)
+        offset += _SECTION.size
+        yield bytes(payload[offset:offset + length])
+        offset += length
+
+
+@dataclass
+class SensorSeries:
+    """Measurements of one sensor as columns; missing values are NaN."""
+
+    sensor_id: str
+    timestamps: np.ndarray
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+    schema_version: int = 1
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def to_sensors(self) -> List[Sensor]:
+        names = [name for name in MEASUREMENT_COLUMNS if name in self.columns]
+        # NaN -> None while converting to Python objects column by column.
+        values = [
+            [None if value != value else value for value in self.columns[name].tolist()]
+            for name in names
+        ]
+        return [
+            Sensor(
+                sensor_id=self.sensor_id,
+                timestamp=timestamp,
+                schema_version=self.schema_version,
+                **dict(zip(names, row)),
+            )
+            for timestamp, *row in zip(self.timestamps.tolist(), *values)
+        ]
+
+
+class BatchCodec:
+    """Compact binary encoding of many measurements, the batch counterpart of `SensorSerializer`.
+
+    Measurements are grouped per sensor into frames of at most `frame_rows` rows.
+    A frame stores delta-of-delta timestamps as zigzag varints and, per column, a
+    null bitmap plus the present values, either as fixed-precision integers
+    (delta varints) when that is lossless or XOR-compressed. Frames are
+    self-delimiting and carry their time range, so encoded batches can be
+    concatenated into archives, decoded as a stream, and read for a time range
+    without decoding the frames outside it.
+    """
+
+    def __init__(self, frame_rows: int = 4096, max_decimals: int = 6) -> None:
+        if frame_rows < 1:
+            raise ValueError("frame_rows must be at least 1")
+        self.frame_rows = frame_rows
+        self.max_decimals = max_decimals
+
+    # -- encoding --------------------------------------------------------------
+
+    def encode(self, sensors: Iterable[Sensor]) -> bytes:
+        return b"".join(self._frames(sensors))
+
+    def write(self, sensors: Iterable[Sensor], stream: BinaryIO) -> int:
+        written = 0
+        for frame in self._frames(sensors):
+            stream.write(frame)
+            written += len(frame)
+        return written
+
+    def _frames(self, sensors: Iterable[Sensor]) -> Iterator[bytes]:
+        grouped: Dict[Tuple[str, int], List[Sensor]] = defaultdict(list)
+        for sensor in sensors:
+            grouped[(sensor.sensor_id, sensor.schema_version)].append(sensor)
+        for (sensor_id, schema_version), series in grouped.items():
+            series.sort(key=lambda s: s.timestamp)
+            timestamps = np.fromiter((s.timestamp for s in series), dtype=np.int64, count=len(series))
+            columns = {
+                name: np.array([getattr(s, name) for s in series], dtype=np.float64)
+                for name in MEASUREMENT_COLUMNS
+            }
+            for offset in range(0, len(series), self.frame_rows):
+                window = slice(offset, offset + self.frame_rows)
+                yield self.encode_series(
+                    SensorSeries(sensor_id, timestamps[window], {name: values[window] for name, values in columns.items()}, schema_version)
+                )
+
+    def encode_series(self, series: SensorSeries) -> bytes:
+        """Encode one frame; `series.timestamps` must be sorted."""
+        timestamps = np.asarray(series.timestamps, dtype=np.int64)
+        deltas = np.diff(timestamps)
+        dod = np.concatenate((deltas[:1], np.diff(deltas)))
+        sections = [_encode_varints(_zigzag(dod))]
+        for name in MEASUREMENT_COLUMNS:
+            sections.extend(self._encode_column(series.columns.get(name, np.full(len(timestamps), np.nan))))
+        payload = b"".join(_SECTION.pack(len(section)) + section for section in sections)
+        sensor_id = series.sensor_id.encode("utf-8")
+        header = _FRAME.pack(
+            _FRAME_MAGIC,
+            _FORMAT_VERSION,
+            series.schema_version,
+            len(sensor_id),
+            len(payload),
+            len(timestamps),
+            int(timestamps[0]) if len(timestamps) else 0,
+            int(timestamps[-1]) if len(timestamps) else 0,
+            zlib.crc32(payload),
+        )
+        return header + sensor_id + payload
+
+    def _encode_column(self, values: np.ndarray) -> List[bytes]:
+        present = ~np.isnan(values)
+        if not present.any():
+            return [bytes([_ALL_NULL])]
+        if present.all():
+            sections = [bytes([_ALL_PRESENT])]
+        else:
+            sections = [bytes([_BITMAP]) + np.packbits(present).tobytes()]
+        values = values[present]
+        fixed = _fixed_precision(values, self.max_decimals)
+        if fixed is not None:
+            decimals, scaled = fixed
+            steps = np.concatenate((scaled[:1], np.diff(scaled)))
+            sections.append(bytes([_FIXED, decimals]) + _encode_varints(_zigzag(steps)))
+        else:
+            sections.append(bytes([_XOR]) + _encode_xor(values))
+        return sections
+
+    # -- decoding --------------------------------------------------------------
+
+    def iter_series(
+        self,
+        stream: BinaryIO,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        sensor_ids: Optional[Iterable[str]] = None,
+    ) -> Iterator[SensorSeries]:
+        """Decode frames one at a time from `stream`, skipping frames outside the filters unread."""
+        wanted = set(sensor_ids) if sensor_ids is not None else None
+        seekable = stream.seekable() if hasattr(stream, "seekable") else False
+        while True:
+            header = stream.read(_FRAME.size)
+            if not header:
+                return
+            if len(header) < _FRAME.size:
+                raise ValueError("Truncated frame header")
+            magic, version, schema_version, id_length, payload_length, rows, first_ts, last_ts, crc = _FRAME.unpack(header)
+            if magic != _FRAME_MAGIC or version != _FORMAT_VERSION:
+                raise ValueError(f"Not a measurement batch frame (magic={magic!r}, version={version})")
+            sensor_id = stream.read(id_length).decode("utf-8")
+            outside = (start is not None and last_ts < start) or (end is not None and first_ts > end)
+            if outside or (wanted is not None and sensor_id not in wanted):
+                if seekable:
+                    stream.seek(payload_length, 1)
+                else:
+                    stream.read(payload_length)
+                continue
+            payload = stream.read(payload_length)
+            if len(payload) < payload_length or zlib.crc32(payload) != crc:
+                raise ValueError(f"Corrupt frame for sensor {sensor_id}")
+            series = self._decode_payload(sensor_id, schema_version, rows, first_ts, payload)
+            if start is not None or end is not None:
+                mask = np.ones(rows, dtype=bool)
+                if start is not None:
+                    mask &= series.timestamps >= start
+                if end is not None:
+                    mask &= series.timestamps <= end
+                series = SensorSeries(
+                    sensor_id,
+                    series.timestamps[mask],
+                    {name: values[mask] for name, values in series.columns.items()},
+                    schema_version,
+                )
+            yield series
+
+    def decode_series(self, payload: bytes, **filters) -> List[SensorSeries]:
+        return list(self.iter_series(io.BytesIO(payload), **filters))
+
+    def decode(self, payload: bytes, **filters) -> List[Sensor]:
+        return [sensor for series in self.decode_series(payload, **filters) for sensor in series.to_sensors()]
+
+    def _decode_payload(self, sensor_id: str, schema_version: int, rows: int, first_ts: int, payload: bytes) -> SensorSeries:
+        sections = _sections(memoryview(payload))
+        dod = _unzigzag(_decode_varints(next(sections), max(rows - 1, 0)))
+        timestamps = first_ts + np.concatenate(([0], np.cumsum(np.cumsum(dod)))).astype(np.int64)
+        columns: Dict[str, np.ndarray] = {}
+        for name in MEASUREMENT_COLUMNS:
+            presence = next(sections)
+            values = np.full(rows, np.nan)
+            if presence[0] == _ALL_NULL:
+                columns[name] = values
+                continue
+            if presence[0] == _BITMAP:
+                present = np.unpackbits(np.frombuffer(presence, dtype=np.uint8, offset=1), count=rows).astype(bool)
+            else:
+                present = np.ones(rows, dtype=bool)
+            encoded = next(sections)
+            count = int(present.sum())
+            if encoded[0] == _FIXED:
+                scaled = np.cumsum(_unzigzag(_decode_varints(encoded[2:], count)))
+                values[present] = scaled / (10.0 ** encoded[1])
+            elif encoded[0] == _XOR:
+                values[present] = _decode_xor(encoded[1:], count)
+            else:
+                raise ValueError(f"Unknown value encoding {encoded[0]} in frame for sensor {sensor_id}")
+            columns[name] = values
+        return SensorSeries(sensor_id, timestamps, columns, schema_version)
@@ -1,125 +1,406 @@
+import contextvars
 import logging
-from typing import Dict, List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
 
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, Query
+from functools import lru_cache
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
 
 from .api_client import APIClient
 from .featurizer import Featurizer
-from .measurement_parser import flatten_measurements
-from ..entities.feature_vector_response import FeatureVectorResponse
+from .fetch_planner import plan_fetch
+from .lecture_index import load_lecture_index
+from .measurement_parser import MEASUREMENT_TYPES, flatten_measurements, merge_measurement_blocks
+from ..entities.feature_matrix_result import FeatureMatrixResult
 from ..entities.feature_vectors_result import FeatureVectorsResult
 from ..entities.sensor import Sensor
-from ..settings import get_settings
+from ..settings import Settings, get_settings
+from ..utils import deadline
+from ..utils.deadline import DeadlineExceeded
+from ..utils.fast_json import FastJSONResponse
+from ..utils.logging_setup import debug_sampled
+from ..utils.metrics import MEASUREMENTS_PER_REQUEST, SENSORS_PER_REQUEST, observe_stage
+from ..utils.profiling import profiled
+from ..utils.sensor_selection import resolve_sensor_selection, selection_key
+from ..utils.shared_cache import SharedCache, open_shared_cache
+from ..utils.sharding import HashRing, resolve_shard_index
 
 logger = logging.getLogger(__name__)
 
 
 class FeatureEndpoint:
-    def __init__(self, client: APIClient, featurizer: Featurizer) -> None:
+    def __init__(
+        self,
+        client: APIClient,
+        featurizer: Featurizer,
+        settings: Optional[Settings] = None,
+        cache: Optional[SharedCache] = None,
+    ) -> None:
         self.client = client
         self.featurizer = featurizer
-        logger.info("FeatureEndpoint initialized")
+        self.settings = settings or get_settings()
+        self.cache = cache
+        self.ring = HashRing(self.settings.shard_count)
+        self.shard_index = resolve_shard_index(self.settings.shard_index, self.settings.shard_count)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.settings.upstream_max_concurrency,
+            thread_name_prefix="upstream-fetch",
+        )
+        self._sensor_ids: List[str] = []
+        self._sensor_ids_expire_at = 0.0
+        self._sensor_ids_lock = threading.Lock()
+        logger.info(
+            "FeatureEndpoint initialized shard=%s/%s shared_cache=%s",
+            self.shard_index,
+            self.ring.shard_count,
+            cache.path if cache else "-",
+        )
+
+    @property
+    def sharded(self) -> bool:
+        return self.ring.shard_count > 1
 
-    def _fetch_measurements(self, start: int, end: int, sensor_id: Optional[str]) -> List[Sensor]:
-        logger.debug("Starting measurement fetch for sensor_id=%s, start=%s, end=%s", sensor_id or "*", start, end)
+    def _known_sensor_ids(self) -> List[str]:
+        with self._sensor_ids_lock:
+            if time.monotonic() >= self._sensor_ids_expire_at:
+                try:
+                    self._sensor_ids = list(self.client.get_sensors())
+                except DeadlineExceeded:
+                    raise
+                except Exception as exc:
+                    if not self._sensor_ids:
+                        logger.error("Failed to fetch sensor list from API: %s", exc)
+                        raise HTTPException(status_code=502, detail=f"Failed to fetch sensor list from external API: {exc}") from exc
+                    logger.warning("Sensor list refresh failed, keeping %d cached sensors: %s", len(self._sensor_ids), exc)
+                self._sensor_ids_expire_at = time.monotonic() + self.settings.sensor_list_ttl_seconds
+            return self._sensor_ids
+
+    def owned_sensor_ids(self, shard: int) -> List[str]:
+        return self.ring.owned_by(shard, self._known_sensor_ids())
+
+    def _projected_types(self, measurement_types: Optional[Sequence[str]]) -> Optional[Tuple[str, ...]]:
+        """Types to fetch one by one, or None when the all-types endpoints are the better fit."""
+        if not measurement_types or set(measurement_types) >= set(MEASUREMENT_TYPES):
+            return None
+        return tuple(measurement_types)
+
+    def _fetch_blocks(
+        self,
+        start: int,
+        end: int,
+        sensor_id: Optional[str],
+        sensor_type: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """One upstream request: all or one sensor, all or one measurement type."""
         try:
-            if sensor_id:
-                logger.debug("Fetching measurements for specific sensor: %s", sensor_id)
+            if sensor_id and sensor_type:
+                payload = self.client.get_sensor_measurements_by_type(sensor_id, sensor_type, start=start, end=end)
+            elif sensor_id:
                 payload = self.client.get_sensor_measurements(sensor_id, start=start, end=end)
-                data_key = "requestData" if isinstance(payload, dict) and "requestData" in payload else "responseData"
-                logger.debug("Received payload for sensor %s, using data_key: %s", sensor_id, data_key)
+            elif sensor_type:
+                payload = self.client.get_all_measurements_by_type(sensor_type, start=start, end=end)
             else:
-                logger.debug("Fetching all measurements")
                 payload = self.client.get_all_measurements(start=start, end=end)
-                data_key = "responseData"
-                logger.debug("Received payload for all sensors, using data_key: %s", data_key)
+        except DeadlineExceeded:
+            raise
         except Exception as exc:
-            logger.error("Failed to fetch measurements from API (sensor_id=%s, start=%s, end=%s): %s", 
-                        sensor_id or "*", start, end, str(exc))
+            logger.error("Failed to fetch measurements from API (sensor_id=%s, type=%s, start=%s, end=%s): %s",
+                        sensor_id or "*", sensor_type or "*", start, end, str(exc))
             logger.warning("API appears to be unreachable or returned an error. Check network connectivity and API status.")
             raise HTTPException(status_code=502, detail=f"Failed to fetch measurements from external API: {str(exc)}") from exc
-        
-        sensors = flatten_measurements(payload, data_key=data_key)
+        if not isinstance(payload, dict):
+            return payload
+        data_key = "requestData" if "requestData" in payload else "responseData"
+        debug_sampled(logger, "Received payload for sensor=%s type=%s, using data_key: %s", sensor_id or "*", sensor_type or "*", data_key)
+        return payload.get(data_key, [])
+
+    def _flatten(self, blocks: List[Dict[str, Any]], projected: bool) -> List[Sensor]:
+        with observe_stage("flatten_measurements"):
+            return flatten_measurements(merge_measurement_blocks(blocks) if projected else blocks)
+
+    def _fetch_measurements(
+        self,
+        start: int,
+        end: int,
+        sensor_id: Optional[str],
+        measurement_types: Optional[Sequence[str]] = None,
+    ) -> List[Sensor]:
+        types = self._projected_types(measurement_types)
+        if types is None:
+            blocks = self._fetch_blocks(start, end, sensor_id)
+        else:
+            # One request per needed type, run concurrently and joined by (sensor, timestamp).
+            futures = [
+                self._pool.submit(contextvars.copy_context().run, self._fetch_blocks, start, end, sensor_id, sensor_type)
+                for sensor_type in types
+            ]
+            try:
+                blocks = [block for future in futures for block in future.result(timeout=deadline.remaining())]
+            except FuturesTimeoutError as exc:
+                for future in futures:
+                    future.cancel()
+                raise DeadlineExceeded("upstream_fetch") from exc
+        sensors = self._flatten(blocks, projected=types is not None)
         logger.debug(
-            "Fetched %s normalized measurements (sensor_id=%s start=%s end=%s)",
+            "Fetched %s normalized measurements (sensor_id=%s types=%s start=%s end=%s)",
             len(sensors),
             sensor_id or "*",
+            ",".join(types) if types else "*",
             start,
             end,
         )
         return sensors
 
-    def compute_vectors(self, start: int, end: int, sensor_id: Optional[str]) -> FeatureVectorsResult:
+    def _fetch_sensor_subset(
+        self,
+        start: int,
+        end: int,
+        sensor_ids: Sequence[str],
+        measurement_types: Optional[Sequence[str]] = None,
+    ) -> List[Sensor]:
+        """Fetch the given sensors (per needed type) concurrently; sensors whose fetch fails are skipped."""
+        types = self._projected_types(measurement_types)
+        futures = {
+            # Each task runs in its own copy of the request context (request id, Server-Timing).
+            self._pool.submit(contextvars.copy_context().run, self._fetch_blocks, start, end, sensor_id, sensor_type): sensor_id
+            for sensor_id in sensor_ids
+            for sensor_type in (types or (None,))
+        }
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        failed: Set[str] = set()
+        try:
+            for future in as_completed(futures, timeout=deadline.remaining()):
+                try:
+                    results.setdefault(futures[future], []).extend(future.result())
+                except DeadlineExceeded:
+                    raise
+                except HTTPException:
+                    failed.add(futures[future])
+        except (DeadlineExceeded, FuturesTimeoutError) as exc:
+            # Requests not yet started are dropped; running ones end at their capped timeout.
+            cancelled = sum(future.cancel() for future in futures)
+            logger.warning("Request deadline passed with %d upstream fetches cancelled", cancelled)
+            if isinstance(exc, DeadlineExceeded):
+                raise
+            raise DeadlineExceeded("upstream_fetch") from exc
+        if failed:
+            logger.warning("Skipping %d of %d sensors after failed fetches: %s", len(failed), len(sensor_ids), sorted(failed))
+            if len(failed) == len(sensor_ids):
+                raise HTTPException(status_code=502, detail="Failed to fetch measurements from external API")
+        # A sensor missing one of its types is dropped entirely rather than featurized on partial data.
+        blocks = [block for sensor_id, sensor_blocks in results.items() if sensor_id not in failed for block in sensor_blocks]
+        return self._flatten(blocks, projected=types is not None)
+
+    def _fetch_selection(
+        self,
+        start: int,
+        end: int,
+        sensor_ids: Sequence[str],
+        measurement_types: Optional[Sequence[str]] = None,
+    ) -> List[Sensor]:
+        """Fetch a sensor subset the cheaper way for its size.
+
+        Small subsets are fetched with concurrent per-sensor requests; above
+        `subset_fetch_max_sensors` one all-sensors request is cheaper than many
+        round trips, and the other sensors are dropped before featurization.
+        Sharded producers always fetch per sensor, so replicas never download the
+        whole payload each.
+        """
+        if self.sharded or len(sensor_ids) <= self.settings.subset_fetch_max_sensors:
+            return self._fetch_sensor_subset(start, end, sensor_ids, measurement_types)
+        wanted = set(sensor_ids)
+        return [sensor for sensor in self._fetch_measurements(start, end, None, measurement_types) if sensor.sensor_id in wanted]
+
+    def compute_vectors(
+        self,
+        start: int,
+        end: int,
+        sensor_id: Optional[str],
+        shard: Optional[int] = None,
+        sensor_ids: Optional[Sequence[str]] = None,
+        history: bool = False,
+        measurement_types: Optional[Sequence[str]] = None,
+    ) -> FeatureMatrixResult:
+        """Feature vectors of one sensor, a sensor subset, this shard's sensors or all sensors.
+
+        By default one vector per sensor at its latest measurement up to `end`; with
+        `history` one vector per measurement in `[start, end]`. With
+        `measurement_types` only those types are fetched; features depending on other
+        types are then computed from missing values and should be ignored.
+        """
+        if sensor_id and sensor_ids is None:
+            sensor_ids = [sensor_id]
         logger.info(
-            "Computing feature vectors sensor_id=%s window_start=%s window_end=%s",
-            sensor_id or "*",
+            "Computing feature vectors sensors=%s window_start=%s window_end=%s history=%s",
+            len(sensor_ids) if sensor_ids is not None else "*",
+            start,
+            end,
+            history,
+        )
+        plan = plan_fetch(
             start,
             end,
+            self.featurizer.max_lookback_seconds,
+            history=history,
+            slack_seconds=self.settings.fetch_slack_seconds,
         )
-        sensors = self._fetch_measurements(start, end, sensor_id)
-        logger.debug("Fetched %d sensors for processing", len(sensors))
+        logger.debug("Planned upstream fetch %s..%s (%ss)", plan.fetch_start, plan.fetch_end, plan.seconds)
+        if sensor_ids is not None:
+            sensors = self._fetch_selection(plan.fetch_start, plan.fetch_end, sensor_ids, measurement_types)
+        elif self.sharded:
+            # Only this shard's sensors are fetched and featurized; other replicas cover the rest.
+            owned = self.owned_sensor_ids(self.shard_index if shard is None else shard)
+            logger.debug("Shard %s owns %d sensors", self.shard_index if shard is None else shard, len(owned))
+            sensors = self._fetch_selection(plan.fetch_start, plan.fetch_end, owned, measurement_types) if owned else []
+        else:
+            sensors = self._fetch_measurements(plan.fetch_start, plan.fetch_end, None, measurement_types)
+        MEASUREMENTS_PER_REQUEST.observe(len(sensors))
         if not sensors:
-            logger.warning("No measurements found for the requested window (sensor_id=%s, start=%s, end=%s)", sensor_id or "*", start, end)
+            logger.warning("No measurements found for the requested window (sensors=%s, start=%s, end=%s)", sensor_ids or "*", start, end)
             raise HTTPException(status_code=404, detail="No measurements found for the requested window")
 
-        logger.debug("Extracting features from %d sensors", len(sensors))
-        vectors = self.featurizer.extract_features(sensors)
-        logger.debug("Extracted %d raw feature vectors", len(vectors))
-        if sensor_id:
-            logger.debug("Filtering vectors for sensor_id: %s", sensor_id)
-            vectors = [vector for vector in vectors if vector.sensor_id == sensor_id]
-            logger.debug("After filtering: %d vectors for sensor %s", len(vectors), sensor_id)
-        if not vectors:
-            logger.warning("Unable to build feature vectors for the requested sensors (sensor_id=%s)", sensor_id or "*")
+        deadline.check("extract_features")
+        with observe_stage("extract_features"):
+            if history:
+                matrix = self.featurizer.extract_history(sensors, start, end)
+            else:
+                matrix = self.featurizer.extract_matrix(sensors)
+        SENSORS_PER_REQUEST.observe(len(matrix))
+        logger.debug("Extracted %d raw feature vectors", len(matrix))
+        if sensor_ids is not None:
+            # Per-sensor payloads may carry other sensors; keep the response to the selection.
+            matrix = matrix.filter_sensors(sensor_ids)
+        if not len(matrix):
+            logger.warning("Unable to build feature vectors for the requested sensors (sensors=%s)", sensor_ids or "*")
             raise HTTPException(status_code=404, detail="Unable to build feature vectors for the requested sensors")
-        logger.debug("Converting %d vectors to response format", len(vectors))
-        feature_vectors = [FeatureVectorResponse.from_model(vector) for vector in vectors]
-        logger.debug("Converted to %d feature vector responses", len(feature_vectors))
-        current_sensors = self._latest_measurements(sensors, sensor_id)
-        logger.debug("Identified %d current sensors", len(current_sensors))
-        result = FeatureVectorsResult(feature_vectors=feature_vectors, current_sensors=current_sensors)
-        logger.info("Successfully computed %d feature vectors for sensor_id=%s", len(feature_vectors), sensor_id or "*")
-        return result
+        current_sensors = self._latest_measurements(sensors, sensor_ids)
+        partial_windows = self.featurizer.partial_windows(sensors, matrix, self.settings.partial_window_tolerance_seconds)
+        if partial_windows:
+            logger.info("%d of %d feature vectors were computed on partial windows", len(partial_windows), len(matrix))
+        logger.info("Successfully computed %d feature vectors", len(matrix))
+        return FeatureMatrixResult(feature_matrix=matrix, current_sensors=current_sensors, partial_windows=partial_windows)
+
+    def cached_vectors(
+        self,
+        start: int,
+        end: int,
+        sensor_ids: Optional[Sequence[str]],
+        shard: Optional[int] = None,
+        latest: bool = False,
+        history: bool = False,
+        measurement_types: Optional[Sequence[str]] = None,
+    ) -> FeatureMatrixResult:
+        """`compute_vectors` through the shared cache, so one worker per pod refreshes a window.
+
+        Requests for the default (latest) window share one entry regardless of their exact
+        start and end; explicit windows are cached under their bounds.
+        """
+        def compute() -> FeatureMatrixResult:
+            return self.compute_vectors(
+                start, end, None, shard=shard, sensor_ids=sensor_ids, history=history, measurement_types=measurement_types
+            )
+
+        if self.cache is None:
+            return compute()
+        window = "latest" if latest and not history else f"{'history' if history else 'window'}:{start}-{end}"
+        types = self._projected_types(measurement_types)
+        key = (
+            f"vectors:{window}:{selection_key(sensor_ids)}:{self.shard_index if shard is None else shard}"
+            f":{','.join(types) if types else '*'}"
+        )
+        return self.cache.get_or_refresh(key, compute, cache="feature_vectors")
 
     @staticmethod
-    def _latest_measurements(sensors: List[Sensor], sensor_id: Optional[str]) -> List[Sensor]:
-        logger.debug("Finding latest measurements from %d sensors (sensor_id filter: %s)", len(sensors), sensor_id or "*")
+    def _latest_measurements(sensors: List[Sensor], sensor_ids: Optional[Sequence[str]]) -> List[Sensor]:
         latest: Dict[str, Sensor] = {}
         for sensor in sensors:
             current = latest.get(sensor.sensor_id)
             if current is None or sensor.timestamp > current.timestamp:
                 latest[sensor.sensor_id] = sensor
-        logger.debug("Found latest measurements for %d unique sensors", len(latest))
-        if sensor_id:
-            selected = latest.get(sensor_id)
-            result = [selected] if selected else []
-            logger.debug("Filtered for sensor_id %s: %d sensors returned", sensor_id, len(result))
-            return result
-        result = list(latest.values())
-        logger.debug("Returning all latest sensors: %d", len(result))
-        return result
+        if sensor_ids is not None:
+            return [latest[sensor_id] for sensor_id in sensor_ids if sensor_id in latest]
+        return list(latest.values())
+
+
+@lru_cache(maxsize=1)
+def get_endpoint() -> FeatureEndpoint:
+    """Build the endpoint on first use (normally the startup warm-up) instead of at import."""
+    settings = get_settings()
+    lecture_index = load_lecture_index(settings) if settings.lecture_features_enabled else None
+    return FeatureEndpoint(
+        client=APIClient(),
+        featurizer=Featurizer(lecture_index=lecture_index, imputation=settings.feature_imputation),
+        cache=open_shared_cache("feature-producer"),
+    )
+
+
+def warm_up(minutes: int = 180) -> None:
+    """Featurize and serialize one synthetic sensor so the first real request is not the slow one."""
+    endpoint = get_endpoint()
+    end = int(time.time())
+    sensors = [
+        Sensor(
+            sensor_id="warmup",
+            timestamp=end - (minutes - idx) * 60,
+            humidity=45.0,
+            temperature=21.0,
+            co2=600.0 + idx,
+            motion=float(idx % 2),
+            light=300.0,
+        )
+        for idx in range(minutes)
+    ]
+    matrix = endpoint.featurizer.extract_matrix(sensors)
+    jsonable_encoder(FeatureVectorsResult.from_matrix_result(
+        FeatureMatrixResult(feature_matrix=matrix, current_sensors=endpoint._latest_measurements(sensors, None))
+    ))
 
 
 router = APIRouter()
+# Field names of the response (`sensor_id`, not the upstream `sensorId`); shared by both JSON paths.
+RESPONSE_BY_ALIAS = False
 settings = get_settings()
-endpoint = FeatureEndpoint(client=APIClient(), featurizer=Featurizer())
 
 
-@router.get("/feature-vectors", response_model=FeatureVectorsResult, response_model_by_alias=False)
+@router.get("/feature-vectors", response_model=FeatureVectorsResult, response_model_by_alias=RESPONSE_BY_ALIAS)
+@profiled
 def get_feature_vectors(
+    response: Response,
     start: Optional[int] = Query(None, description="Window start timestamp (epoch seconds)"),
     end: Optional[int] = Query(None, description="Window end timestamp (epoch seconds)"),
     sensor_id: Optional[str] = Query(None, description="Optional sensor ID filter"),
+    sensor_ids: Optional[List[str]] = Query(
+        None,
+        description="Sensor IDs to include (repeat the parameter or separate with commas)",
+    ),
+    group: Optional[str] = Query(None, description="Named sensor group from the sensor_groups setting"),
+    history: bool = Query(
+        False,
+        description="Return a vector for every measurement in the window instead of only the latest per sensor",
+    ),
+    features: Optional[List[str]] = Query(
+        None,
+        description="Features the caller needs (repeat or comma separated); only the measurement types they use are fetched",
+    ),
+    shard: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Shard whose sensors to compute (defaults to this replica's shard); used for failover",
+    ),
+    endpoint: FeatureEndpoint = Depends(get_endpoint),
 ):
-    logger.info(
+    logger.debug(
         "GET /feature-vectors start=%s end=%s sensor_id=%s",
         start,
         end,
         sensor_id,
     )
     now = int(datetime.now(tz=timezone.utc).timestamp())
-    logger.debug("Current timestamp: %s", now)
     window_end = end or now
     default_window_seconds = settings.default_time_window_hours * 60 * 60
     window_start = start or (window_end - default_window_seconds)
@@ -128,5 +409,43 @@ def get_feature_vectors(
     if window_start >= window_end:
         logger.warning("Rejected request due to invalid window start=%s end=%s", window_start, window_end)
         raise HTTPException(status_code=400, detail="start must be before end")
-    logger.debug("Calling compute_vectors with start=%s, end=%s, sensor_id=%s", window_start, window_end, sensor_id)
-    return endpoint.compute_vectors(start=window_start, end=window_end, sensor_id=sensor_id)
+    if history and window_end - window_start > settings.history_max_window_hours * 60 * 60:
+        raise HTTPException(
+            status_code=400,
+            detail=f"history windows are limited to {settings.history_max_window_hours} hours",
+        )
+    if shard is not None and shard >= endpoint.ring.shard_count:
+        raise HTTPException(status_code=400, detail=f"shard must be below {endpoint.ring.shard_count}")
+    try:
+        selection = resolve_sensor_selection(sensor_id, sensor_ids, group, settings.sensor_groups)
+        measurement_types = (
+            endpoint.featurizer.required_measurements(
+                part.strip() for entry in features for part in entry.split(",") if part.strip()
+            )
+            if features
+            else None
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    logger.debug("Calling compute_vectors with start=%s, end=%s, sensors=%s", window_start, window_end, selection or "*")
+    result = endpoint.cached_vectors(
+        start=window_start,
+        end=window_end,
+        sensor_ids=selection,
+        shard=shard,
+        latest=start is None and end is None,
+        history=history,
+        measurement_types=measurement_types,
+    )
+    if endpoint._projected_types(measurement_types) is not None:
+        # Columns of other types were computed without data; tell the caller which ones are valid.
+        response.headers["X-Measurement-Types"] = ",".join(measurement_types)
+    response.headers["X-Producer-Shard"] = f"{endpoint.shard_index}/{endpoint.ring.shard_count}"
+    with observe_stage("serialize_response"):
+        if settings.fast_json_responses:
+            # A returned Response replaces the injected one, so its headers are passed on explicitly.
+            return FastJSONResponse(
+                FeatureVectorsResult.payload_from_matrix_result(result, by_alias=RESPONSE_BY_ALIAS),
+                headers=dict(response.headers),
+            )
+        return FeatureVectorsResult.from_matrix_result(result)
@@ -1,57 +1,379 @@
+from __future__ import annotations
+
+import logging
 from collections import defaultdict
-from typing import Any, Dict, List, Sequence
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-import pandas as pd
+import numpy as np
 
 from ..entities.sensor import Sensor
+from ..entities.feature_matrix import FeatureMatrix
 from ..entities.feature_vector import FeatureVector
+from ..entities.partial_window_report import PartialWindowReport
+from .lecture_index import LectureIndex
+from .measurement_parser import MEASUREMENT_TYPES
+from ..utils import deadline
+from ..utils.metrics import FEATURES_IMPUTED
 from datetime import datetime
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
 
 class Featurizer:
+    schema_version: int = 1
+    # Look-back windows used by _build_features; the longest one bounds how much
+    # history a feature vector needs (see fetch_planner).
+    WINDOW_MINUTES = (5, 10, 30, 60, 120, 180)
+    # Measurement types each feature is computed from; features not listed only
+    # use the timestamp (time-based and lecture features).
+    FEATURE_MEASUREMENTS: Dict[str, Tuple[str, ...]] = {
+        "humidity": ("humidity",),
+        "temperature": ("temperature",),
+        "co2": ("co2",),
+        "motion": ("motion",),
+        "light": ("light",),
+        "avg_humidity_60m": ("humidity",),
+        "avg_humidity_120m": ("humidity",),
+        "avg_humidity_180m": ("humidity",),
+        "std_humidity": ("humidity",),
+        "avg_temperature": ("temperature",),
+        "max_temperature": ("temperature",),
+        "min_temperature": ("temperature",),
+        "std_temperature": ("temperature",),
+        "avg_co2_60m": ("co2",),
+        "max_co2_60m": ("co2",),
+        "min_co2_60m": ("co2",),
+        "std_co2_60m": ("co2",),
+        "residual_co2": ("co2",),
+        "delta_5m_co2": ("co2",),
+        "delta_30m_co2": ("co2",),
+        "delta_60m_co2": ("co2",),
+        "avg_motion": ("motion",),
+        "max_motion": ("motion",),
+        "std_motion": ("motion",),
+        "count_motion_10m": ("motion",),
+        "count_motion_30m": ("motion",),
+        "recent_motion_10m": ("motion",),
+        "light_level": ("light",),
+        "daylight_factor": ("light",),
+        "residual_co2_recent_motion": ("co2", "motion"),
+        "rising_co2_recent_motion": ("co2", "motion"),
+        "light_recent_motion": ("light", "motion"),
+        "temperature_humidity": ("temperature", "humidity"),
+        "motion_off_hours": ("motion",),
+        "light_on_at_night": ("light",),
+    }
+
+    # How missing readings are filled: "zero" is what the shipped model was trained on;
+    # "carry_forward" needs a model trained with it (recorded in its hmm_config.pkl).
+    IMPUTATIONS = ("zero", "carry_forward")
+    # Window levels that take the carried-forward reading when their window holds no value.
+    IMPUTE_FROM_CURRENT: Dict[str, str] = {
+        "avg_humidity_60m": "humidity",
+        "avg_humidity_120m": "humidity",
+        "avg_humidity_180m": "humidity",
+        "avg_temperature": "temperature",
+        "max_temperature": "temperature",
+        "min_temperature": "temperature",
+        "avg_co2_60m": "co2",
+        "max_co2_60m": "co2",
+        "min_co2_60m": "co2",
+        "avg_motion": "motion",
+        "max_motion": "motion",
+    }
+
+    def __init__(self, lecture_index: Optional[LectureIndex] = None, imputation: str = "zero") -> None:
+        if imputation not in self.IMPUTATIONS:
+            raise ValueError(f"Unknown imputation {imputation!r}; expected one of {', '.join(self.IMPUTATIONS)}")
+        self.imputation = imputation
+        # With a lecture index the schedule columns are appended (schema version 2).
+        self.lecture_index = lecture_index
+        if lecture_index is not None:
+            self.schema_version = 2
+
+    @property
+    def max_lookback_seconds(self) -> int:
+        return max(self.WINDOW_MINUTES) * 60
+
+    def required_measurements(self, features: Iterable[str]) -> Tuple[str, ...]:
+        """Measurement types (in upstream order) the given features are computed from."""
+        features = list(features)
+        unknown = sorted(set(features) - set(FeatureMatrix.columns_for(self.schema_version)))
+        if unknown:
+            raise ValueError(f"Unknown features: {unknown}")
+        needed = {kind for feature in features for kind in self.FEATURE_MEASUREMENTS.get(feature, ())}
+        return tuple(kind for kind in MEASUREMENT_TYPES if kind in needed)
+
     def extract_features(self, sensors: Sequence[Sensor]) -> List[FeatureVector]:
+        return self.extract_matrix(sensors).to_vectors()
+
+    def extract_matrix(self, sensors: Sequence[Sensor]) -> FeatureMatrix:
+        """One vector per sensor at its latest measurement."""
+        columns = FeatureMatrix.columns_for(1)  # schedule columns are appended in _to_matrix
+        sensor_ids: List[str] = []
+        timestamps: List[int] = []
+        rows: List[List[float]] = []
+        for sensor_id, sensor_series, df, current in self._series_frames(sensors):
+            current_sensor = sensor_series[-1]
+            features = self._build_features(current_sensor, df, current[-1])
+            sensor_ids.append(sensor_id)
+            timestamps.append(current_sensor.timestamp)
+            rows.append([features[col] for col in columns])
+        return self._to_matrix(sensor_ids, timestamps, rows)
+
+    def extract_history(self, sensors: Sequence[Sensor], start: int, end: int) -> FeatureMatrix:
+        """One vector per measurement in [start, end], each computed from the look-back before it.
+
+        `sensors` should reach `max_lookback_seconds` before `start` so the first
+        vectors see complete windows.
+        """
+        columns = FeatureMatrix.columns_for(1)  # schedule columns are appended in _to_matrix
+        sensor_ids: List[str] = []
+        timestamps: List[np.ndarray] = []
+        blocks: List[np.ndarray] = []
+        for sensor_id, _, df, current in self._series_frames(sensors):
+            deadline.check("extract_features")
+            series_ts = df["timestamp"].to_numpy(dtype=np.int64)
+            selected = np.flatnonzero((series_ts >= start) & (series_ts <= end))
+            if not len(selected):
+                continue
+            features = self._history_features(df, selected, current)
+            sensor_ids.extend([sensor_id] * len(selected))
+            timestamps.append(series_ts[selected])
+            blocks.append(np.column_stack([features[col] for col in columns]))
+        if not blocks:
+            return self._to_matrix([], [], [])
+        return self._to_matrix(sensor_ids, np.concatenate(timestamps).tolist(), np.concatenate(blocks))
+
+    def partial_windows(
+        self,
+        sensors: Sequence[Sensor],
+        matrix: FeatureMatrix,
+        tolerance_seconds: int,
+    ) -> List[PartialWindowReport]:
+        """Vectors whose look-back windows reach before the sensor's first available measurement."""
+        first_seen: Dict[str, int] = {}
+        for sensor in sensors:
+            seen = first_seen.get(sensor.sensor_id)
+            if seen is None or sensor.timestamp < seen:
+                first_seen[sensor.sensor_id] = sensor.timestamp
+        if not len(matrix):
+            return []
+        first = np.fromiter((first_seen[sensor_id] for sensor_id in matrix.sensor_ids), dtype=np.int64, count=len(matrix))
+        windows = np.asarray(self.WINDOW_MINUTES, dtype=np.int64)
+        # (rows, windows): the window starts before the data does, beyond the sampling tolerance.
+        partial = first[:, None] > matrix.timestamps[:, None] - windows[None, :] * 60 + tolerance_seconds
+        return [
+            PartialWindowReport(
+                sensor_id=matrix.sensor_ids[row],
+                timestamp=int(matrix.timestamps[row]),
+                window_minutes=windows[partial[row]].tolist(),
+            )
+            for row in np.flatnonzero(partial.any(axis=1))
+        ]
+
+    def _series_frames(self, sensors: Sequence[Sensor]) -> Iterator[Tuple[str, List[Sensor], pd.DataFrame, np.ndarray]]:
+        """Per sensor its time-ordered readings, as a frame and with the current reading of each type per row.
+
+        The current readings (columns in `MEASUREMENT_TYPES` order) are filled for
+        all sensors at once according to `imputation`.
+        """
+        # Imported on first use (the startup warm-up) so the service binds its port sooner.
+        import pandas as pd
+
         grouped: Dict[str, List[Sensor]] = defaultdict(list)
         for sensor in sensors:
             grouped[sensor.sensor_id].append(sensor)
+        series = [(sensor_id, sorted(sensor_series, key=lambda s: s.timestamp)) for sensor_id, sensor_series in grouped.items()]
+        ordered = [sensor for _, sensor_series in series for sensor in sensor_series]
+        if not ordered:
+            return
+        # Float columns built directly: None becomes NaN, also for a type missing from every reading.
+        timestamps = np.fromiter((s.timestamp for s in ordered), dtype=np.int64, count=len(ordered))
+        values = np.empty((len(ordered), len(MEASUREMENT_TYPES)))
+        for idx, kind in enumerate(MEASUREMENT_TYPES):
+            values[:, idx] = np.array([getattr(s, kind) for s in ordered], dtype=np.float64)
+        bounds = np.cumsum([0] + [len(sensor_series) for _, sensor_series in series])
+        current = self._current_readings(timestamps, values, bounds)
+        for (sensor_id, sensor_series), lo, hi in zip(series, bounds[:-1].tolist(), bounds[1:].tolist()):
+            columns: Dict[str, Any] = {"timestamp": timestamps[lo:hi]}
+            for idx, kind in enumerate(MEASUREMENT_TYPES):
+                columns[kind] = values[lo:hi, idx]
+            yield sensor_id, sensor_series, pd.DataFrame(columns), current[lo:hi]
 
-        feature_vectors: List[FeatureVector] = []
-        for sensor_id, sensor_series in grouped.items():
-            if not sensor_series:
-                continue
-            sensor_series.sort(key=lambda s: s.timestamp)
-            df = pd.DataFrame([self._sensor_to_dict(s) for s in sensor_series])
-            current_sensor = sensor_series[-1]
-            feature_vectors.append(self._build_vector(current_sensor, df))
-        return feature_vectors
+    def _current_readings(self, timestamps: np.ndarray, values: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+        """The direct value of every reading and type; missing ones are 0, or with "carry_forward" the latest earlier one.
 
-    @staticmethod
-    def _sensor_to_dict(sensor: Sensor) -> Dict[str, Any]:
-        dump = getattr(sensor, "model_dump", None)
-        if callable(dump):
-            return dump()
-        return sensor.dict()
+        One forward fill over the readings of all sensors (sorted by sensor, then
+        time, with `bounds` between the sensors): each missing value takes the
+        latest value of its type from the same sensor within the longest look-back,
+        else 0.
+        """
+        if self.imputation == "zero":
+            return np.nan_to_num(values, nan=0.0)
+        positions = np.arange(len(values))[:, None]
+        latest = np.maximum.accumulate(np.where(np.isnan(values), -1, positions), axis=0)
+        first_of_sensor = np.repeat(bounds[:-1], np.diff(bounds))[:, None]
+        recent = timestamps[np.maximum(latest, 0)] >= timestamps[:, None] - self.max_lookback_seconds
+        found = (latest >= first_of_sensor) & recent
+        return np.where(found, np.take_along_axis(values, np.maximum(latest, 0), axis=0), 0.0)
+
+    def _to_matrix(self, sensor_ids: List[str], timestamps: List[int], rows: List[List[float]]) -> FeatureMatrix:
+        if self.lecture_index is not None and len(rows):
+            # Looked up for all rows at once, so a long backfill costs one binary search per room.
+            scheduled, minutes_to_next = self.lecture_index.lookup(np.asarray(sensor_ids, dtype=object), np.asarray(timestamps))
+            rows = np.column_stack([np.asarray(rows, dtype=np.float64), scheduled, minutes_to_next])
+        matrix = FeatureMatrix.from_rows(sensor_ids, timestamps, rows, self.schema_version)
+        self._impute(matrix)
+        return matrix
+
+    def _impute(self, matrix: FeatureMatrix) -> None:
+        """Fill in features a window could not provide; JSON cannot carry NaN.
+
+        A window without any value of its measurement (e.g. the last co2 reading
+        is older than the window) yields NaN. It becomes 0, which the shipped model
+        was trained on. With "carry_forward" window levels (mean, min, max) take the
+        carried-forward current reading instead, so the vector looks like a steady
+        sensor. Every filled value is counted per feature.
+        """
+        missing = ~np.isfinite(matrix.values)
+        if not missing.any():
+            return
+        fill = np.zeros_like(matrix.values)
+        if self.imputation == "carry_forward":
+            columns = list(matrix.columns)
+            for feature, kind in self.IMPUTE_FROM_CURRENT.items():
+                fill[:, columns.index(feature)] = matrix.values[:, columns.index(kind)]
+        matrix.values[missing] = fill[missing]
+        for col, count in zip(matrix.columns, missing.sum(axis=0).tolist()):
+            if count:
+                FEATURES_IMPUTED.labels(feature=col).inc(count)
+        logger.debug(
+            "Imputed %d feature values in %d of %d vectors",
+            int(missing.sum()),
+            int(missing.any(axis=1).sum()),
+            len(matrix),
+        )
 
     @staticmethod
     def _window(df: pd.DataFrame, current_ts: int, minutes: int) -> pd.DataFrame:
         if df.empty:
             return df
         cutoff = current_ts - (minutes * 60)
-        return df[df["timestamp"] >= cutoff]
-
-    def _build_vector(self, current_sensor: Sensor, df: pd.DataFrame) -> FeatureVector:
-        df_5 = self._window(df, current_sensor.timestamp, 5)
-        df_10 = self._window(df, current_sensor.timestamp, 10)
-        df_30 = self._window(df, current_sensor.timestamp, 30)
-        df_60 = self._window(df, current_sensor.timestamp, 60)
-        df_120 = self._window(df, current_sensor.timestamp, 120)
-        df_180 = self._window(df, current_sensor.timestamp, 180)
+        # The series is sorted by time, so the window is a positional slice (a view, no boolean mask).
+        return df.iloc[int(np.searchsorted(df["timestamp"].to_numpy(), cutoff, side="left")):]
+
+    def _history_features(self, df: pd.DataFrame, selected: np.ndarray, current: np.ndarray) -> Dict[str, np.ndarray]:
+        """`_build_features` for the rows `selected` of one sensor's series, all at once.
+
+        Row i's window holds the rows up to and including i that are at most
+        `minutes` older, exactly what `_build_features` sees for that row. Window
+        statistics come from time-based rolling windows, counts and first values
+        from binary searches, so a vector costs no DataFrame slicing.
+        """
+        import pandas as pd
+
+        series_ts = df["timestamp"].to_numpy(dtype=np.int64)
+        index = pd.DatetimeIndex(pd.to_datetime(series_ts, unit="s"))
+        values = {kind: df[kind].to_numpy(dtype=np.float64, na_value=np.nan) for kind in MEASUREMENT_TYPES}
+        stop = selected + 1
+        starts = {
+            minutes: np.searchsorted(series_ts, series_ts[selected] - minutes * 60, side="left")
+            for minutes in self.WINDOW_MINUTES
+        }
+        sizes = {minutes: stop - window_start for minutes, window_start in starts.items()}
+
+        def rolling(kind: str, minutes: int, statistic: str) -> np.ndarray:
+            window = pd.Series(values[kind], index=index).rolling(f"{minutes * 60}s", closed="both")
+            return getattr(window, statistic)().to_numpy()[selected]
+
+        def std(kind: str, minutes: int) -> np.ndarray:
+            deviation = rolling(kind, minutes, "std")
+            # Rolling variance adds and removes values and can leave rounding residue on a constant
+            # window; zero it there, keeping NaN where the window has too few readings.
+            constant = rolling(kind, minutes, "max") == rolling(kind, minutes, "min")
+            return np.where(sizes[minutes] > 1, np.where(constant, deviation * 0.0, deviation), 0.0)
+
+        # Direct values, filled by `_current_readings`.
+        humidity, temperature, co2, motion, light = current[selected].T
+
+        avg_co2_60m = rolling("co2", 60, "mean")
+        residual_co2 = co2 - avg_co2_60m
+        # Windows always contain the current row, so the first value of each exists.
+        delta_5m_co2 = (co2 - values["co2"][starts[5]]) / 5.0
+        delta_30m_co2 = (co2 - values["co2"][starts[30]]) / 30.0
+        delta_60m_co2 = (co2 - values["co2"][starts[60]]) / 60.0
+
+        moving = np.concatenate([[0], np.cumsum(values["motion"] > 0)])
+        count_motion_10m = (moving[stop] - moving[starts[10]]).astype(np.float64)
+        count_motion_30m = (moving[stop] - moving[starts[30]]).astype(np.float64)
+        recent_motion_10m = (count_motion_10m > 0).astype(np.float64)
+
+        # Light level: 0-500 LUX = 0, 501-1000 = 1, 1001-1500 = 2, >1500 = 3
+        light_level = np.searchsorted([500.0, 1000.0, 1500.0], light, side="left").astype(np.float64)
+
+        moments = [datetime.fromtimestamp(timestamp) for timestamp in series_ts[selected].tolist()]
+        hour_of_day = np.array([moment.hour for moment in moments], dtype=np.float64)
+        day_of_week = np.array([moment.weekday() for moment in moments], dtype=np.float64)
+        month = np.array([moment.month for moment in moments], dtype=np.int64)
+        is_off_hours = ((hour_of_day < 7) | (hour_of_day >= 19)).astype(np.float64)
+        is_night = ((hour_of_day < 6) | (hour_of_day >= 22)).astype(np.float64)
+        # Season: 0=Spring (Mar-May), 1=Summer, 2=Autumn, 3=Winter
+        season = np.where((month >= 3) & (month <= 11), (month - 3) // 3, 3).astype(np.float64)
+
+        return {
+            "humidity": humidity,
+            "temperature": temperature,
+            "co2": co2,
+            "motion": motion,
+            "light": light,
+            "avg_humidity_60m": rolling("humidity", 60, "mean"),
+            "avg_humidity_120m": rolling("humidity", 120, "mean"),
+            "avg_humidity_180m": rolling("humidity", 180, "mean"),
+            "std_humidity": std("humidity", 180),
+            "avg_temperature": rolling("temperature", 60, "mean"),
+            "max_temperature": rolling("temperature", 60, "max"),
+            "min_temperature": rolling("temperature", 60, "min"),
+            "std_temperature": std("temperature", 60),
+            "avg_co2_60m": avg_co2_60m,
+            "max_co2_60m": rolling("co2", 60, "max"),
+            "min_co2_60m": rolling("co2", 60, "min"),
+            "std_co2_60m": std("co2", 60),
+            "residual_co2": residual_co2,
+            "delta_5m_co2": delta_5m_co2,
+            "delta_30m_co2": delta_30m_co2,
+            "delta_60m_co2": delta_60m_co2,
+            "avg_motion": rolling("motion", 30, "mean"),
+            "max_motion": rolling("motion", 30, "max"),
+            "std_motion": std("motion", 30),
+            "count_motion_10m": count_motion_10m,
+            "count_motion_30m": count_motion_30m,
+            "recent_motion_10m": recent_motion_10m,
+            "light_level": light_level,
+            "daylight_factor": np.minimum(light / 2000.0, 1.0),
+            "hour_of_day": hour_of_day,
+            "day_of_week": day_of_week,
+            "is_weekend": (day_of_week >= 5).astype(np.float64),
+            "is_off_hours": is_off_hours,
+            "is_night": is_night,
+            "season": season,
+            "residual_co2_recent_motion": residual_co2 * recent_motion_10m,
+            "rising_co2_recent_motion": delta_5m_co2 * recent_motion_10m,
+            "light_recent_motion": light * recent_motion_10m,
+            "temperature_humidity": temperature * humidity,
+            "motion_off_hours": motion * is_off_hours,
+            "light_on_at_night": (light > 50).astype(np.float64) * is_night,
+        }
+
+    def _build_features(self, current_sensor: Sensor, df: pd.DataFrame, current: Sequence[float]) -> Dict[str, float]:
+        windows = {minutes: self._window(df, current_sensor.timestamp, minutes) for minutes in self.WINDOW_MINUTES}
+        df_5, df_10, df_30, df_60, df_120, df_180 = (windows[minutes] for minutes in (5, 10, 30, 60, 120, 180))
         
-        # Direct Values
-        humidity: float = current_sensor.humidity or 0.0
-        temperature: float = current_sensor.temperature or 0.0
-        co2: float = current_sensor.co2 or 0.0
-        motion: float = current_sensor.motion or 0.0
-        light: float = current_sensor.light or 0.0
+        # Direct Values (`current`, filled by `_current_readings`, in MEASUREMENT_TYPES order)
+        humidity, temperature, co2, motion, light = (float(value) for value in current)
         
         # Calculated Values
         
@@ -131,49 +453,46 @@ class Featurizer:
         motion_off_hours: float = motion * is_off_hours
         light_on_at_night: float = (1.0 if light > 50 else 0.0) * is_night
         
-        return FeatureVector(
-            sensor_id=current_sensor.sensor_id,
-            timestamp=current_sensor.timestamp,
-            humidity=humidity,
-            temperature=temperature,
-            co2=co2,
-            motion=motion,
-            light=light,
-            avg_humidity_60m=avg_humidity_60m,
-            avg_humidity_120m=avg_humidity_120m,
-            avg_humidity_180m=avg_humidity_180m,
-            std_humidity=std_humidity,
-            avg_temperature=avg_temperature,
-            max_temperature=max_temperature,
-            min_temperature=min_temperature,
-            std_temperature=std_temperature,
-            avg_co2_60m=avg_co2_60m,
-            max_co2_60m=max_co2_60m,
-            min_co2_60m=min_co2_60m,
-            std_co2_60m=std_co2_60m,
-            residual_co2=residual_co2,
-            delta_5m_co2=delta_5m_co2,
-            delta_30m_co2=delta_30m_co2,
-            delta_60m_co2=delta_60m_co2,
-            avg_motion=avg_motion,
-            max_motion=max_motion,
-            std_motion=std_motion,
-            count_motion_10m=count_motion_10m,
-            count_motion_30m=count_motion_30m,
-            recent_motion_10m=recent_motion_10m,
-            light_level=light_level,
-            daylight_factor=daylight_factor,
-            hour_of_day=hour_of_day,
-            day_of_week=day_of_week,
-            is_weekend=is_weekend,
-            is_off_hours=is_off_hours,
-            is_night=is_night,
-            season=season,
-            residual_co2_recent_motion=residual_co2_recent_motion,
-            rising_co2_recent_motion=rising_co2_recent_motion,
-            light_recent_motion=light_recent_motion,
-            temperature_humidity=temperature_humidity,
-            motion_off_hours=motion_off_hours,
-            light_on_at_night=light_on_at_night,
-            schema_version=1
-        )
\ No newline at end of file
+        return {
+            "humidity": humidity,
+            "temperature": temperature,
+            "co2": co2,
+            "motion": motion,
+            "light": light,
+            "avg_humidity_60m": avg_humidity_60m,
+            "avg_humidity_120m": avg_humidity_120m,
+            "avg_humidity_180m": avg_humidity_180m,
+            "std_humidity": std_humidity,
+            "avg_temperature": avg_temperature,
+            "max_temperature": max_temperature,
+            "min_temperature": min_temperature,
+            "std_temperature": std_temperature,
+            "avg_co2_60m": avg_co2_60m,
+            "max_co2_60m": max_co2_60m,
+            "min_co2_60m": min_co2_60m,
+            "std_co2_60m": std_co2_60m,
+            "residual_co2": residual_co2,
+            "delta_5m_co2": delta_5m_co2,
+            "delta_30m_co2": delta_30m_co2,
+            "delta_60m_co2": delta_60m_co2,
+            "avg_motion": avg_motion,
+            "max_motion": max_motion,
+            "std_motion": std_motion,
+            "count_motion_10m": count_motion_10m,
+            "count_motion_30m": count_motion_30m,
+            "recent_motion_10m": recent_motion_10m,
+            "light_level": light_level,
+            "daylight_factor": daylight_factor,
+            "hour_of_day": hour_of_day,
+            "day_of_week": day_of_week,
+            "is_weekend": is_weekend,
+            "is_off_hours": is_off_hours,
+            "is_night": is_night,
+            "season": season,
+            "residual_co2_recent_motion": residual_co2_recent_motion,
+            "rising_co2_recent_motion": rising_co2_recent_motion,
+            "light_recent_motion": light_recent_motion,
+            "temperature_humidity": temperature_humidity,
+            "motion_off_hours": motion_off_hours,
+            "light_on_at_night": light_on_at_night,
+        }
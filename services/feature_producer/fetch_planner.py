@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class FetchPlan:
+    """Upstream range needed to compute the feature vectors of a request."""
+
+    fetch_start: int
+    fetch_end: int
+    history: bool
+
+    @property
+    def seconds(self) -> int:
+        return self.fetch_end - self.fetch_start
+
+
+def plan_fetch(
+    start: int,
+    end: int,
+    lookback_seconds: int,
+    history: bool = False,
+    slack_seconds: int = 0,
+) -> FetchPlan:
+    """Bound the upstream fetch to what the features look back over.
+
+    Latest vectors only depend on the `lookback_seconds` before each sensor's last
+    measurement, so a wider request window is not downloaded and a narrower one is
+    widened instead of truncating the long windows. The last measurement usually
+    lies shortly before `end`; `slack_seconds` keeps its windows complete.
+    History vectors for `[start, end]` need the look-back before `start`.
+    """
+    if history:
+        return FetchPlan(fetch_start=start - lookback_seconds, fetch_end=end, history=True)
+    return FetchPlan(fetch_start=end - lookback_seconds - slack_seconds, fetch_end=end, history=False)
@@ -0,0 +1,144 @@
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from ..settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_WEEK = 7 * 24 * 60
+# 1970-01-01 was a Thursday; shifts epoch minutes so that 0 is Monday 00:00.
+_EPOCH_WEEKDAY_OFFSET = 3 * 24 * 60
+
+_TIME_RANGE = re.compile(r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})")
+_ROOM = re.compile(r"\b([A-Z]{1,2})\s?(\d)\.(\d{3})\b")
+
+
+def _parse_time_range(text: str) -> Optional[Tuple[int, int]]:
+    match = _TIME_RANGE.search(text)
+    if not match:
+        return None
+    start_h, start_m, end_h, end_m = (int(part) for part in match.groups())
+    return start_h * 60 + start_m, end_h * 60 + end_m
+
+
+def _rooms(details: Iterable[str]) -> List[str]:
+    return ["{}{}.{}".format(*match.groups()) for detail in details for match in _ROOM.finditer(detail)]
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    intervals.sort()
+    merged: List[List[int]] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    bounds = np.asarray(merged, dtype=np.int64).reshape(-1, 2)
+    return np.ascontiguousarray(bounds[:, 0]), np.ascontiguousarray(bounds[:, 1])
+
+
+def minute_of_week(timestamps: np.ndarray) -> np.ndarray:
+    """Local minute of the week (0 = Monday 00:00) for unix timestamps, like `datetime.fromtimestamp`.
+
+    The UTC offset is resolved once per distinct hour, which is exact because DST
+    changes happen on the hour.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.fromiter(
+        (datetime.fromtimestamp(int(hour) * 3600).astimezone().utcoffset().total_seconds() for hour in hours),
+        dtype=np.int64,
+        count=len(hours),
+    )
+    local = timestamps + offsets[inverse]
+    return (local // 60 + _EPOCH_WEEKDAY_OFFSET) % MINUTES_PER_WEEK
+
+
+class LectureIndex:
+    """Weekly lecture intervals per room, answering lookups with a binary search.
+
+    Each room keeps merged, sorted `[start, end)` intervals in minutes of the
+    week. Sensors are mapped to rooms by `sensor_rooms`; unmapped sensors use
+    their id as room name.
+    """
+
+    # Reported as minutes to the next lecture when a room has none scheduled.
+    NO_LECTURE_MINUTES = float(MINUTES_PER_WEEK)
+
+    def __init__(self, intervals: Mapping[str, List[Tuple[int, int]]], sensor_rooms: Optional[Mapping[str, str]] = None) -> None:
+        self._rooms: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            room: _merge(list(spans)) for room, spans in intervals.items() if spans
+        }
+        self.sensor_rooms = dict(sensor_rooms or {})
+
+    @classmethod
+    def from_timetables(
+        cls,
+        timetables: Iterable[Mapping[str, Any]],
+        sensor_rooms: Optional[Mapping[str, str]] = None,
+    ) -> "LectureIndex":
+        """Build the index from `TimetableFetcher.timetable_to_dict` output (one plan per group)."""
+        intervals: Dict[str, List[Tuple[int, int]]] = {}
+        for timetable in timetables:
+            for slot in timetable:
+                span = _parse_time_range(slot.get("time", ""))
+                if span is None:
+                    continue
+                for course in slot.get("courses", []):
+                    day = course.get("day")
+                    if day is None:
+                        continue
+                    for room in _rooms(course.get("details", [])):
+                        intervals.setdefault(room, []).append((day * 1440 + span[0], day * 1440 + span[1]))
+        return cls(intervals, sensor_rooms)
+
+    @property
+    def rooms(self) -> List[str]:
+        return sorted(self._rooms)
+
+    def room_for(self, sensor_id: str) -> str:
+        return self.sensor_rooms.get(sensor_id, sensor_id)
+
+    def lookup(self, sensor_ids: np.ndarray, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (lecture scheduled 0/1, minutes to the next lecture) per row.
+
+        The minutes are 0 while a lecture is running and wrap around the week.
+        """
+        count = len(timestamps)
+        scheduled = np.zeros(count, dtype=np.float64)
+        minutes_to_next = np.full(count, self.NO_LECTURE_MINUTES)
+        if not count or not self._rooms:
+            return scheduled, minutes_to_next
+        rooms = np.fromiter((self.room_for(sensor_id) for sensor_id in sensor_ids), dtype=object, count=count)
+        minutes = minute_of_week(timestamps)
+        for room in set(rooms.tolist()) & self._rooms.keys():
+            starts, ends = self._rooms[room]
+            rows = np.flatnonzero(rooms == room)
+            at = minutes[rows]
+            # First interval ending after `at`; it is running if it has already started.
+            current = np.searchsorted(ends, at, side="right")
+            running = (current < len(starts)) & (starts[np.minimum(current, len(starts) - 1)] <= at)
+            upcoming = np.searchsorted(starts, at, side="right")
+            next_start = np.where(upcoming < len(starts), starts[upcoming % len(starts)], starts[0] + MINUTES_PER_WEEK)
+            scheduled[rows] = running
+            minutes_to_next[rows] = np.where(running, 0, next_start - at)
+        return scheduled, minutes_to_next
+
+
+def load_lecture_index(settings: Optional[Settings] = None) -> LectureIndex:
+    """Build the index from the on-disk timetable cache (see `services.utils.fetch_timetable`)."""
+    from ..utils.fetch_timetable import TimetableCache
+
+    settings = settings or get_settings()
+    cache = TimetableCache(settings.timetable_cache_dir, settings.timetable_cache_ttl_hours * 3600)
+    entries = cache.entries()
+    index = LectureIndex.from_timetables((entry["timetable"] for entry in entries), settings.sensor_rooms)
+    if not entries:
+        logger.warning("No cached timetables in %s; lecture features will report no lectures", settings.timetable_cache_dir)
+    else:
+        logger.info("Lecture index built from %d timetables covering %d rooms", len(entries), len(index.rooms))
+    return index
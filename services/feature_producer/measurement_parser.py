@@ -1,10 +1,13 @@
 import logging
-from typing import Dict, Any, List, Sequence, Union
+from typing import Dict, Any, Iterable, List, Sequence, Union
 
 from ..entities.sensor import Sensor
+from ..utils.logging_setup import debug_sampled
 
 PayloadType = Union[Dict[str, Any], Sequence[Dict[str, Any]]]
 
+MEASUREMENT_TYPES = ("humidity", "temperature", "co2", "motion", "light")
+
 logger = logging.getLogger(__name__)
 
 def _build_sensor(payload: Dict[str, Any]) -> Sensor:
@@ -16,21 +19,26 @@ def _build_sensor(payload: Dict[str, Any]) -> Sensor:
 
 def flatten_measurements(payload: PayloadType, data_key: str = "responseData") -> List[Sensor]:
     sensors: List[Sensor] = []
+    debug = logger.isEnabledFor(logging.DEBUG)
     if isinstance(payload, dict):
         blocks = payload.get(data_key, [])
-        logger.debug(
-            "Flattening payload dict with keys=%s data_key=%s block_count=%s",
-            list(payload.keys()),
-            data_key,
-            len(blocks) if hasattr(blocks, "__len__") else "unknown",
-        )
+        if debug:
+            debug_sampled(
+                logger,
+                "Flattening payload dict with keys=%s data_key=%s block_count=%s",
+                list(payload.keys()),
+                data_key,
+                len(blocks) if hasattr(blocks, "__len__") else "unknown",
+            )
     else:
         blocks = payload
-        logger.debug(
-            "Flattening payload sequence length=%s data_key=%s",
-            len(blocks) if hasattr(blocks, "__len__") else "unknown",
-            data_key,
-        )
+        if debug:
+            debug_sampled(
+                logger,
+                "Flattening payload sequence length=%s data_key=%s",
+                len(blocks) if hasattr(blocks, "__len__") else "unknown",
+                data_key,
+            )
 
     for block in blocks:
         if not isinstance(block, dict):
@@ -44,6 +52,27 @@ def flatten_measurements(payload: PayloadType, data_key: str = "responseData") -
             item = dict(measurement)
             item["sensorId"] = sensor_id
             sensors.append(_build_sensor(item))
-    sensor_ids = {s.sensor_id for s in sensors}
-    logger.info("Flattened %s measurements for %s sensors", len(sensors), len(sensor_ids))
-    return sensors
\ No newline at end of file
+    logger.debug("Flattened %s measurements from %s blocks", len(sensors), len(blocks))
+    return sensors
+
+
+def merge_measurement_blocks(blocks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Join blocks of the same sensor, merging measurements with the same timestamp.
+
+    Used for per-type responses, which each carry one measurement type per
+    timestamp; the upstream formats a stored timestamp identically in all of them.
+    """
+    merged: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for block in blocks:
+        sensor_id = block.get("sensorId") if isinstance(block, dict) else None
+        if not sensor_id:
+            logger.warning("Skipping measurement block without sensorId while merging")
+            continue
+        rows = merged.setdefault(sensor_id, {})
+        for measurement in block.get("measurements", []):
+            row = rows.get(measurement["timestamp"])
+            if row is None:
+                rows[measurement["timestamp"]] = dict(measurement)
+            else:
+                row.update(measurement)
+    return [{"sensorId": sensor_id, "measurements": list(rows.values())} for sensor_id, rows in merged.items()]
@@ -0,0 +1,495 @@
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..entities.sensor import Sensor
+from .measurement_parser import MEASUREMENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Bucket width in seconds per level, finest first. Daily buckets are UTC days.
+ROLLUP_LEVELS: Dict[str, int] = {"1m": 60, "15m": 900, "1h": 3600, "1d": 86400}
+
+# Columns of a bucket row. first/last keep the timestamp they were seen at, so
+# partial buckets from consecutive ingests combine in time order.
+_COUNT, _SUM, _SUM_SQUARES, _MIN, _MAX, _FIRST_TS, _FIRST, _LAST_TS, _LAST = range(9)
+_ROW_WIDTH = 9
+_SNAPSHOT_VERSION = 2
+_DURATION = re.compile(r"^(\d+)([smhd]?)$")
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+SeriesKey = Tuple[str, str]  # (sensor id, measurement type)
+Buckets = Tuple[np.ndarray, np.ndarray]  # (bucket starts, rows)
+
+
+def parse_duration(text: str) -> int:
+    """Seconds of a duration like `90`, `15m`, `24h` or `7d`."""
+    match = _DURATION.match(text.strip())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid duration {text!r}; expected e.g. 900, 15m, 24h or 7d")
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def _run_heads(*keys: np.ndarray) -> np.ndarray:
+    """Indices where a run of equal values (of all `keys` together) starts in sorted arrays."""
+    changed = np.ones(len(keys[0]), dtype=bool)
+    if len(changed) > 1:
+        changed[1:] = np.logical_or.reduce([key[1:] != key[:-1] for key in keys])
+    return np.flatnonzero(changed)
+
+
+def _combine(rows: np.ndarray, heads: np.ndarray) -> np.ndarray:
+    """Reduce the runs of time-ordered rows starting at `heads` to one row each."""
+    tails = np.empty_like(heads)
+    tails[:-1] = heads[1:] - 1
+    tails[-1:] = len(rows) - 1
+    combined = np.empty((len(heads), _ROW_WIDTH))
+    combined[:, _COUNT:_MIN] = np.add.reduceat(rows[:, _COUNT:_MIN], heads, axis=0)
+    combined[:, _MIN] = np.minimum.reduceat(rows[:, _MIN], heads)
+    combined[:, _MAX] = np.maximum.reduceat(rows[:, _MAX], heads)
+    combined[:, _FIRST_TS:_LAST_TS] = rows[heads, _FIRST_TS:_LAST_TS]
+    combined[:, _LAST_TS:] = rows[tails, _LAST_TS:]
+    return combined
+
+
+def _append(current: Optional[Buckets], starts: np.ndarray, rows: np.ndarray) -> Buckets:
+    """Append newer buckets to a series, folding a bucket both share into one row.
+
+    New samples are always later than the series' watermark, so new buckets never
+    start before the last stored one.
+    """
+    if current is None or not len(current[0]):
+        return starts, rows
+    stored_starts, stored_rows = current
+    if starts[0] == stored_starts[-1]:
+        last, first = stored_rows[-1], rows[0]
+        shared = first.copy()
+        shared[_COUNT:_MIN] += last[_COUNT:_MIN]
+        shared[_MIN] = min(last[_MIN], first[_MIN])
+        shared[_MAX] = max(last[_MAX], first[_MAX])
+        shared[_FIRST_TS:_LAST_TS] = last[_FIRST_TS:_LAST_TS]
+        rows = rows.copy()
+        rows[0] = shared
+        stored_starts, stored_rows = stored_starts[:-1], stored_rows[:-1]
+    return np.concatenate([stored_starts, starts]), np.concatenate([stored_rows, rows])
+
+
+def bucket_statistics(rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """Named statistics of bucket rows, including mean and sample standard deviation."""
+    count = rows[:, _COUNT]
+    mean = rows[:, _SUM] / count
+    # Sample variance (ddof=1, like pandas) from the running sums; clipped against rounding below zero.
+    variance = np.maximum(rows[:, _SUM_SQUARES] - count * mean * mean, 0.0) / np.maximum(count - 1, 1)
+    return {
+        "count": count.astype(np.int64),
+        "sum": rows[:, _SUM],
+        "sum_squares": rows[:, _SUM_SQUARES],
+        "min": rows[:, _MIN],
+        "max": rows[:, _MAX],
+        "first": rows[:, _FIRST],
+        "last": rows[:, _LAST],
+        "mean": mean,
+        "std": np.where(count > 1, np.sqrt(variance), 0.0),
+    }
+
+
+class RollupPlan:
+    """Which levels answer `[start, end)` and how their buckets are grouped.
+
+    With a `step` every output bucket is `step` seconds wide and aligned to the
+    epoch, served from the coarsest level dividing the step. Without a step the
+    whole range is one output bucket, covered by the coarsest buckets that fit
+    inside it and finer ones at the edges.
+    """
+
+    def __init__(self, start: int, end: int, step: Optional[int], segments: List[Tuple[str, int, int]]) -> None:
+        self.start = start
+        self.end = end
+        self.step = step
+        self.segments = segments
+
+    @property
+    def levels(self) -> List[str]:
+        return sorted({level for level, _, _ in self.segments}, key=ROLLUP_LEVELS.get, reverse=True)
+
+    @property
+    def bucket_count(self) -> int:
+        """Stored buckets the plan reads per series, at most."""
+        return sum((end - start) // ROLLUP_LEVELS[level] for level, start, end in self.segments)
+
+
+class RollupStore:
+    """Per-sensor rollups of every measurement type at 1-minute, 15-minute, hourly and daily resolution.
+
+    Each (sensor, type) series keeps sorted bucket starts and one row of count,
+    sum, sum of squares, min, max, first and last per bucket and level. Samples
+    at or before a series' watermark are skipped, so overlapping fetches can be
+    ingested repeatedly; measurements arriving later than that are dropped.
+    Readers do not lock: an ingest replaces the arrays of a series instead of
+    writing into them.
+    """
+
+    def __init__(self, retention_seconds: Optional[Mapping[str, float]] = None) -> None:
+        unknown = set(retention_seconds or {}) - ROLLUP_LEVELS.keys()
+        if unknown:
+            raise ValueError(f"Unknown rollup levels: {sorted(unknown)}")
+        # Levels without retention keep every bucket.
+        self.retention_seconds = {level: seconds for level, seconds in (retention_seconds or {}).items() if seconds > 0}
+        self.latest_timestamp = 0
+        self._series: Dict[str, Dict[SeriesKey, Buckets]] = {level: {} for level in ROLLUP_LEVELS}
+        self._watermarks: Dict[SeriesKey, int] = {}
+        # Buckets before this start were pruned from the level.
+        self._retained_from: Dict[str, int] = {level: 0 for level in ROLLUP_LEVELS}
+        self._lock = threading.Lock()
+
+    def sensor_ids(self) -> List[str]:
+        return sorted({sensor_id for sensor_id, _ in list(self._watermarks)})
+
+    def bucket_count(self) -> int:
+        return sum(len(starts) for series in self._series.values() for starts, _ in list(series.values()))
+
+    def ingest(self, sensors: Iterable[Sensor]) -> int:
+        """Add measurements to all levels; returns the number of new values."""
+        key_index: Dict[SeriesKey, int] = {}
+        series_ids: List[int] = []
+        timestamps: List[int] = []
+        values: List[float] = []
+        for sensor in sensors:
+            for kind in MEASUREMENT_TYPES:
+                value = getattr(sensor, kind)
+                if value is not None:
+                    series_ids.append(key_index.setdefault((sensor.sensor_id, kind), len(key_index)))
+                    timestamps.append(sensor.timestamp)
+                    values.append(value)
+        if not values:
+            return 0
+        keys = list(key_index)
+
+        with self._lock:
+            # All series are aggregated together; only appending the buckets is per series.
+            ids = np.asarray(series_ids, dtype=np.int64)
+            ts = np.asarray(timestamps, dtype=np.int64)
+            order = np.lexsort((ts, ids))
+            ids, ts, vals = ids[order], ts[order], np.asarray(values, dtype=np.float64)[order]
+            watermarks = np.fromiter((self._watermarks.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+            # Newer than the series' watermark, one value per timestamp.
+            fresh = np.flatnonzero(ts > watermarks[ids])
+            if not len(fresh):
+                return 0
+            ids, ts, vals = ids[fresh], ts[fresh], vals[fresh]
+            unique = _run_heads(ids, ts)
+            ids, ts, vals = ids[unique], ts[unique], vals[unique]
+            samples = np.column_stack([np.ones_like(vals), vals, vals * vals, vals, vals, ts, vals, ts, vals])
+
+            for level, width in ROLLUP_LEVELS.items():
+                starts = ts // width * width
+                heads = _run_heads(ids, starts)
+                rows = _combine(samples, heads)
+                starts, bucket_ids = starts[heads], ids[heads]
+                bounds = np.append(_run_heads(bucket_ids), len(bucket_ids))
+                series = self._series[level]
+                for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+                    key = keys[bucket_ids[lo]]
+                    series[key] = _append(series.get(key), starts[lo:hi], rows[lo:hi])
+
+            last = np.append(np.flatnonzero(ids[1:] != ids[:-1]), len(ids) - 1)
+            for series_id, latest in zip(ids[last].tolist(), ts[last].tolist()):
+                self._watermarks[keys[series_id]] = latest
+            self.latest_timestamp = max(self.latest_timestamp, int(ts.max()))
+            self._prune()
+        return len(ts)
+
+    def _prune(self) -> None:
+        for level, keep in self.retention_seconds.items():
+            width = ROLLUP_LEVELS[level]
+            cutoff = int(self.latest_timestamp - keep) // width * width
+            # Pruning copies every series of the level, so it waits until a sixteenth of the retention expired.
+            if cutoff - self._retained_from[level] < max(width, keep / 16):
+                continue
+            series = self._series[level]
+            for key, (starts, rows) in list(series.items()):
+                if len(starts) and starts[0] < cutoff:
+                    drop = int(np.searchsorted(starts, cutoff))
+                    series[key] = (starts[drop:].copy(), rows[drop:].copy())
+            self._retained_from[level] = cutoff
+
+    def plan(self, start: int, end: int, step: Optional[int] = None) -> RollupPlan:
+        """Choose the levels for a query; the range is widened to the chosen bucket boundaries."""
+        if start >= end:
+            raise ValueError("start must be before end")
+        if step is not None:
+            start, end = start // step * step, -(-end // step) * step
+            dividing = [level for level, width in ROLLUP_LEVELS.items() if step % width == 0]
+            if not dividing:
+                raise ValueError(f"step must be a multiple of {ROLLUP_LEVELS[next(iter(ROLLUP_LEVELS))]} seconds")
+            candidates = [level for level in dividing if self._retained_from[level] <= start]
+            if not candidates:
+                retained = [level for level in ROLLUP_LEVELS if self._retained_from[level] <= start]
+                raise ValueError(
+                    f"Buckets of {', '.join(dividing)} are not retained back to {start}; "
+                    f"use a step that is a multiple of {retained[0] if retained else '1d'}"
+                )
+            return RollupPlan(start, end, step, [(candidates[-1], start, end)])
+
+        # The edges are resolved down to the finest level still retained at `start`.
+        levels = [level for level in ROLLUP_LEVELS if self._retained_from[level] <= start]
+        if not levels:
+            raise ValueError(f"start {start} lies before the retained rollups")
+        finest = ROLLUP_LEVELS[levels[0]]
+        start, end = start // finest * finest, -(-end // finest) * finest
+        segments: List[Tuple[str, int, int]] = []
+
+        def cover(lo: int, hi: int, depth: int) -> None:
+            if lo >= hi:
+                return
+            if depth == 0:
+                segments.append((levels[0], lo, hi))
+                return
+            width = ROLLUP_LEVELS[levels[depth]]
+            inner_lo, inner_hi = -(-lo // width) * width, hi // width * width
+            if inner_lo >= inner_hi:
+                cover(lo, hi, depth - 1)
+                return
+            segments.append((levels[depth], inner_lo, inner_hi))
+            cover(lo, inner_lo, depth - 1)
+            cover(inner_hi, hi, depth - 1)
+
+        cover(start, end, len(levels) - 1)
+        segments.sort(key=lambda segment: segment[1])
+        return RollupPlan(start, end, None, segments)
+
+    def query(self, plan: RollupPlan, sensor_id: str, kind: str) -> Buckets:
+        """Output buckets (starts, rows) of one series; buckets without data are omitted."""
+        parts_starts: List[np.ndarray] = []
+        parts_rows: List[np.ndarray] = []
+        for level, lo, hi in plan.segments:
+            buckets = self._series[level].get((sensor_id, kind))
+            if buckets is None:
+                continue
+            starts, rows = buckets
+            first, last = np.searchsorted(starts, [lo, hi], side="left")
+            parts_starts.append(starts[first:last])
+            parts_rows.append(rows[first:last])
+        starts = np.concatenate(parts_starts) if parts_starts else np.empty(0, dtype=np.int64)
+        if not len(starts):
+            return starts, np.empty((0, _ROW_WIDTH))
+        rows = np.concatenate(parts_rows)
+        if plan.step is None:
+            groups = np.full(len(starts), plan.start, dtype=np.int64)
+        else:
+            groups = starts // plan.step * plan.step
+        heads = _run_heads(groups)
+        return groups[heads], _combine(rows, heads)
+
+    def window_statistics(
+        self,
+        sensor_ids: Sequence[str],
+        kind: str,
+        end: int,
+        window_seconds: int,
+    ) -> Tuple[RollupPlan, Dict[str, np.ndarray]]:
+        """Statistics over `[end - window, end)` per sensor, in O(buckets) instead of O(measurements).
+
+        Sensors without data in the window get a count of 0 and NaN for the other statistics.
+        """
+        plan = self.plan(end - window_seconds, end)
+        rows = np.full((len(sensor_ids), _ROW_WIDTH), np.nan)
+        rows[:, _COUNT] = 0.0
+        for idx, sensor_id in enumerate(sensor_ids):
+            _, buckets = self.query(plan, sensor_id, kind)
+            if len(buckets):
+                rows[idx] = buckets[0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return plan, bucket_statistics(rows)
+
+    def save(self, path: str) -> None:
+        """Write a snapshot atomically, so a restart only needs to fetch what came after it.
+
+        The snapshot is a plain npz archive (no pickles): per level the series
+        index, bucket start and row of every bucket, plus the series keys and
+        watermarks.
+        """
+        with self._lock:
+            keys = sorted(set(self._watermarks).union(*(series.keys() for series in self._series.values())))
+            index = {key: idx for idx, key in enumerate(keys)}
+            arrays: Dict[str, np.ndarray] = {
+                "version": np.array(_SNAPSHOT_VERSION),
+                "sensor_ids": np.array([sensor_id for sensor_id, _ in keys], dtype=str),
+                "kinds": np.array([kind for _, kind in keys], dtype=str),
+                "watermarks": np.array([self._watermarks.get(key, -1) for key in keys], dtype=np.int64),
+                "retained_from": np.array([self._retained_from[level] for level in ROLLUP_LEVELS], dtype=np.int64),
+                "latest_timestamp": np.array(self.latest_timestamp, dtype=np.int64),
+            }
+            for level, series in self._series.items():
+                items = list(series.items())
+                arrays[f"{level}_series"] = np.repeat(
+                    np.array([index[key] for key, _ in items], dtype=np.int64),
+                    [len(starts) for _, (starts, _) in items],
+                )
+                arrays[f"{level}_starts"] = np.concatenate([starts for _, (starts, _) in items] or [np.empty(0, dtype=np.int64)])
+                arrays[f"{level}_rows"] = np.concatenate([rows for _, (_, rows) in items] or [np.empty((0, _ROW_WIDTH))])
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(fh, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, path: str) -> bool:
+        """Restore a snapshot written by `save`; returns False when there is none."""
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                if int(archive["version"]) != _SNAPSHOT_VERSION:
+                    logger.warning("Ignoring rollup snapshot %s of version %s", path, int(archive["version"]))
+                    return False
+                arrays = {name: archive[name] for name in archive.files}
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as exc:
+            logger.warning("Ignoring unreadable rollup snapshot %s: %s", path, exc)
+            return False
+        keys: List[SeriesKey] = list(zip(arrays["sensor_ids"].tolist(), arrays["kinds"].tolist()))
+        series: Dict[str, Dict[SeriesKey, Buckets]] = {}
+        for level in ROLLUP_LEVELS:
+            ids, starts, rows = arrays[f"{level}_series"], arrays[f"{level}_starts"], arrays[f"{level}_rows"]
+            bounds = np.append(_run_heads(ids), len(ids)) if len(ids) else np.zeros(1, dtype=np.int64)
+            series[level] = {
+                keys[int(ids[lo])]: (starts[lo:hi], rows[lo:hi])
+                for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+            }
+        with self._lock:
+            self._series = series
+            self._watermarks = {key: mark for key, mark in zip(keys, arrays["watermarks"].tolist()) if mark >= 0}
+            self._retained_from = dict(zip(ROLLUP_LEVELS, arrays["retained_from"].tolist()))
+            self.latest_timestamp = int(arrays["latest_timestamp"])
+        return True
+
+
+class RollupIngestion:
+    """Keeps a `RollupStore` current by fetching new measurements in the background.
+
+    The first cycle backfills `backfill_seconds` in chunks of `chunk_seconds`;
+    later cycles fetch from the end of the previous one, reaching back
+    `overlap_seconds` for measurements the upstream publishes late. With a
+    `snapshot_path` the store is restored from it before the first cycle and
+    saved at most every `snapshot_seconds`; whatever came after the snapshot is
+    fetched again on the next start.
+
+    With `is_leader` only the worker it elects fetches; the others reload the
+    snapshot whenever the leader has written a new one, and take over once the
+    leader is gone. Without it every worker runs its own loop.
+    """
+
+    def __init__(
+        self,
+        store: RollupStore,
+        fetch: Callable[[int, int], List[Sensor]],
+        refresh_seconds: float,
+        backfill_seconds: int,
+        chunk_seconds: int = 6 * 3600,
+        overlap_seconds: int = 300,
+        snapshot_path: Optional[str] = None,
+        snapshot_seconds: float = 900.0,
+        is_leader: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        self.store = store
+        self.fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self.backfill_seconds = backfill_seconds
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.snapshot_path = snapshot_path
+        self.snapshot_seconds = snapshot_seconds
+        self.is_leader = is_leader
+        self._next_snapshot = 0.0
+        self._snapshot_mtime: Optional[int] = None
+        self.fetched_until: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-ingestion", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread, waiting up to `timeout` seconds for a running cycle to finish."""
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning("Rollup ingestion still busy after %.1fs, leaving its daemon thread behind", timeout)
+
+    def _run(self) -> None:
+        if self.reload_snapshot():
+            logger.info("Rollups restored from %s up to %s", self.snapshot_path, self.store.latest_timestamp)
+        while True:
+            try:
+                if self.is_leader is None or self.is_leader():
+                    self.run_once()
+                else:
+                    self.reload_snapshot()
+            except Exception:
+                logger.exception("Rollup ingestion cycle failed")
+            if self._stop.wait(self.refresh_seconds):
+                return
+
+    def reload_snapshot(self) -> bool:
+        """Load the snapshot if it changed since the last load or save; returns whether it did."""
+        if not self.snapshot_path:
+            return False
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._snapshot_mtime or not self.store.load(self.snapshot_path):
+            return False
+        self._snapshot_mtime = mtime
+        # The next cycle of a new leader continues from the snapshot, not from its own last fetch.
+        self.fetched_until = None
+        return True
+
+    def run_once(self, now: Optional[int] = None) -> int:
+        """Fetch and ingest everything since the previous cycle; returns the number of new values."""
+        now = int(time.time()) if now is None else now
+        if self.fetched_until is not None:
+            start = self.fetched_until - self.overlap_seconds
+        else:
+            # Catch up from the restored snapshot, but no further back than the backfill.
+            start = max(self.store.latest_timestamp - self.overlap_seconds, now - self.backfill_seconds)
+        accepted = 0
+        started = time.perf_counter()
+        for chunk_start in range(start, now, self.chunk_seconds):
+            chunk_end = min(chunk_start + self.chunk_seconds, now)
+            accepted += self.store.ingest(self.fetch(chunk_start, chunk_end))
+            self.fetched_until = chunk_end
+        self.fetched_until = now
+        if self.snapshot_path and accepted and time.monotonic() >= self._next_snapshot:
+            self.store.save(self.snapshot_path)
+            self._snapshot_mtime = os.stat(self.snapshot_path).st_mtime_ns
+            self._next_snapshot = time.monotonic() + self.snapshot_seconds
+        logger.info(
+            "Rollups ingested %d values from %s..%s in %.2fs (%d buckets)",
+            accepted,
+            start,
+            now,
+            time.perf_counter() - started,
+            self.store.bucket_count(),
+        )
+        return accepted
+
@@ -1,11 +1,13 @@
 import json
 import zlib
-from typing import Union
+from typing import Iterable, List, Optional, Union
 from ..entities.sensor import Sensor
+from .batch_codec import BatchCodec
 
 class SensorSerializer:
-    def __init__(self, compress: bool = False):
+    def __init__(self, compress: bool = False, batch_codec: Optional[BatchCodec] = None):
         self.compress = compress
+        self.batch_codec = batch_codec or BatchCodec()
 
     def serialize(self, sensor: Sensor) -> bytes:
         json_str = sensor.model_dump_json(by_alias=True)
@@ -22,4 +24,11 @@ class SensorSerializer:
         raw = zlib.decompress(payload) if self.compress else payload
         raw_bytes: bytes = bytes(raw)
         data = json.loads(raw_bytes.decode("utf-8"))
-        return Sensor.model_validate(data)
\ No newline at end of file
+        return Sensor.model_validate(data)
+
+    def serialize_batch(self, sensors: Iterable[Sensor]) -> bytes:
+        """Encode many measurements at once with the columnar batch codec (not JSON)."""
+        return self.batch_codec.encode(sensors)
+
+    def deserialize_batch(self, payload: bytes, start: Optional[int] = None, end: Optional[int] = None) -> List[Sensor]:
+        return self.batch_codec.decode(payload, start=start, end=end)
@@ -1,21 +1,60 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from .batch_endpoint import close_batch_scorer
+from .batch_endpoint import router as batch_router
+from .occupancy_summary import close_summary_cache
+from .occupancy_summary import router as occupancy_summary_router
 from .prediction_endpoint import router as prediction_router
+from .prediction_endpoint import warm_up
+from .prediction_stream import router as prediction_stream_router
 from ..settings import get_settings
+from ..utils.admission import AdmissionControlMiddleware
+from ..utils.deadline import DeadlineMiddleware
+from ..utils.logging_setup import RequestIdMiddleware, configure_logging
+from ..utils.metrics import MetricsMiddleware
+from ..utils.metrics import router as metrics_router
+from ..utils.profiling import router as profiling_router
+from ..utils.readiness import get_readiness
+from ..utils.readiness import router as readiness_router
+from ..utils.server_timing import ServerTimingMiddleware
 
 # Configure logging
 settings = get_settings()
-logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper()),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+configure_logging(
+    service="model-consumer",
+    level=settings.log_level,
+    log_format=settings.log_format,
+    debug_sample_rate=settings.log_debug_sample_rate,
 )
 logger = logging.getLogger(__name__)
 logger.info("Starting HM Sense Prediction Service with log level: %s", settings.log_level)
 
-app = FastAPI(title="HM Sense Prediction Service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_readiness().start(warm_up)
+    yield
+    await close_summary_cache()
+    close_batch_scorer()
+
+
+app = FastAPI(title="HM Sense Prediction Service", lifespan=lifespan)
+app.add_middleware(ServerTimingMiddleware)
+# Admission runs inside the deadline so queued requests give up at their deadline.
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 app.include_router(prediction_router)
+app.include_router(batch_router)
+app.include_router(occupancy_summary_router)
+app.include_router(prediction_stream_router)
+app.include_router(metrics_router)
+app.include_router(profiling_router)
+app.include_router(readiness_router)
 
 
 @app.get("/health")
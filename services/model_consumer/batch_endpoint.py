@@ -0,0 +1,299 @@
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, Deque, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..settings import get_settings
+from .model_consumer import HMMPredictor
+from .prediction_endpoint import get_endpoint
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# np.savez archive with `columns` (str), `values` (n x columns float), `sensor_ids` (str) and `timestamps` (int).
+COLUMNAR_MEDIA_TYPE = "application/x-npz"
+
+# sensor_ids, timestamps and the values in `feature_cols` order of up to `chunk_rows` vectors.
+Chunk = Tuple[np.ndarray, np.ndarray, np.ndarray]
+# A parsed chunk, or up to `chunk_rows` JSON lines that the scoring worker parses itself.
+Payload = Union[Chunk, List[bytes]]
+
+
+def _validated(sensor_ids: np.ndarray, timestamps: np.ndarray, values: np.ndarray) -> Chunk:
+    finite = np.isfinite(values).all(axis=1)
+    if not finite.all():
+        raise ValueError(f"Non-finite feature values for sensor {sensor_ids[np.argmin(finite)]!r}")
+    return sensor_ids, timestamps, values
+
+
+def _check_columns(line: bytes, columns: Sequence[str]) -> None:
+    """Check the first vector of a batch, so a wrong schema fails with one clear message before scoring."""
+    try:
+        record = json.loads(line)
+    except ValueError as exc:
+        raise ValueError(f"Invalid JSON line: {exc}") from exc
+    if not isinstance(record, dict):
+        raise ValueError("Each line must contain exactly one JSON object")
+    missing = [col for col in ("sensor_id", "timestamp", *columns) if col not in record]
+    if missing:
+        raise ValueError(f"Missing features for inference: {missing}")
+
+
+def _parse_ndjson(lines: Sequence[bytes], columns: Sequence[str]) -> Chunk:
+    try:
+        records = json.loads(b"[" + b",".join(lines) + b"]")
+    except ValueError as exc:
+        raise ValueError(f"Invalid JSON lines: {exc}") from exc
+    if len(records) != len(lines) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("Each line must contain exactly one JSON object")
+    try:
+        rows = [[record[col] for col in columns] for record in records]
+        sensor_ids = [record["sensor_id"] for record in records]
+        timestamps = [record["timestamp"] for record in records]
+    except KeyError as exc:
+        raise ValueError(f"Feature vector is missing column {exc.args[0]!r}") from exc
+    try:
+        return _validated(
+            np.asarray(sensor_ids, dtype=object),
+            np.asarray(timestamps, dtype=np.int64),
+            np.asarray(rows, dtype=np.float64).reshape(len(rows), len(columns)),
+        )
+    except (TypeError, OverflowError) as exc:
+        raise ValueError(f"Invalid feature value: {exc}") from exc
+
+
+async def ndjson_chunks(stream: AsyncIterator[bytes], columns: Sequence[str], chunk_rows: int) -> AsyncIterator[List[bytes]]:
+    """Split a JSON-lines body into chunks of lines while it is still being received.
+
+    Parsing is left to the scoring workers, where it runs in parallel; JSON
+    decoding costs about ten times as much as scoring a vector.
+    """
+    checked = False
+    lines: List[bytes] = []
+    tail = b""
+    async for data in stream:
+        parts = (tail + data).split(b"\n")
+        tail = parts.pop()
+        lines.extend(part for part in parts if part.strip())
+        if lines and not checked:
+            _check_columns(lines[0], columns)
+            checked = True
+        while len(lines) >= chunk_rows:
+            batch, lines = lines[:chunk_rows], lines[chunk_rows:]
+            yield batch
+    if tail.strip():
+        lines.append(tail)
+    if lines:
+        if not checked:
+            _check_columns(lines[0], columns)
+        yield lines
+
+
+def columnar_chunks(body: bytes, columns: Sequence[str], chunk_rows: int) -> Iterator[Chunk]:
+    """Split an npz feature matrix into chunks of the model's columns; validates the whole archive up front."""
+    if not body.startswith(b"PK"):
+        raise ValueError("Invalid columnar feature matrix: expected an npz (zip) archive")
+    try:
+        with np.load(io.BytesIO(body), allow_pickle=False) as archive:
+            names = [str(name) for name in archive["columns"]]
+            values = archive["values"]
+            sensor_ids = archive["sensor_ids"]
+            timestamps = archive["timestamps"]
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as exc:
+        raise ValueError(f"Invalid columnar feature matrix: {exc}") from exc
+    if values.ndim != 2 or values.shape[1] != len(names):
+        raise ValueError(f"Expected values of shape (n, {len(names)}), got {values.shape}")
+    if not (len(sensor_ids) == len(timestamps) == len(values)):
+        raise ValueError("sensor_ids, timestamps and values must have the same number of rows")
+    positions = {name: idx for idx, name in enumerate(names)}
+    missing = [col for col in columns if col not in positions]
+    if missing:
+        raise ValueError(f"Missing features for inference: {missing}")
+    indices = np.fromiter((positions[col] for col in columns), dtype=np.intp)
+    try:
+        timestamps = timestamps.astype(np.int64, casting="same_kind")
+    except TypeError as exc:
+        raise ValueError(f"Invalid timestamps: {exc}") from exc
+    return (
+        _validated(
+            sensor_ids[start:start + chunk_rows].astype(str).astype(object),
+            timestamps[start:start + chunk_rows],
+            np.ascontiguousarray(values[start:start + chunk_rows, indices], dtype=np.float64),
+        )
+        for start in range(0, len(values), chunk_rows)
+    )
+
+
+def score_chunk(predictor: HMMPredictor, payload: Payload) -> bytes:
+    """Score one chunk and encode it as JSON lines in the PredictionResponse layout plus `timestamp`."""
+    if isinstance(payload, list):
+        payload = _parse_ndjson(payload, predictor.feature_cols)
+    sensor_ids, timestamps, values = payload
+    states, probs = predictor.predict_values(values)
+    labels = [json.dumps(label) for label in predictor.state_labels]
+    lines = []
+    for sensor_id, timestamp, state, row in zip(sensor_ids.tolist(), timestamps.tolist(), states.tolist(), probs.tolist()):
+        probabilities = ",".join(f"{label}:{prob!r}" for label, prob in zip(labels, row))
+        lines.append(
+            f'{{"sensor_id":{json.dumps(sensor_id)},"timestamp":{timestamp},"state":{state},'
+            f'"state_label":{labels[state]},"state_probabilities":{{{probabilities}}}}}\n'
+        )
+    return "".join(lines).encode()
+
+
+_worker_predictor: Optional[HMMPredictor] = None
+
+
+def _init_worker(model_dir: str) -> None:
+    global _worker_predictor
+    _worker_predictor = HMMPredictor(model_dir)
+
+
+def _score_in_worker(payload: Payload) -> bytes:
+    return score_chunk(_worker_predictor, payload)
+
+
+class BatchScorer:
+    """Scores chunks of caller-supplied feature vectors on a pool of worker processes.
+
+    Each worker loads its own copy of the model artifacts. Up to `workers` chunks
+    beyond the one being sent are scored ahead, which keeps every process busy
+    while bounding the memory of a long batch. Results keep the input order.
+    """
+
+    def __init__(self, predictor: HMMPredictor, chunk_rows: int, workers: int = 0) -> None:
+        self.predictor = predictor
+        self.chunk_rows = chunk_rows
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        logger.info("BatchScorer initialized chunk_rows=%s workers=%s", chunk_rows, self.workers)
+
+    def _submit(self, payload: Payload) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if self.workers <= 1:
+            return loop.run_in_executor(None, score_chunk, self.predictor, payload)
+        if self._pool is None:
+            # spawn, not fork: the service process already runs threads.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(str(self.predictor.model_dir.resolve()),),
+            )
+        return loop.run_in_executor(self._pool, _score_in_worker, payload)
+
+    async def score(self, payloads: AsyncIterator[Payload]) -> AsyncIterator[bytes]:
+        """Encoded results per chunk, always a prefix of the input.
+
+        On invalid input the results before it are still yielded; a chunk that
+        fails to score ends the stream at that chunk and cancels the ones after it.
+        """
+        pending: Deque[asyncio.Future] = deque()
+        error: Optional[ValueError] = None
+        chunks = payloads.__aiter__()
+        try:
+            while True:
+                # Only reading the input counts as invalid input; scoring errors propagate from the awaits below.
+                try:
+                    payload = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                except ValueError as exc:
+                    error = exc
+                    break
+                pending.append(self._submit(payload))
+                if len(pending) > self.workers:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+            if error is not None:
+                raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+@lru_cache(maxsize=1)
+def get_batch_scorer() -> BatchScorer:
+    settings = get_settings()
+    return BatchScorer(get_endpoint().predictor, settings.batch_chunk_rows, settings.batch_workers)
+
+
+def close_batch_scorer() -> None:
+    """Stop the worker processes, if any batch started them."""
+    if get_batch_scorer.cache_info().currsize:
+        get_batch_scorer().close()
+
+
+async def _as_async(chunks: Iterator[Chunk]) -> AsyncIterator[Chunk]:
+    for chunk in chunks:
+        yield chunk
+
+
+router = APIRouter()
+
+
+@router.post("/predictions/batch")
+async def post_batch_predictions(request: Request, scorer: BatchScorer = Depends(get_batch_scorer)):
+    """Score feature vectors from the request body instead of fetching them from the producer.
+
+    The body is JSON lines (one feature vector per line, as returned by the feature
+    endpoint) or an npz feature matrix. Results stream back as JSON lines in input
+    order. Errors found after streaming started end the stream with an `error` line.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    columns = scorer.predictor.feature_cols
+    if content_type == COLUMNAR_MEDIA_TYPE:
+        body = await request.body()
+        try:
+            chunks = _as_async(await run_in_threadpool(columnar_chunks, body, columns, scorer.chunk_rows))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    elif content_type in (NDJSON_MEDIA_TYPE, "application/jsonl"):
+        chunks = ndjson_chunks(request.stream(), columns, scorer.chunk_rows)
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Expected Content-Type {NDJSON_MEDIA_TYPE} or {COLUMNAR_MEDIA_TYPE}",
+        )
+
+    # Wait for the first scored chunk before responding, so invalid batches are still answered with 400.
+    parts = scorer.score(chunks)
+    try:
+        first = await parts.__anext__()
+    except StopAsyncIteration:
+        return Response(b"", media_type=NDJSON_MEDIA_TYPE)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    async def results() -> AsyncIterator[bytes]:
+        scored = first.count(b"\n")
+        yield first
+        try:
+            async for part in parts:
+                scored += part.count(b"\n")
+                yield part
+        except ValueError as exc:
+            logger.warning("Aborted batch after %d scored vectors: %s", scored, exc)
+            yield (json.dumps({"error": str(exc), "scored": scored}) + "\n").encode()
+            return
+        logger.info("Scored batch of %d feature vectors", scored)
+
+    return StreamingResponse(results(), media_type=NDJSON_MEDIA_TYPE)
@@ -1,17 +1,30 @@
+import contextvars
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence
 
 import requests
 
-from ..entities.feature_vector_response import FeatureVectorResponse
-from ..entities.feature_vectors_result import FeatureVectorsResult
+from ..entities.feature_matrix import FeatureMatrix
+from ..entities.feature_matrix_result import FeatureMatrixResult
+from ..entities.partial_window_report import PartialWindowReport
 from ..entities.sensor import Sensor
 from ..settings import Settings, get_settings
+from ..utils import deadline, fast_json, server_timing
+from ..utils.logging_setup import REQUEST_ID_HEADER, request_id_var
+from ..utils.metrics import PAYLOAD_BYTES, UPSTREAM_ERRORS, observe_stage
+from ..utils.sharding import HashRing
 
 logger = logging.getLogger(__name__)
 
 
+class FeatureEndpointError(RuntimeError):
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
 class FeatureVectorClient:
     """Fetches feature vectors from the FastAPI feature endpoint."""
 
@@ -27,10 +40,14 @@ class FeatureVectorClient:
         self.request_timeout = request_timeout or self.settings.feature_endpoint_timeout_seconds
         self.session = requests.Session()
         self.session.headers.update({"Accept": "application/json"})
+        self.shard_urls = [url.rstrip("/") for url in self.settings.feature_endpoint_shard_urls]
+        self.ring = HashRing(len(self.shard_urls)) if self.shard_urls else None
+        self.fast_decode = self.settings.fast_json_responses
         logger.info(
-            "FeatureVectorClient initialized base_url=%s timeout=%ss",
+            "FeatureVectorClient initialized base_url=%s timeout=%ss shards=%s",
             self.base_url,
             self.request_timeout,
+            len(self.shard_urls) or "-",
         )
 
     def fetch_feature_vectors(
@@ -38,58 +55,160 @@ class FeatureVectorClient:
         start: Optional[int] = None,
         end: Optional[int] = None,
         sensor_id: Optional[str] = None,
-    ) -> FeatureVectorsResult:
-        params = {}
+        sensor_ids: Optional[Sequence[str]] = None,
+        features: Optional[Sequence[str]] = None,
+    ) -> FeatureMatrixResult:
+        params: Dict[str, Any] = {}
         if start is not None:
             params["start"] = str(start)
         if end is not None:
             params["end"] = str(end)
         if sensor_id:
             params["sensor_id"] = sensor_id
+        if sensor_ids:
+            params["sensor_ids"] = list(sensor_ids)
+        if features:
+            params["features"] = ",".join(features)
+
+        if self.ring is None:
+            return self._request(self.base_url, params)
+        if sensor_id and not sensor_ids:
+            return self._request_with_failover(self.ring.shard_for(sensor_id), params)
+        if sensor_ids:
+            # Each owning shard computes its part of the subset.
+            selection = [sensor_id, *sensor_ids] if sensor_id else list(sensor_ids)
+            partitions = {
+                shard: {**params, "sensor_id": None, "sensor_ids": ids}
+                for shard, ids in self.ring.partition(dict.fromkeys(selection)).items()
+            }
+            return self._scatter_gather(partitions)
+        return self._scatter_gather({
+            shard: {**params, "shard": str(shard)} for shard in range(len(self.shard_urls))
+        })
+
+    def _scatter_gather(self, partitions: Dict[int, Dict[str, Any]]) -> FeatureMatrixResult:
+        """Request every shard's partition concurrently and merge the parts."""
+        # A pool per scatter: a pool shared by all requests would queue each request's shard
+        # calls behind those of every earlier one, spending its deadline while waiting.
+        with observe_stage("producer_scatter"), ThreadPoolExecutor(
+            max_workers=len(partitions), thread_name_prefix="shard-fetch"
+        ) as pool:
+            parts = list(pool.map(
+                lambda shard, ctx: ctx.run(self._fetch_partition, shard, partitions[shard]),
+                list(partitions),
+                [contextvars.copy_context() for _ in partitions],
+            ))
+        available = [part for part in parts if part is not None]
+        if not available:
+            raise FeatureEndpointError("Feature endpoint request failed: no producer shard reachable")
+        if len(available) < len(parts):
+            logger.warning("Serving partial feature vectors from %d of %d shards", len(available), len(parts))
+        return FeatureMatrixResult(
+            feature_matrix=FeatureMatrix.concat([part.feature_matrix for part in available]),
+            current_sensors=[sensor for part in available for sensor in part.current_sensors],
+            partial_windows=[report for part in available for report in part.partial_windows],
+        )
 
-        url = f"{self.base_url}/feature-vectors"
+    def _fetch_partition(self, shard: int, params: Dict[str, Any]) -> Optional[FeatureMatrixResult]:
+        """One shard's part; None when no replica could be reached or all failed with a server error.
+
+        A 404 is a partition without data. Other client errors are the request's
+        fault and fail the whole request, as does an expired deadline, instead of
+        being served as a partial result.
+        """
+        try:
+            return self._request_with_failover(shard, params)
+        except FeatureEndpointError as exc:
+            if exc.status_code == 404:
+                return FeatureMatrixResult(feature_matrix=FeatureMatrix.empty(), current_sensors=[])
+            if exc.status_code is not None and exc.status_code < 500:
+                raise
+            if deadline.expired():
+                raise deadline.DeadlineExceeded("producer_call") from exc
+            logger.error("Shard %s unavailable: %s", shard, exc)
+            return None
+
+    def _request_with_failover(self, shard: int, params: Dict[str, Any]) -> FeatureMatrixResult:
+        """Try the owning shard first, then the others; any replica can compute any partition."""
+        error: Optional[FeatureEndpointError] = None
+        for offset in range(len(self.shard_urls)):
+            target = (shard + offset) % len(self.shard_urls)
+            try:
+                return self._request(self.shard_urls[target], params)
+            except FeatureEndpointError as exc:
+                if exc.status_code is not None and exc.status_code < 500:
+                    raise
+                logger.warning("Shard %s failed for partition %s: %s", target, shard, exc)
+                error = exc
+        raise error or FeatureEndpointError("No producer shards configured")
+
+    def _request(self, base_url: str, params: Dict[str, Any]) -> FeatureMatrixResult:
+        url = f"{base_url}/feature-vectors"
         logger.info(
-            "Fetching feature vectors url=%s sensor_id=%s start=%s end=%s",
+            "Fetching feature vectors url=%s sensor_id=%s sensor_ids=%s start=%s end=%s",
             url,
-            sensor_id or "*",
+            params.get("sensor_id") or "*",
+            len(params.get("sensor_ids") or []) or "-",
             params.get("start"),
             params.get("end"),
         )
+        # The producer gets our deadline and we stop waiting for it when the deadline passes.
+        timeout = deadline.timeout(self.request_timeout, "producer_call")
         try:
-            response = self.session.get(url, params=params or None, timeout=self.request_timeout)
-            response.raise_for_status()
-            payload = response.json()
+            with observe_stage("producer_call"):
+                response = self.session.get(
+                    url,
+                    params=params or None,
+                    headers={REQUEST_ID_HEADER: request_id_var.get(), **deadline.outgoing_headers()},
+                    timeout=timeout,
+                )
+                response.raise_for_status()
+                payload = fast_json.loads(response.content) if self.fast_decode else response.json()
+            PAYLOAD_BYTES.labels(source="feature_producer").observe(len(response.content))
+            server_timing.record_remote("producer", response.headers.get("Server-Timing"))
         except requests.exceptions.HTTPError as exc:
-            logger.error("Feature endpoint returned HTTP %s", exc.response.status_code if exc.response else "?")
+            status = exc.response.status_code if exc.response is not None else None
+            UPSTREAM_ERRORS.labels(target="feature_producer", status=str(status)).inc()
+            logger.error("Feature endpoint returned HTTP %s", status or "?")
             detail = exc.response.text if exc.response is not None else str(exc)
-            raise RuntimeError(f"Feature endpoint error: {detail}") from exc
+            raise FeatureEndpointError(f"Feature endpoint error: {detail}", status_code=status) from exc
         except requests.exceptions.RequestException as exc:
+            UPSTREAM_ERRORS.labels(target="feature_producer", status=type(exc).__name__).inc()
+            if deadline.expired():
+                raise deadline.DeadlineExceeded("producer_call") from exc
             logger.error("Failed to reach feature endpoint: %s", exc)
-            raise RuntimeError(f"Feature endpoint request failed: {exc}") from exc
+            raise FeatureEndpointError(f"Feature endpoint request failed: {exc}") from exc
 
         if not isinstance(payload, dict):
-            raise RuntimeError("Unexpected feature endpoint payload; expected object")
+            raise FeatureEndpointError("Unexpected feature endpoint payload; expected object")
 
         vectors_raw = payload.get("feature_vectors")
         sensors_raw = payload.get("current_sensors")
-        if not isinstance(vectors_raw, list) or not isinstance(sensors_raw, list):
-            raise RuntimeError("Invalid feature endpoint payload structure")
+        # Producers from before partial-window reports omit the key.
+        partial_raw = payload.get("partial_windows", [])
+        if not isinstance(vectors_raw, list) or not isinstance(sensors_raw, list) or not isinstance(partial_raw, list):
+            raise FeatureEndpointError("Invalid feature endpoint payload structure")
 
-        vectors: List[FeatureVectorResponse] = [FeatureVectorResponse(**item) for item in vectors_raw]
+        try:
+            matrix = FeatureMatrix.from_records(vectors_raw)
+        except (TypeError, ValueError) as exc:
+            raise FeatureEndpointError(f"Invalid feature vectors in feature endpoint payload: {exc}") from exc
         sensor_models: List[Sensor] = [Sensor(**item) for item in sensors_raw]
+        partial_windows = [PartialWindowReport(**item) for item in partial_raw]
         logger.debug(
-            "Received %s feature vectors and %s sensor snapshots",
-            len(vectors),
+            "Received %s feature vectors (%s on partial windows) and %s sensor snapshots",
+            len(matrix),
+            len(partial_windows),
             len(sensor_models),
         )
-        return FeatureVectorsResult(feature_vectors=vectors, current_sensors=sensor_models)
+        return FeatureMatrixResult(feature_matrix=matrix, current_sensors=sensor_models, partial_windows=partial_windows)
 
     def fetch_recent_window(
         self,
         window_hours: int,
         sensor_id: Optional[str] = None,
         end: Optional[int] = None,
-    ) -> FeatureVectorsResult:
+    ) -> FeatureMatrixResult:
         now = end or int(datetime.now(tz=timezone.utc).timestamp())
         start = now - int(window_hours * 60 * 60)
         return self.fetch_feature_vectors(start=start, end=now, sensor_id=sensor_id)
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+import logging
 import pickle
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from hmmlearn.hmm import GaussianHMM
+
+from ..entities.feature_matrix import FeatureMatrix
+from ..utils.metrics import observe_stage
+
+if TYPE_CHECKING:
+    # Only needed for annotations; unpickling the artifacts imports them on load.
+    from hmmlearn.hmm import GaussianHMM
+    from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(log_weights: np.ndarray) -> np.ndarray:
+    """Row-wise probabilities from log weights; rows without any finite weight become NaN."""
+    probs = np.exp(log_weights - log_weights.max(axis=1, keepdims=True))
+    return probs / probs.sum(axis=1, keepdims=True)
 
 
 class HMMPredictor:
@@ -17,6 +32,7 @@ class HMMPredictor:
         self._state_label_map: Dict[int, str] = {}
         self._state_color_map: Dict[str, Any] = {}
         self._feature_cols: List[str] = []
+        self._feature_imputation = "zero"
         self._load_artifacts()
 
     def _load_pickle(self, filename: str):
@@ -31,6 +47,8 @@ class HMMPredictor:
         self._feature_cols = config.get("feature_cols", [])
         if not self._feature_cols:
             raise ValueError("Config does not contain `feature_cols` order.")
+        # Models trained before the setting existed saw missing readings as 0.
+        self._feature_imputation = config.get("feature_imputation", "zero")
 
         self._scaler = self._load_pickle("hmm_scaler.pkl")
         self._model = self._load_pickle("hmm_occupancy_model.pkl")
@@ -39,20 +57,88 @@ class HMMPredictor:
         self._state_label_map = labels_meta.get("state_label_map", {})
         self._state_color_map = labels_meta.get("state_color_map", {})
 
+    @property
+    def feature_cols(self) -> List[str]:
+        return list(self._feature_cols)
+
+    @property
+    def feature_imputation(self) -> str:
+        """How the training features filled missing readings; the producer has to fill them the same way."""
+        return self._feature_imputation
+
     def predict(self, feature_vector: Dict[str, float]) -> Dict[str, Any]:
         missing = [col for col in self._feature_cols if col not in feature_vector]
         if missing:
             raise ValueError(f"Missing features for inference: {missing}")
 
+        ordered_values = np.array([[feature_vector[col] for col in self._feature_cols]], dtype=np.float64)
+        states, probs = self._score(ordered_values)
+        return self._to_result(int(states[0]), probs[0])
+
+    @property
+    def state_labels(self) -> List[str]:
+        """Label of each state index, as used for `state_label` and `state_probabilities`."""
+        if self._model is None:
+            raise RuntimeError("Model artifacts not loaded.")
+        return [self._state_label_map.get(i, f"State {i}") for i in range(self._model.n_components)]
+
+    def predict_values(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """States and state probabilities of rows already in `feature_cols` order."""
+        if values.ndim != 2 or values.shape[1] != len(self._feature_cols):
+            raise ValueError(f"Expected values of shape (n, {len(self._feature_cols)}), got {values.shape}")
+        return self._score(values)
+
+    def predict_matrix(self, matrix: FeatureMatrix) -> List[Dict[str, Any]]:
+        states, probs = self._score(matrix.select(self._feature_cols))
+        return [self._to_result(state, row) for state, row in zip(states.tolist(), probs)]
+
+    def warm_up(self, rows: int = 8) -> None:
+        """Score a synthetic matrix at the scaler means to initialize the numeric code paths."""
+        if self._scaler is None:
+            raise RuntimeError("Model artifacts not loaded.")
+        matrix = FeatureMatrix.empty()
+        values = np.zeros((rows, len(matrix.columns)), dtype=np.float64)
+        values[:, matrix.column_indices(self._feature_cols)] = self._scaler.mean_
+        self.predict_matrix(
+            FeatureMatrix(
+                sensor_ids=np.array([f"warmup-{idx}" for idx in range(rows)], dtype=object),
+                timestamps=np.zeros(rows, dtype=np.int64),
+                values=values,
+            )
+        )
+
+    def _score(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Score each row as an independent single-observation sequence."""
         if self._scaler is None or self._model is None:
             raise RuntimeError("Model artifacts not loaded.")
 
-        ordered_values = np.array([[feature_vector[col] for col in self._feature_cols]])
-        scaled = self._scaler.transform(ordered_values)
-        state_idx = int(self._model.predict(scaled)[0])
-        probs = self._model.predict_proba(scaled)[0]
+        with observe_stage("scale_features"):
+            scaled = self._scaler.transform(values)
+        # For a sequence of length one the posterior is the normalized product of
+        # start probability and emission likelihood, so all rows can be scored at once
+        # instead of running the forward-backward pass per vector. The emission
+        # likelihood comes from hmmlearn's private API, hence the exact pin in
+        # requirements.txt.
+        with observe_stage("inference"), np.errstate(divide="ignore", invalid="ignore"):
+            log_likelihood = self._model._compute_log_likelihood(scaled)
+            probs = _normalize(log_likelihood + np.log(self._model.startprob_))
+            unscored = ~np.isfinite(probs).all(axis=1)
+            if unscored.any():
+                # Only states that cannot start a sequence can emit these rows: rank the states
+                # by their emission likelihood alone, and treat them as equal if that vanishes too.
+                probs[unscored] = _normalize(log_likelihood[unscored])
+                uniform = ~np.isfinite(probs).all(axis=1)
+                probs[uniform] = 1.0 / probs.shape[1]
+                logger.warning(
+                    "Scored %d of %d vectors without start probabilities (%d uniformly)",
+                    int(unscored.sum()),
+                    len(probs),
+                    int(uniform.sum()),
+                )
+        return probs.argmax(axis=1), probs
 
-        result = {
+    def _to_result(self, state_idx: int, probs: np.ndarray) -> Dict[str, Any]:
+        return {
             "state": state_idx,
             "state_label": self._state_label_map.get(state_idx, f"State {state_idx}"),
             "state_probabilities": {
@@ -60,4 +146,3 @@ class HMMPredictor:
                 for i, prob in enumerate(probs)
             },
         }
-        return result
\ No newline at end of file
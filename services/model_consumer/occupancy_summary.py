@@ -0,0 +1,236 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import math
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Literal, Mapping, Optional, Sequence
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from ..entities.occupancy_group import OccupancyGroup
+from ..entities.occupancy_summary import OccupancySummary
+from ..entities.prediction_result import PredictionResult
+from ..settings import get_settings
+from ..utils import deadline
+from ..utils.fast_json import FastJSONResponse
+from ..utils.logging_setup import request_id_var
+from ..utils.sensor_hierarchy import SensorHierarchy
+from .prediction_endpoint import get_endpoint
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("building", "floor", "room")
+
+
+def _group_mean(values: np.ndarray, groups: np.ndarray, count: int) -> np.ndarray:
+    sums = np.zeros((count, values.shape[1]), dtype=np.float64)
+    np.add.at(sums, groups, values)
+    return sums / np.maximum(np.bincount(groups, minlength=count), 1)[:, None]
+
+
+def _groups(
+    group_ids: np.ndarray,
+    parent_ids: Optional[np.ndarray],
+    distributions: np.ndarray,
+    sensor_counts: np.ndarray,
+    room_counts: np.ndarray,
+    labels: Sequence[str],
+    occupancy: Optional[np.ndarray],
+) -> List[OccupancyGroup]:
+    likely = distributions.argmax(axis=1) if len(labels) else np.zeros(len(group_ids), dtype=np.intp)
+    expected = (distributions @ occupancy).tolist() if occupancy is not None else [None] * len(group_ids)
+    return [
+        OccupancyGroup(
+            group_id=group_id,
+            parent_id=parent_ids[idx] if parent_ids is not None else None,
+            sensor_count=sensor_count,
+            room_count=room_count,
+            state_distribution=dict(zip(labels, distribution)),
+            most_likely_state=labels[likely[idx]] if labels else "",
+            expected_occupancy=expected[idx],
+        )
+        for idx, (group_id, distribution, sensor_count, room_count) in enumerate(
+            zip(group_ids.tolist(), distributions.tolist(), sensor_counts.tolist(), room_counts.tolist())
+        )
+    ]
+
+
+def summarize(
+    result: PredictionResult,
+    labels: Sequence[str],
+    hierarchy: SensorHierarchy,
+    state_occupancy: Optional[Mapping[str, float]] = None,
+    computed_at: Optional[int] = None,
+) -> OccupancySummary:
+    """Aggregate per-sensor state probabilities into rooms, floors and buildings.
+
+    A room's distribution is the mean over its sensors; floors and buildings
+    average their rooms, so a room with many sensors does not outweigh the
+    others. `expected_occupancy` weights the distribution with `state_occupancy`
+    and is left out unless every state has a level.
+    """
+    labels = list(labels)
+    sensor_ids = [prediction.sensor_id for prediction in result.predictions]
+    probabilities = np.array(
+        [[prediction.state_probabilities.get(label, 0.0) for label in labels] for prediction in result.predictions],
+        dtype=np.float64,
+    ).reshape(len(sensor_ids), len(labels))
+    occupancy = None
+    if state_occupancy and all(label in state_occupancy for label in labels):
+        occupancy = np.array([state_occupancy[label] for label in labels], dtype=np.float64)
+
+    layout = hierarchy.layout(sensor_ids)
+    room_count, floor_count, building_count = len(layout.room_ids), len(layout.floor_ids), len(layout.building_ids)
+    room_building = layout.floor_building[layout.room_floor]
+    room_sensors = np.bincount(layout.sensor_room, minlength=room_count)
+    rooms = _group_mean(probabilities, layout.sensor_room, room_count)
+
+    return OccupancySummary(
+        computed_at=computed_at if computed_at is not None else int(time.time()),
+        sensor_count=len(sensor_ids),
+        state_labels=labels,
+        buildings=_groups(
+            layout.building_ids,
+            None,
+            _group_mean(rooms, room_building, building_count),
+            np.bincount(room_building, weights=room_sensors, minlength=building_count).astype(np.int64),
+            np.bincount(room_building, minlength=building_count),
+            labels,
+            occupancy,
+        ),
+        floors=_groups(
+            layout.floor_ids,
+            layout.building_ids[layout.floor_building],
+            _group_mean(rooms, layout.room_floor, floor_count),
+            np.bincount(layout.room_floor, weights=room_sensors, minlength=floor_count).astype(np.int64),
+            np.bincount(layout.room_floor, minlength=floor_count),
+            labels,
+            occupancy,
+        ),
+        rooms=_groups(
+            layout.room_ids,
+            layout.floor_ids[layout.room_floor],
+            rooms,
+            room_sensors,
+            np.ones(room_count, dtype=np.int64),
+            labels,
+            occupancy,
+        ),
+    )
+
+
+class OccupancySummaryCache:
+    """Occupancy summaries recomputed once per refresh cycle and served as pre-encoded JSON.
+
+    The refresh loop starts with the first request and then keeps the summary
+    current, so requests only look up bytes. If a refresh fails, the previous
+    summary stays in place; its `computed_at` shows the age. After
+    `idle_seconds` without a request the loop stops and drops the summary, so a
+    worker nobody asks does not keep computing; the next request starts it again.
+    """
+
+    def __init__(self, compute: Callable[[], OccupancySummary], refresh_seconds: float, idle_seconds: float) -> None:
+        self.compute = compute
+        self.refresh_seconds = refresh_seconds
+        self.idle_seconds = idle_seconds
+        self._bodies: Dict[Optional[str], bytes] = {}
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_request = 0.0
+
+    async def body(self, level: Optional[str]) -> bytes:
+        self._last_request = time.monotonic()
+        if self._task is None:
+            self._ready = asyncio.Event()
+            # A fresh context keeps the loop from writing into the first request's state.
+            self._task = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+        if not self._ready.is_set():
+            left = deadline.remaining()
+            try:
+                await asyncio.wait_for(self._ready.wait(), left if left is not None else self.refresh_seconds)
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Occupancy summary not computed yet",
+                    headers={"Retry-After": str(max(1, math.ceil(self.refresh_seconds)))},
+                ) from None
+        return self._bodies[level]
+
+    async def _run(self) -> None:
+        request_id_var.set("occupancy-summary")
+        while True:
+            try:
+                self.publish(await run_in_threadpool(self.compute))
+            except HTTPException as exc:
+                logger.warning("Occupancy summary refresh failed (%s): %s", exc.status_code, exc.detail)
+            except Exception:
+                logger.exception("Occupancy summary refresh failed")
+            await asyncio.sleep(self.refresh_seconds)
+            if time.monotonic() - self._last_request >= self.idle_seconds:
+                logger.debug("Occupancy summary idle for %.0fs, stopping refreshes", self.idle_seconds)
+                self._reset()
+                return
+
+    def _reset(self) -> None:
+        self._task = None
+        self._ready = None
+        self._bodies = {}
+
+    async def close(self) -> None:
+        """Cancel the refresh loop, if it runs."""
+        task = self._task
+        self._reset()
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def publish(self, summary: OccupancySummary) -> None:
+        header = {"computed_at": summary.computed_at, "sensor_count": summary.sensor_count, "state_labels": summary.state_labels}
+        bodies: Dict[Optional[str], bytes] = {None: FastJSONResponse(summary).body}
+        for level in LEVELS:
+            only = OccupancySummary(**header, **{f"{level}s": getattr(summary, f"{level}s")})
+            bodies[level] = FastJSONResponse(only).body
+        self._bodies = bodies
+        if self._ready is not None:
+            self._ready.set()
+        logger.debug(
+            "Occupancy summary refreshed: %d buildings, %d floors, %d rooms",
+            len(summary.buildings),
+            len(summary.floors),
+            len(summary.rooms),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_summary_cache() -> OccupancySummaryCache:
+    settings = get_settings()
+    hierarchy = SensorHierarchy(settings.sensor_rooms, settings.room_floors, settings.floor_buildings)
+
+    def compute() -> OccupancySummary:
+        endpoint = get_endpoint()
+        return summarize(endpoint.latest_predictions(), endpoint.predictor.state_labels, hierarchy, settings.state_occupancy)
+
+    return OccupancySummaryCache(compute, settings.summary_refresh_seconds, settings.summary_idle_seconds)
+
+
+async def close_summary_cache() -> None:
+    """Stop the refresh loop, if a request started it."""
+    if get_summary_cache.cache_info().currsize:
+        await get_summary_cache().close()
+
+
+router = APIRouter()
+
+
+@router.get("/predictions/summary", response_model=OccupancySummary)
+async def get_occupancy_summary(
+    level: Optional[Literal["building", "floor", "room"]] = Query(None, description="Only return this level"),
+):
+    """Expected state distribution per building, floor and room of the latest predictions."""
+    return Response(await get_summary_cache().body(level), media_type="application/json")
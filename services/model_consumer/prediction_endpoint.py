@@ -1,12 +1,19 @@
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import List, Optional, Sequence
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 
 from ..entities.prediction_response import PredictionResponse
 from ..entities.prediction_result import PredictionResult
 from ..settings import get_settings
+from ..utils.fast_json import FastJSONResponse
+from ..utils.metrics import observe_stage
+from ..utils.profiling import profiled
+from ..utils.sensor_selection import resolve_sensor_selection, selection_key
+from ..utils.shared_cache import SharedCache, open_shared_cache
 from .feature_vector_client import FeatureVectorClient
 from .model_consumer import HMMPredictor
 
@@ -14,15 +21,35 @@ logger = logging.getLogger(__name__)
 
 
 class PredictionEndpoint:
-    def __init__(self, client: FeatureVectorClient, predictor: HMMPredictor) -> None:
+    def __init__(
+        self,
+        client: FeatureVectorClient,
+        predictor: HMMPredictor,
+        cache: Optional[SharedCache] = None,
+        project_features: bool = False,
+    ) -> None:
         self.client = client
         self.predictor = predictor
-        logger.info("PredictionEndpoint initialized")
+        self.cache = cache
+        # Ask the producer for the model's features only, so it skips unused measurement types.
+        self.features = predictor.feature_cols if project_features else None
+        logger.info(
+            "PredictionEndpoint initialized shared_cache=%s project_features=%s",
+            cache.path if cache else "-",
+            project_features,
+        )
 
-    def compute_predictions(self, start: int, end: int, sensor_id: Optional[str]) -> PredictionResult:
+    def compute_predictions(
+        self,
+        start: int,
+        end: int,
+        sensor_id: Optional[str],
+        sensor_ids: Optional[Sequence[str]] = None,
+    ) -> PredictionResult:
         logger.info(
-            "Computing predictions sensor_id=%s window_start=%s window_end=%s",
+            "Computing predictions sensor_id=%s sensor_ids=%s window_start=%s window_end=%s",
             sensor_id or "*",
+            len(sensor_ids) if sensor_ids is not None else "-",
             start,
             end,
         )
@@ -32,85 +59,146 @@ class PredictionEndpoint:
 
         logger.debug("Fetching feature vectors from producer for start=%s, end=%s, sensor_id=%s", start, end, sensor_id)
         try:
-            vector_bundle = self.client.fetch_feature_vectors(start=start, end=end, sensor_id=sensor_id)
+            vector_bundle = self.client.fetch_feature_vectors(
+                start=start,
+                end=end,
+                sensor_id=sensor_id,
+                sensor_ids=sensor_ids,
+                features=self.features,
+            )
             logger.debug("Successfully fetched feature vector bundle with %d vectors and %d current sensors", 
-                        len(vector_bundle.feature_vectors), len(vector_bundle.current_sensors))
+                        len(vector_bundle.feature_matrix), len(vector_bundle.current_sensors))
         except RuntimeError as exc:
             logger.exception("Failed to fetch feature vectors from producer")
-            raise HTTPException(status_code=502, detail=str(exc)) from exc
+            # A producer that ran out of our deadline is a timeout, not a bad gateway.
+            status = 504 if getattr(exc, "status_code", None) == 504 else 502
+            raise HTTPException(status_code=status, detail=str(exc)) from exc
 
-        vectors = vector_bundle.feature_vectors
-        logger.debug("Processing %d feature vectors for predictions", len(vectors))
-        if not vectors:
+        matrix = vector_bundle.feature_matrix
+        logger.debug("Processing %d feature vectors for predictions", len(matrix))
+        if not len(matrix):
             logger.warning("No feature vectors available for the requested window (start=%s, end=%s, sensor_id=%s)", start, end, sensor_id or "*")
             raise HTTPException(status_code=404, detail="No feature vectors available for the requested window")
 
-        predictions: List[PredictionResponse] = []
-        logger.debug("Starting prediction loop for %d vectors", len(vectors))
-        for i, vector in enumerate(vectors):
-            logger.debug("Processing vector %d/%d for sensor_id=%s", i+1, len(vectors), vector.sensor_id)
-            try:
-                feature_dict = self._vector_to_dict(vector)
-                logger.debug("Converted vector to dict with %d features", len(feature_dict))
-                result = self.predictor.predict(feature_dict)
-                logger.debug("Prediction result for sensor %s: state=%s, label=%s", vector.sensor_id, result["state"], result["state_label"])
-            except ValueError as exc:
-                logger.error("Unable to score vector sensor_id=%s: %s", vector.sensor_id, exc)
-                raise HTTPException(status_code=400, detail=str(exc)) from exc
-            except RuntimeError as exc:
-                logger.exception("Model artifacts unavailable for prediction on sensor %s", vector.sensor_id)
-                raise HTTPException(status_code=500, detail=str(exc)) from exc
-
-            prediction = PredictionResponse(
-                sensor_id=vector.sensor_id,
-                state=result["state"],
-                state_label=result["state_label"],
-                state_probabilities=result["state_probabilities"],
-            )
-            predictions.append(prediction)
-            logger.debug("Added prediction for sensor %s", vector.sensor_id)
-
-        result = PredictionResult(predictions=predictions, current_sensors=vector_bundle.current_sensors)
+        try:
+            results = self.predictor.predict_matrix(matrix)
+        except ValueError as exc:
+            logger.error("Unable to score feature vectors: %s", exc)
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        except RuntimeError as exc:
+            logger.exception("Model artifacts unavailable for prediction")
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+        with observe_stage("serialize_response"):
+            predictions: List[PredictionResponse] = [
+                PredictionResponse(
+                    sensor_id=vector_sensor_id,
+                    state=result["state"],
+                    state_label=result["state_label"],
+                    state_probabilities=result["state_probabilities"],
+                )
+                for vector_sensor_id, result in zip(matrix.sensor_ids, results)
+            ]
+            result = PredictionResult(predictions=predictions, current_sensors=vector_bundle.current_sensors)
         logger.info("Successfully computed %d predictions for sensor_id=%s", len(predictions), sensor_id or "*")
         return result
 
-    @staticmethod
-    def _vector_to_dict(vector: Any) -> Dict[str, float]:
-        logger.debug("Converting feature vector to dict, vector type: %s", type(vector).__name__)
-        dump = getattr(vector, "model_dump", None)
-        if callable(dump):
-            logger.debug("Using model_dump() method for conversion")
-            return dump()
-        if hasattr(vector, "dict"):
-            logger.debug("Using dict() method for conversion")
-            return vector.dict()
-        logger.error("Unsupported feature vector instance type: %s", type(vector).__name__)
-        raise ValueError("Unsupported feature vector instance")
+    def cached_predictions(
+        self,
+        start: int,
+        end: int,
+        sensor_ids: Optional[Sequence[str]],
+        latest: bool = False,
+    ) -> PredictionResult:
+        """`compute_predictions` through the shared cache; the latest window shares one entry."""
+        if self.cache is None:
+            return self.compute_predictions(start=start, end=end, sensor_id=None, sensor_ids=sensor_ids)
+        window = "latest" if latest else f"{start}-{end}"
+        return self.cache.get_or_refresh(
+            f"predictions:{window}:{selection_key(sensor_ids)}",
+            lambda: self.compute_predictions(start=start, end=end, sensor_id=None, sensor_ids=sensor_ids),
+            cache="predictions",
+        )
+
+    def latest_predictions(self) -> PredictionResult:
+        """Predictions of all sensors over the default window ending now."""
+        end = int(datetime.now(tz=timezone.utc).timestamp())
+        start = end - get_settings().default_time_window_hours * 60 * 60
+        return self.cached_predictions(start=start, end=end, sensor_ids=None, latest=True)
+
+
+@lru_cache(maxsize=1)
+def get_endpoint() -> PredictionEndpoint:
+    """Load the model and open the producer session on first use instead of at import."""
+    predictor = HMMPredictor()
+    imputation = get_settings().feature_imputation
+    if predictor.feature_imputation != imputation:
+        # Vectors filled differently than the training data would be scored without any error.
+        raise ValueError(
+            f"Model in {predictor.model_dir} was trained with feature imputation {predictor.feature_imputation!r}, "
+            f"but FEATURE_PRODUCER_FEATURE_IMPUTATION is {imputation!r}"
+        )
+    return PredictionEndpoint(
+        client=FeatureVectorClient(),
+        predictor=predictor,
+        cache=open_shared_cache("model-consumer"),
+        project_features=get_settings().feature_projection_enabled,
+    )
+
+
+def warm_up() -> None:
+    """Load the artifacts and run one synthetic inference and response serialization."""
+    endpoint = get_endpoint()
+    endpoint.predictor.warm_up()
+    jsonable_encoder(PredictionResult(
+        predictions=[PredictionResponse(sensor_id="warmup", state=0, state_label="warmup", state_probabilities={})],
+        current_sensors=[],
+    ))
 
 
 router = APIRouter()
+# Field names of the response (`sensor_id`, not the upstream `sensorId`); shared by both JSON paths.
+RESPONSE_BY_ALIAS = False
 settings = get_settings()
-endpoint = PredictionEndpoint(client=FeatureVectorClient(), predictor=HMMPredictor())
 
 
-@router.get("/predictions", response_model=PredictionResult, response_model_by_alias=False)
+@router.get("/predictions", response_model=PredictionResult, response_model_by_alias=RESPONSE_BY_ALIAS)
+@profiled
 def get_predictions(
     start: Optional[int] = Query(None, description="Window start timestamp (epoch seconds)"),
     end: Optional[int] = Query(None, description="Window end timestamp (epoch seconds)"),
     sensor_id: Optional[str] = Query(None, description="Optional sensor ID filter"),
+    sensor_ids: Optional[List[str]] = Query(
+        None,
+        description="Sensor IDs to include (repeat the parameter or separate with commas)",
+    ),
+    group: Optional[str] = Query(None, description="Named sensor group from the sensor_groups setting"),
+    endpoint: PredictionEndpoint = Depends(get_endpoint),
 ):
-    logger.info(
+    logger.debug(
         "GET /predictions start=%s end=%s sensor_id=%s",
         start,
         end,
         sensor_id,
     )
     now = int(datetime.now(tz=timezone.utc).timestamp())
-    logger.debug("Current timestamp: %s", now)
     window_end = end or now
     default_window_seconds = settings.default_time_window_hours * 60 * 60
     window_start = start or (window_end - default_window_seconds)
     logger.debug("Calculated window: start=%s, end=%s (default_window_hours=%s)", window_start, window_end, settings.default_time_window_hours)
 
-    logger.debug("Calling compute_predictions with start=%s, end=%s, sensor_id=%s", window_start, window_end, sensor_id)
-    return endpoint.compute_predictions(start=window_start, end=window_end, sensor_id=sensor_id)
+    try:
+        selection = resolve_sensor_selection(sensor_id, sensor_ids, group, settings.sensor_groups)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    logger.debug("Calling compute_predictions with start=%s, end=%s, sensors=%s", window_start, window_end, selection or "*")
+    result = endpoint.cached_predictions(
+        start=window_start,
+        end=window_end,
+        sensor_ids=selection,
+        latest=start is None and end is None,
+    )
+    if settings.fast_json_responses:
+        with observe_stage("serialize_response"):
+            return FastJSONResponse(result, by_alias=RESPONSE_BY_ALIAS)
+    return result
@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import json
+import logging
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..entities.prediction_response import PredictionResponse
+from ..entities.prediction_result import PredictionResult
+from ..settings import get_settings
+from ..utils.logging_setup import request_id_var
+from ..utils.metrics import STREAM_SUBSCRIBERS
+from .prediction_endpoint import get_endpoint
+
+logger = logging.getLogger(__name__)
+
+# Probability changes below this are rounding noise and not worth an update event.
+_PROBABILITY_TOLERANCE = 1e-3
+
+
+def _changed(previous: Optional[PredictionResponse], current: PredictionResponse) -> bool:
+    if previous is None or previous.state != current.state:
+        return True
+    old = previous.state_probabilities
+    new = current.state_probabilities
+    return old.keys() != new.keys() or any(abs(old[label] - value) > _PROBABILITY_TOLERANCE for label, value in new.items())
+
+
+class Subscription:
+    """Changes not yet sent to one client, coalesced per sensor.
+
+    Publishing never waits for a client. While a slow client is still writing an
+    earlier event, newer predictions replace older ones in `pending`, so its memory
+    is bounded by the number of sensors and it skips straight to the current state.
+    """
+
+    def __init__(self) -> None:
+        self.pending: Dict[str, PredictionResponse] = {}
+        self.removed: Set[str] = set()
+        self.wakeup = asyncio.Event()
+        self.coalesced = 0
+
+    def push(self, changed: Iterable[PredictionResponse], removed: Iterable[str]) -> None:
+        if self.wakeup.is_set():
+            self.coalesced += 1
+        for prediction in changed:
+            self.pending[prediction.sensor_id] = prediction
+            self.removed.discard(prediction.sensor_id)
+        for sensor_id in removed:
+            self.pending.pop(sensor_id, None)
+            self.removed.add(sensor_id)
+        self.wakeup.set()
+
+    def drain(self) -> Tuple[List[PredictionResponse], List[str]]:
+        changed, removed = list(self.pending.values()), sorted(self.removed)
+        self.pending = {}
+        self.removed = set()
+        self.wakeup.clear()
+        return changed, removed
+
+
+class PredictionBroadcaster:
+    """Runs the prediction pipeline once per refresh cycle and fans the changes out to all subscribers.
+
+    The refresh loop only runs while at least one client is connected. Each worker
+    process runs its own loop; with the shared cache they still share one pipeline
+    run per cache TTL.
+    """
+
+    def __init__(self, fetch: Callable[[], PredictionResult], refresh_seconds: float, max_subscribers: int) -> None:
+        self.fetch = fetch
+        self.refresh_seconds = refresh_seconds
+        self.max_subscribers = max_subscribers
+        self.latest: Dict[str, PredictionResponse] = {}
+        self.cycle = 0
+        self._subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def check_capacity(self) -> None:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many prediction stream connections",
+                headers={"Retry-After": str(int(self.refresh_seconds))},
+            )
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        self._subscribers.add(subscription)
+        STREAM_SUBSCRIBERS.inc()
+        if self._task is None:
+            # A fresh context keeps the loop from writing into the first subscriber's request state.
+            self._task = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription not in self._subscribers:
+            return
+        self._subscribers.discard(subscription)
+        STREAM_SUBSCRIBERS.dec()
+        if subscription.coalesced:
+            logger.info("Stream client fell behind; %d updates were coalesced", subscription.coalesced)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self.latest = {}
+            self.cycle = 0
+
+    async def _run(self) -> None:
+        request_id_var.set("prediction-stream")
+        while True:
+            try:
+                self.publish(await run_in_threadpool(self.fetch))
+            except HTTPException as exc:
+                logger.warning("Prediction stream refresh failed (%s): %s", exc.status_code, exc.detail)
+            except Exception:
+                logger.exception("Prediction stream refresh failed")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def publish(self, result: PredictionResult) -> None:
+        current = {prediction.sensor_id: prediction for prediction in result.predictions}
+        changed = [prediction for sensor_id, prediction in current.items() if _changed(self.latest.get(sensor_id), prediction)]
+        removed = [sensor_id for sensor_id in self.latest if sensor_id not in current]
+        self.latest = current
+        self.cycle += 1
+        logger.debug("Stream cycle %d: %d changed, %d removed sensors", self.cycle, len(changed), len(removed))
+        if changed or removed or self.cycle == 1:
+            for subscription in self._subscribers:
+                subscription.push(changed, removed)
+
+
+def _format_event(event: str, event_id: int, payload: dict) -> str:
+    return f"event: {event}\nid: {event_id}\ndata: {json.dumps(jsonable_encoder(payload), separators=(',', ':'))}\n\n"
+
+
+async def _wait(subscription: Subscription, heartbeat_seconds: float) -> bool:
+    try:
+        await asyncio.wait_for(subscription.wakeup.wait(), heartbeat_seconds)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def _events(broadcaster: PredictionBroadcaster, heartbeat_seconds: float) -> AsyncIterator[str]:
+    # Subscribing inside the generator guarantees the matching unsubscribe runs on disconnect.
+    subscription = broadcaster.subscribe()
+    try:
+        while not broadcaster.cycle:
+            if not await _wait(subscription, heartbeat_seconds):
+                yield ": keep-alive\n\n"
+        subscription.drain()
+        yield _format_event("snapshot", broadcaster.cycle, {"predictions": list(broadcaster.latest.values())})
+        while True:
+            if not await _wait(subscription, heartbeat_seconds):
+                yield ": keep-alive\n\n"
+                continue
+            changed, removed = subscription.drain()
+            yield _format_event("update", broadcaster.cycle, {"predictions": changed, "removed": removed})
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@lru_cache(maxsize=1)
+def get_broadcaster() -> PredictionBroadcaster:
+    settings = get_settings()
+    return PredictionBroadcaster(
+        fetch=lambda: get_endpoint().latest_predictions(),
+        refresh_seconds=settings.stream_refresh_seconds,
+        max_subscribers=settings.stream_max_connections,
+    )
+
+
+router = APIRouter()
+
+
+@router.get("/predictions/stream")
+async def stream_predictions() -> StreamingResponse:
+    """Server-sent events: a `snapshot` of all sensors, then `update` events with changed sensors only."""
+    broadcaster = get_broadcaster()
+    broadcaster.check_capacity()
+    return StreamingResponse(
+        _events(broadcaster, get_settings().stream_heartbeat_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
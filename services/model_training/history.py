@@ -0,0 +1,92 @@
+import logging
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from ..entities.feature_matrix import FeatureMatrix
+from ..entities.sensor import Sensor
+from ..feature_producer.api_client import APIClient
+from ..feature_producer.batch_codec import BatchCodec
+from ..feature_producer.featurizer import Featurizer
+from ..feature_producer.lecture_index import load_lecture_index
+from ..feature_producer.measurement_parser import flatten_measurements
+from ..settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def load_archives(paths: Iterable[str], start: int, end: int) -> List[Sensor]:
+    """Measurements in [start, end] from `BatchCodec` archives."""
+    codec = BatchCodec()
+    sensors: List[Sensor] = []
+    for path in paths:
+        with open(path, "rb") as fh:
+            for series in codec.iter_series(fh, start=start, end=end):
+                sensors.extend(series.to_sensors())
+    logger.info("Loaded %d measurements from archives", len(sensors))
+    return sensors
+
+
+def fetch_history(client: APIClient, start: int, end: int, chunk_hours: int = 24) -> List[Sensor]:
+    """Measurements in [start, end] from HM-Sense, fetched in windows of `chunk_hours`."""
+    sensors: List[Sensor] = []
+    step = chunk_hours * 60 * 60
+    for chunk_start in range(start, end + 1, step):
+        # Windows are inclusive on both ends; stop one second early so no measurement appears twice.
+        chunk_end = min(chunk_start + step - 1, end)
+        payload = client.get_all_measurements(start=chunk_start, end=chunk_end)
+        sensors.extend(flatten_measurements(payload.get("responseData", [])))
+        logger.info("Fetched history %s-%s (%d measurements so far)", chunk_start, chunk_end, len(sensors))
+    return sensors
+
+
+def save_archive(sensors: Sequence[Sensor], path: str) -> int:
+    """Store fetched measurements, so a training run can be repeated on the same data."""
+    with open(path, "wb") as fh:
+        return BatchCodec().write(sensors, fh)
+
+
+def _extract_history(featurizer: Featurizer, sensors: Sequence[Sensor], start: int, end: int) -> FeatureMatrix:
+    return featurizer.extract_history(sensors, start, end)
+
+
+def build_matrix(
+    featurizer: Featurizer,
+    sensors: Sequence[Sensor],
+    start: int,
+    end: int,
+    workers: int = 1,
+) -> FeatureMatrix:
+    """Feature history of all sensors, featurized in up to `workers` processes.
+
+    Each process gets whole sensors, so every vector still sees its complete
+    look-back window. Rows are grouped by sensor and ordered by time.
+    """
+    by_sensor: Dict[str, List[Sensor]] = defaultdict(list)
+    for sensor in sensors:
+        by_sensor[sensor.sensor_id].append(sensor)
+    shards: List[List[Sensor]] = [[] for _ in range(max(1, min(workers, len(by_sensor))))]
+    # Largest sensors first onto the smallest shard, so the processes finish at about the same time.
+    for series in sorted(by_sensor.values(), key=len, reverse=True):
+        min(shards, key=len).extend(series)
+
+    if len(shards) == 1:
+        matrix = _extract_history(featurizer, shards[0], start, end)
+    else:
+        # spawn, not fork: thread pools of numerical libraries do not survive a fork.
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(_extract_history, [featurizer] * len(shards), shards, [start] * len(shards), [end] * len(shards)))
+        matrix = FeatureMatrix.concat(parts)
+    logger.info("Built feature history of %d vectors from %d sensors", len(matrix), len(by_sensor))
+    return matrix
+
+
+def featurizer_for(feature_cols: Sequence[str], settings: Optional[Settings] = None, imputation: str = "zero") -> Featurizer:
+    """A featurizer producing `feature_cols`, with the cached timetables if lecture columns are among them."""
+    unknown = set(feature_cols) - set(FeatureMatrix.columns_for(2))
+    if unknown:
+        raise ValueError(f"Unknown features: {sorted(unknown)}")
+    if set(feature_cols) <= set(FeatureMatrix.columns_for(1)):
+        return Featurizer(imputation=imputation)
+    return Featurizer(lecture_index=load_lecture_index(settings), imputation=imputation)
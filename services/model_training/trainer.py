@@ -0,0 +1,420 @@
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..entities.feature_matrix import FeatureMatrix
+from ..feature_producer.api_client import APIClient
+from ..feature_producer.featurizer import Featurizer
+from ..settings import get_settings
+from .history import build_matrix, featurizer_for, fetch_history, load_archives, save_archive
+
+if TYPE_CHECKING:
+    from hmmlearn.hmm import GaussianHMM
+    from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+# Feature set of the shipped model.
+FEATURE_COLS = (
+    "co2", "residual_co2", "avg_co2_60m", "std_co2_60m", "delta_5m_co2", "delta_30m_co2", "delta_60m_co2",
+    "motion", "avg_motion", "max_motion", "std_motion", "count_motion_10m", "count_motion_30m",
+    "recent_motion_10m", "motion_off_hours", "light_level", "light", "light_recent_motion", "daylight_factor",
+    "light_on_at_night", "hour_of_day", "day_of_week", "is_weekend", "is_off_hours", "is_night", "season",
+)
+# Features that indicate presence; states are numbered by their mean of these, least activity first.
+INTERPRETATION_FEATURES = (
+    "residual_co2", "delta_5m_co2", "delta_30m_co2", "delta_60m_co2", "co2", "motion", "avg_motion",
+    "max_motion", "std_motion", "count_motion_10m", "count_motion_30m", "recent_motion_10m", "light",
+    "light_recent_motion",
+)
+# matplotlib's Set2 palette, as in the shipped state color map.
+STATE_COLORS = (
+    (0.4, 0.7607843137254902, 0.6470588235294118),
+    (0.9882352941176471, 0.5529411764705883, 0.3843137254901961),
+    (0.5529411764705883, 0.6274509803921569, 0.796078431372549),
+    (0.9058823529411765, 0.5411764705882353, 0.7647058823529411),
+    (0.6509803921568628, 0.8470588235294118, 0.32941176470588235),
+    (1.0, 0.8509803921568627, 0.1843137254901961),
+    (0.8980392156862745, 0.7686274509803922, 0.5803921568627451),
+    (0.7019607843137254, 0.7019607843137254, 0.7019607843137254),
+)
+
+# Scaled training and held-out observations with their sequence lengths.
+SequenceData = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+@dataclass(frozen=True)
+class TrainingConfig:
+    feature_cols: Tuple[str, ...] = FEATURE_COLS
+    candidate_states: Tuple[int, ...] = (3, 4, 5, 6, 7, 8, 9)
+    restarts: int = 3
+    covariance_type: str = "diag"
+    # Initial self-transition probability; states persist over several measurements.
+    stickiness: float = 0.9
+    n_iter: int = 100
+    tol: float = 1e-2
+    # Share of each sensor's most recent vectors held out for model selection.
+    holdout_fraction: float = 0.2
+    # A longer gap between two measurements of a sensor starts a new sequence.
+    max_gap_seconds: int = 3600
+    seed: int = 0
+    # How the featurizer filled missing readings; the consumer only serves the model with the same one.
+    feature_imputation: str = "zero"
+
+
+@dataclass
+class CandidateFit:
+    n_states: int
+    seed: int
+    seconds: float
+    holdout_log_likelihood: float = -math.inf
+    converged: bool = False
+    iterations: int = 0
+    model: Optional["GaussianHMM"] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class TrainingResult:
+    config: TrainingConfig
+    scaler: "StandardScaler"
+    best: CandidateFit
+    fits: List[CandidateFit]
+    wall_seconds: float
+    training_rows: int
+    holdout_rows: int
+    state_label_map: Dict[int, str] = field(default_factory=dict)
+    state_color_map: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def fit_seconds(self) -> float:
+        """Sum of the individual fit times, about what a serial run spends fitting."""
+        return sum(fit.seconds for fit in self.fits)
+
+    @property
+    def speedup(self) -> float:
+        return self.fit_seconds / self.wall_seconds if self.wall_seconds else 1.0
+
+    def save(self, model_dir: str) -> None:
+        """Write the artifacts in the layout `HMMPredictor` loads."""
+        os.makedirs(model_dir, exist_ok=True)
+        labels = {"state_label_map": self.state_label_map, "state_color_map": self.state_color_map}
+        config = {
+            "selected_n_states": self.best.n_states,
+            "candidate_states": list(self.config.candidate_states),
+            "stickiness": self.config.stickiness,
+            "feature_cols": list(self.config.feature_cols),
+            "interpretation_features": [col for col in INTERPRETATION_FEATURES if col in self.config.feature_cols],
+            "covariance_type": self.config.covariance_type,
+            "feature_imputation": self.config.feature_imputation,
+            "holdout_log_likelihood": self.best.holdout_log_likelihood,
+            "training_rows": self.training_rows,
+            "trained_at": int(time.time()),
+            **labels,
+        }
+        artifacts = {
+            "hmm_config.pkl": config,
+            "hmm_scaler.pkl": self.scaler,
+            "hmm_occupancy_model.pkl": self.best.model,
+            "hmm_state_labels.pkl": labels,
+        }
+        for filename, artifact in artifacts.items():
+            # Write-and-rename so a starting consumer never reads a half-written pickle.
+            fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    pickle.dump(artifact, fh)
+                os.replace(tmp_path, os.path.join(model_dir, filename))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        logger.info("Wrote model artifacts to %s", model_dir)
+
+
+def split_sequences(matrix: FeatureMatrix, config: TrainingConfig) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-sensor observation sequences, split in time into training and held-out parts.
+
+    The last `holdout_fraction` of each sensor's vectors are held out, so the
+    selection scores how well a model explains later, unseen behaviour.
+    """
+    order = np.lexsort((matrix.timestamps, matrix.sensor_ids.astype(str)))
+    values = matrix.select(config.feature_cols)[order]
+    sensor_ids = matrix.sensor_ids[order]
+    timestamps = matrix.timestamps[order]
+    rows = len(values)
+
+    new_sensor = np.r_[True, sensor_ids[1:] != sensor_ids[:-1]] if rows else np.zeros(0, dtype=bool)
+    starts = np.flatnonzero(new_sensor)
+    sizes = np.diff(np.r_[starts, rows])
+    rank = np.arange(rows) - np.repeat(starts, sizes)
+    holdout = rank >= np.repeat(np.ceil(sizes * (1.0 - config.holdout_fraction)).astype(np.int64), sizes)
+    breaks = new_sensor.copy()
+    breaks[1:] |= (np.diff(timestamps) > config.max_gap_seconds) | (holdout[1:] != holdout[:-1])
+
+    def part(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return values[mask], np.diff(np.r_[np.flatnonzero(breaks[mask]), mask.sum()])
+
+    train_values, train_lengths = part(~holdout)
+    holdout_values, holdout_lengths = part(holdout)
+    return train_values, train_lengths, holdout_values, holdout_lengths
+
+
+def _sticky_transmat(n_states: int, stickiness: float) -> np.ndarray:
+    transmat = np.full((n_states, n_states), (1.0 - stickiness) / max(n_states - 1, 1))
+    np.fill_diagonal(transmat, stickiness if n_states > 1 else 1.0)
+    return transmat
+
+
+_worker_data: Optional[SequenceData] = None
+
+
+def _init_worker(data: SequenceData, limit_threads: bool = True) -> None:
+    global _worker_data
+    _worker_data = data
+    if limit_threads:
+        # One fit per process; BLAS threads on top would only compete for the same cores.
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(1)
+
+
+def _fit_candidate(n_states: int, seed: int, config: TrainingConfig) -> CandidateFit:
+    from hmmlearn.hmm import GaussianHMM
+
+    train, train_lengths, holdout, holdout_lengths = _worker_data
+    started = time.perf_counter()
+    # The first initialization uses hmmlearn's k-means means. K-means restarts internally and
+    # lands on the same means for any seed, so further ones start from random training vectors.
+    kmeans = seed == config.seed
+    model = GaussianHMM(
+        n_components=n_states,
+        covariance_type=config.covariance_type,
+        n_iter=config.n_iter,
+        tol=config.tol,
+        random_state=seed,
+        # Transitions start sticky instead of uniform.
+        init_params="smc" if kmeans else "sc",
+    )
+    model.transmat_ = _sticky_transmat(n_states, config.stickiness)
+    if not kmeans:
+        model.means_ = train[np.random.default_rng(seed).choice(len(train), size=n_states, replace=False)]
+    try:
+        model.fit(train, train_lengths)
+        score = model.score(holdout, holdout_lengths) / len(holdout)
+    except (ValueError, np.linalg.LinAlgError) as exc:
+        return CandidateFit(n_states, seed, time.perf_counter() - started, error=str(exc))
+    return CandidateFit(
+        n_states,
+        seed,
+        time.perf_counter() - started,
+        holdout_log_likelihood=score if np.isfinite(score) else -math.inf,
+        converged=bool(model.monitor_.converged),
+        iterations=int(model.monitor_.iter),
+        model=model,
+    )
+
+
+def order_states(model: "GaussianHMM", feature_cols: Sequence[str]) -> "GaussianHMM":
+    """Renumber the states by increasing activity, so `State 0` is the quietest in every retrained model."""
+    indices = [idx for idx, col in enumerate(feature_cols) if col in INTERPRETATION_FEATURES] or list(range(len(feature_cols)))
+    perm = np.argsort(model.means_[:, indices].mean(axis=1), kind="stable")
+    model.startprob_ = model.startprob_[perm]
+    model.transmat_ = model.transmat_[perm][:, perm]
+    model.means_ = model.means_[perm]
+    if model.covariance_type != "tied":
+        model._covars_ = model._covars_[perm]
+    return model
+
+
+class HMMTrainer:
+    """Fits every candidate `(state count, seed)` on a pool of worker processes.
+
+    Each worker receives the scaled sequences once and then fits candidates
+    independently, so the run takes about as long as the slowest share of fits
+    instead of their sum. `workers=1` fits serially in this process.
+    """
+
+    def __init__(self, config: Optional[TrainingConfig] = None, workers: int = 0) -> None:
+        self.config = config or TrainingConfig()
+        self.workers = workers or os.cpu_count() or 1
+        if not 0.0 < self.config.holdout_fraction < 1.0:
+            raise ValueError("holdout_fraction must be between 0 and 1")
+
+    def candidates(self) -> List[Tuple[int, int]]:
+        # Most states first: those fits take longest and should not be left for the end.
+        return [
+            (n_states, self.config.seed + restart)
+            for n_states in sorted(self.config.candidate_states, reverse=True)
+            for restart in range(self.config.restarts)
+        ]
+
+    def fit(self, matrix: FeatureMatrix) -> TrainingResult:
+        from sklearn.preprocessing import StandardScaler
+
+        train, train_lengths, holdout, holdout_lengths = split_sequences(matrix, self.config)
+        if not len(train) or not len(holdout):
+            raise ValueError(f"Not enough feature vectors to train and validate ({len(matrix)} in total)")
+        scaler = StandardScaler().fit(train)
+        unseen = (scaler.var_ == 0.0) & (holdout != train[0]).any(axis=0)
+        if unseen.any():
+            # The fitted states leave almost no variance for these, so the held-out scores collapse.
+            logger.warning(
+                "Features constant in the training data but not in the held-out data: %s; use a longer history",
+                [col for col, flag in zip(self.config.feature_cols, unseen) if flag],
+            )
+        data = (scaler.transform(train), train_lengths, scaler.transform(holdout), holdout_lengths)
+        candidates = self.candidates()
+        logger.info(
+            "Fitting %d candidates on %d training vectors (%d sequences), %d held out, workers=%d",
+            len(candidates),
+            len(train),
+            len(train_lengths),
+            len(holdout),
+            self.workers,
+        )
+
+        started = time.perf_counter()
+        fits: List[CandidateFit] = []
+        if self.workers <= 1:
+            _init_worker(data, limit_threads=False)
+            for n_states, seed in candidates:
+                fits.append(self._logged(_fit_candidate(n_states, seed, self.config)))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=min(self.workers, len(candidates)),
+                # spawn, not fork: thread pools of numerical libraries do not survive a fork.
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(data,),
+            ) as pool:
+                futures = [pool.submit(_fit_candidate, n_states, seed, self.config) for n_states, seed in candidates]
+                fits = [self._logged(future.result()) for future in as_completed(futures)]
+        wall_seconds = time.perf_counter() - started
+
+        fitted = [fit for fit in fits if fit.model is not None and np.isfinite(fit.holdout_log_likelihood)]
+        if not fitted:
+            raise RuntimeError(f"All {len(fits)} candidate fits failed")
+        best = max(fitted, key=lambda fit: fit.holdout_log_likelihood)
+        order_states(best.model, self.config.feature_cols)
+        labels = {idx: f"State {idx}" for idx in range(best.n_states)}
+        result = TrainingResult(
+            config=self.config,
+            scaler=scaler,
+            best=best,
+            fits=sorted(fits, key=lambda fit: (fit.n_states, fit.seed)),
+            wall_seconds=wall_seconds,
+            training_rows=len(train),
+            holdout_rows=len(holdout),
+            state_label_map=labels,
+            state_color_map={label: STATE_COLORS[idx % len(STATE_COLORS)] for idx, label in labels.items()},
+        )
+        logger.info(
+            "Selected %d states (seed %d, held-out log-likelihood %.3f per vector); fitting took %.1fs",
+            best.n_states,
+            best.seed,
+            best.holdout_log_likelihood,
+            wall_seconds,
+        )
+        return result
+
+    @staticmethod
+    def _logged(fit: CandidateFit) -> CandidateFit:
+        if fit.error is not None:
+            logger.warning("Fit n_states=%d seed=%d failed: %s", fit.n_states, fit.seed, fit.error)
+        else:
+            logger.info(
+                "Fit n_states=%d seed=%d held-out=%.3f iterations=%d converged=%s in %.1fs",
+                fit.n_states,
+                fit.seed,
+                fit.holdout_log_likelihood,
+                fit.iterations,
+                fit.converged,
+                fit.seconds,
+            )
+        return fit
+
+
+def parse_states(value: str) -> Tuple[int, ...]:
+    if "-" in value:
+        low, high = (int(part) for part in value.split("-", 1))
+        return tuple(range(low, high + 1))
+    return tuple(int(part) for part in value.split(","))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train the occupancy HMM and write the model consumer's artifacts")
+    parser.add_argument("--output", required=True, help="Directory for the hmm_*.pkl artifacts")
+    parser.add_argument("--archive", action="append", help="BatchCodec measurement archive; repeatable. Fetches from HM-Sense without")
+    parser.add_argument("--save-archive", help="Store the fetched measurements here to repeat the run on the same data")
+    parser.add_argument("--start", type=int, help="First timestamp of the training history")
+    parser.add_argument("--end", type=int, help="Last timestamp of the training history (default: now)")
+    parser.add_argument("--days", type=float, default=14, help="History length when --start is not given")
+    parser.add_argument("--chunk-hours", type=int, default=24, help="Window per HM-Sense request")
+    parser.add_argument("--states", default="3-9", help="Candidate state counts, e.g. 3-9 or 4,6,8")
+    parser.add_argument("--restarts", type=int, default=3, help="Random initializations per state count")
+    parser.add_argument("--n-iter", type=int, default=100)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of each sensor's latest vectors held out")
+    parser.add_argument("--workers", type=int, default=0, help="Processes for featurization and fitting (0 = one per CPU)")
+    parser.add_argument(
+        "--imputation",
+        choices=Featurizer.IMPUTATIONS,
+        default=get_settings().feature_imputation,
+        help="How missing readings are filled; the services must run with the same FEATURE_PRODUCER_FEATURE_IMPUTATION",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    config = TrainingConfig(
+        candidate_states=parse_states(args.states),
+        restarts=args.restarts,
+        n_iter=args.n_iter,
+        holdout_fraction=args.holdout,
+        feature_imputation=args.imputation,
+    )
+    trainer = HMMTrainer(config, workers=args.workers)
+    featurizer = featurizer_for(config.feature_cols, imputation=config.feature_imputation)
+    end = args.end if args.end is not None else int(time.time())
+    start = args.start if args.start is not None else end - int(args.days * 24 * 60 * 60)
+    # The first vectors need their look-back windows too.
+    history_start = start - featurizer.max_lookback_seconds
+
+    started = time.perf_counter()
+    if args.archive:
+        sensors = load_archives(args.archive, history_start, end)
+    else:
+        sensors = fetch_history(APIClient(), history_start, end, args.chunk_hours)
+        if args.save_archive:
+            save_archive(sensors, args.save_archive)
+    matrix = build_matrix(featurizer, sensors, start, end, trainer.workers)
+    prepared = time.perf_counter() - started
+
+    result = trainer.fit(matrix)
+    result.save(args.output)
+
+    print(f"{'states':>6} {'seed':>5} {'held-out ll':>12} {'iter':>5} {'seconds':>8}")
+    for fit in result.fits:
+        score = f"{fit.holdout_log_likelihood:12.3f}" if fit.error is None else f"{'failed':>12}"
+        print(f"{fit.n_states:>6} {fit.seed:>5} {score} {fit.iterations:>5} {fit.seconds:>8.1f}")
+    summary = (
+        f"selected {result.best.n_states} states (seed {result.best.seed}); "
+        f"{len(matrix)} vectors prepared in {prepared:.1f}s; fitting took {result.wall_seconds:.1f}s"
+    )
+    if trainer.workers > 1:
+        summary += f" vs {result.fit_seconds:.1f}s of fits run serially ({result.speedup:.2f}x on {trainer.workers} workers)"
+    print(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,6 @@
 from functools import lru_cache
+from typing import Dict, List, Optional
+
 from pydantic import Field
 
 try:  # Pydantic v2
@@ -37,10 +39,258 @@ class Settings(BaseSettings):
         ge=1,
         description="HTTP timeout in seconds for feature endpoint calls",
     )
+    request_deadline_seconds: float = Field(
+        10.0,
+        ge=0.0,
+        description="Deadline of requests arriving without an X-Request-Deadline header; 0 disables it. "
+        "Downstream calls are capped to the time left and receive the deadline in the same header",
+    )
+    max_in_flight_requests: int = Field(
+        32,
+        ge=0,
+        description="Requests a worker processes concurrently before queueing further ones; 0 disables admission control",
+    )
+    max_queued_requests: int = Field(
+        64,
+        ge=0,
+        description="Requests a worker queues for a free slot; beyond that requests get 503 immediately",
+    )
+    admission_queue_timeout_seconds: float = Field(
+        2.0,
+        ge=0.0,
+        description="Longest wait in the admission queue (also bounded by the request deadline) before a 503",
+    )
+    shed_retry_after_seconds: int = Field(
+        1,
+        ge=0,
+        description="Retry-After sent with 503 responses from admission control",
+    )
+    upstream_max_concurrency: int = Field(
+        8,
+        ge=1,
+        description="Maximum concurrent per-sensor requests to the HM Sense API",
+    )
+    history_max_window_hours: int = Field(
+        24,
+        ge=1,
+        description="Longest window accepted for history feature requests (one vector per measurement)",
+    )
+    fetch_slack_seconds: int = Field(
+        600,
+        ge=0,
+        description="Extra look-back fetched for latest vectors, since a sensor's last measurement may lie before the window end",
+    )
+    partial_window_tolerance_seconds: int = Field(
+        300,
+        ge=0,
+        description="Gap allowed between a look-back window's start and the first measurement before the window counts as partial",
+    )
+    subset_fetch_max_sensors: int = Field(
+        16,
+        ge=0,
+        description="Largest sensor subset fetched with concurrent per-sensor requests; larger subsets use one all-sensors fetch "
+        "(sharded producers always fetch per sensor)",
+    )
+    fast_json_responses: bool = Field(
+        False,
+        description="Encode /api/feature-vectors and /predictions directly from the computed results instead of "
+        "validating them against the response model again; JSON is encoded and decoded with orjson when installed",
+    )
+    sensor_groups: Dict[str, List[str]] = Field(
+        default_factory=dict,
+        description="Named sensor groups (JSON object of name -> sensor IDs) usable as `group` query parameter",
+    )
+    feature_projection_enabled: bool = Field(
+        False,
+        description="Model consumer requests only its model's features, so the producer fetches only the measurement "
+        "types they use (current_sensors then lack the other types)",
+    )
+    shard_count: int = Field(
+        1,
+        ge=1,
+        description="Number of feature producer shards; sensors are assigned by consistent hashing",
+    )
+    shard_index: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Shard owned by this producer replica; derived from a StatefulSet hostname when unset",
+    )
+    sensor_list_ttl_seconds: int = Field(
+        300,
+        ge=1,
+        description="How long a sharded producer caches the upstream sensor list",
+    )
+    feature_endpoint_shard_urls: List[str] = Field(
+        default_factory=list,
+        description="Base URLs of the producer shards in shard order; enables scatter-gather in the consumer",
+    )
+    shared_cache_dir: str = Field(
+        "/dev/shm/hm-sense",
+        description="Directory of the memory-mapped cache file and the leader locks shared by all uvicorn workers; "
+        "created with mode 0700 and only used while owned by and writable only for the service's user",
+    )
+    shared_cache_ttl_seconds: float = Field(
+        15.0,
+        ge=0.0,
+        description="Seconds a cached feature/prediction result stays fresh; 0 disables the shared cache",
+    )
+    shared_cache_slots: int = Field(
+        32,
+        ge=1,
+        description="Number of entries the shared cache can hold",
+    )
+    shared_cache_slot_bytes: int = Field(
+        1 << 20,
+        ge=4096,
+        description="Maximum serialized size of one shared cache entry",
+    )
+    stream_refresh_seconds: float = Field(
+        15.0,
+        gt=0.0,
+        description="Seconds between prediction refreshes pushed to /predictions/stream clients",
+    )
+    stream_heartbeat_seconds: float = Field(
+        15.0,
+        gt=0.0,
+        description="Idle seconds after which a keep-alive comment is sent on prediction streams",
+    )
+    stream_max_connections: int = Field(
+        200,
+        ge=1,
+        description="Maximum concurrent /predictions/stream clients per worker; further clients get 503",
+    )
+    batch_chunk_rows: int = Field(
+        65536,
+        ge=1,
+        description="Feature vectors scored per chunk by /predictions/batch",
+    )
+    batch_workers: int = Field(
+        0,
+        ge=0,
+        description="Processes scoring /predictions/batch chunks; 0 uses one per CPU, 1 scores in the service process",
+    )
+    startup_budget_seconds: float = Field(
+        15.0,
+        gt=0.0,
+        description="Expected upper bound from process start to ready; exceeding it logs a warning",
+    )
+    timetable_url: str = Field(
+        "https://zpa.cs.hm.edu/public/course_plan/",
+        description="Course plan form the timetable ingestion posts each group to",
+    )
+    timetable_cache_dir: str = Field(
+        "/tmp/hm-sense-timetables",
+        description="Directory of the parsed timetable cache",
+    )
+    timetable_cache_ttl_hours: float = Field(
+        24.0,
+        gt=0.0,
+        description="Hours a cached timetable stays valid before it is fetched again",
+    )
+    timetable_max_concurrency: int = Field(
+        4,
+        ge=1,
+        description="Maximum concurrent group requests to the course plan server",
+    )
+    lecture_features_enabled: bool = Field(
+        False,
+        description="Append lecture_scheduled/minutes_to_next_lecture from the cached timetables (feature schema version 2)",
+    )
+    feature_imputation: str = Field(
+        "zero",
+        description="How missing readings are filled: zero (what the shipped model was trained on) or carry_forward "
+        "(latest reading in the look-back); the consumer refuses a model trained with the other one",
+    )
+    sensor_rooms: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Room of each sensor (JSON object of sensor ID -> room, e.g. R1.006); unmapped sensors use their ID",
+    )
+    room_floors: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Floor of each room for /predictions/summary (JSON object of room -> floor); by default derived "
+        "from the room name (R1.006 -> R1)",
+    )
+    floor_buildings: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Building of each floor for /predictions/summary (JSON object of floor -> building); by default "
+        "derived from the floor name (R1 -> R)",
+    )
+    state_occupancy: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Occupancy level of each state label (JSON object, e.g. {\"State 0\": 0.0, ...}); "
+        "/predictions/summary reports expected_occupancy only if every state has one",
+    )
+    summary_refresh_seconds: float = Field(
+        15.0,
+        gt=0,
+        description="Interval in which /predictions/summary is recomputed from the latest predictions",
+    )
+    summary_idle_seconds: float = Field(
+        300.0,
+        gt=0,
+        description="Seconds without a /predictions/summary request after which a worker stops recomputing it",
+    )
+    rollups_enabled: bool = Field(
+        False,
+        description="Maintain 1m/15m/1h/1d rollups of all sensors in the background and serve /api/aggregates",
+    )
+    rollup_refresh_seconds: float = Field(
+        60.0,
+        gt=0.0,
+        description="Seconds between incremental rollup fetches",
+    )
+    rollup_backfill_hours: float = Field(
+        24.0,
+        ge=0.0,
+        description="History fetched into the rollups on startup when no snapshot covers it",
+    )
+    rollup_retention_hours: Dict[str, float] = Field(
+        default_factory=lambda: {"1m": 24.0, "15m": 168.0, "1h": 1488.0},
+        description="Hours of buckets kept per rollup level (1m, 15m, 1h, 1d); unlisted levels are kept indefinitely",
+    )
+    rollup_snapshot_path: str = Field(
+        "~/.cache/hm-sense/rollups.npz",
+        description="File the rollups are saved to after each refresh and restored from on startup (an npz archive in a "
+        "directory only the service can write); empty disables it",
+    )
+    rollup_max_buckets: int = Field(
+        100_000,
+        ge=1,
+        description="Maximum number of buckets one /api/aggregates response may contain",
+    )
     log_level: str = Field(
         "INFO",
         description="Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)",
     )
+    log_format: str = Field(
+        "json",
+        description="Log output format: json (structured, one object per line) or text",
+    )
+    log_debug_sample_rate: float = Field(
+        0.1,
+        ge=0.0,
+        le=1.0,
+        description="Fraction of per-item DEBUG events that are emitted",
+    )
+    admin_token: Optional[str] = Field(
+        None,
+        description="Token expected in the X-Admin-Token header; admin endpoints are disabled when unset",
+    )
+    profiling_sample_rate: float = Field(
+        0.0,
+        ge=0.0,
+        le=1.0,
+        description="Initial fraction of requests profiled with cProfile (adjustable at runtime)",
+    )
+    profiling_output_dir: str = Field(
+        "/tmp/hm-sense-profiles",
+        description="Directory where request profiles are written",
+    )
+    profiling_max_profiles: int = Field(
+        50,
+        ge=1,
+        description="Number of most recent profiles kept on disk",
+    )
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Optional, Sequence
+
+from fastapi.responses import JSONResponse
+
+from ..settings import get_settings
+from . import deadline
+from .metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_SHED
+
+logger = logging.getLogger(__name__)
+
+# Probes and scrapes must answer under overload; streams hold their connection and have their own limit.
+_EXEMPT_PATHS = ("/health", "/ready", "/metrics", "/predictions/stream")
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware bounding the requests a worker processes at once.
+
+    Up to `max_in_flight` requests run concurrently, up to `max_queued` more wait
+    in arrival order for a slot. A waiting request gives up after
+    `queue_timeout_seconds` or at its deadline, whichever comes first. Requests
+    beyond the queue are rejected immediately. Rejections are 503 with
+    `Retry-After`, so clients and load balancers back off instead of piling up
+    work the worker cannot finish in time.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_in_flight: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        queue_timeout_seconds: Optional[float] = None,
+        retry_after_seconds: Optional[int] = None,
+        exempt_paths: Sequence[str] = _EXEMPT_PATHS,
+    ) -> None:
+        settings = get_settings()
+        self.app = app
+        self.max_in_flight = settings.max_in_flight_requests if max_in_flight is None else max_in_flight
+        self.max_queued = settings.max_queued_requests if max_queued is None else max_queued
+        self.queue_timeout_seconds = (
+            settings.admission_queue_timeout_seconds if queue_timeout_seconds is None else queue_timeout_seconds
+        )
+        self.retry_after_seconds = settings.shed_retry_after_seconds if retry_after_seconds is None else retry_after_seconds
+        self.exempt_paths = tuple(exempt_paths)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or self.max_in_flight <= 0 or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        if not await self._acquire():
+            response = JSONResponse(
+                {"detail": "Service overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._release()
+
+    async def _acquire(self) -> bool:
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.max_queued:
+            ADMISSION_SHED.labels(reason="queue_full").inc()
+            return False
+
+        wait = self.queue_timeout_seconds
+        left = deadline.remaining()
+        if left is not None:
+            wait = min(wait, left)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            # The slot is handed over by _release, so in_flight already counts this request.
+            await asyncio.wait_for(asyncio.shield(waiter), max(wait, 0.0))
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Granted while timing out; keep the slot rather than leaking it.
+                return True
+            self._waiters.remove(waiter)
+            ADMISSION_SHED.labels(reason="queue_timeout").inc()
+            logger.warning("Shed request after %.2fs in the admission queue", time.perf_counter() - started)
+            return False
+        except asyncio.CancelledError:
+            # The client went away while queued; pass on a slot it may already have been granted.
+            if waiter.done():
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            ADMISSION_QUEUE_SECONDS.observe(time.perf_counter() - started)
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
@@ -0,0 +1,93 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from ..settings import get_settings
+from .metrics import DEADLINE_EXCEEDED
+
+# Absolute unix time (seconds, fractions allowed) by which the caller needs the response.
+DEADLINE_HEADER = "X-Request-Deadline"
+
+# time.monotonic() value by which the current request must be answered; None outside of requests.
+deadline_var: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    """The request deadline passed; the remaining work is abandoned and the caller gets a 504."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(status_code=504, detail=f"Request deadline exceeded ({stage})")
+        DEADLINE_EXCEEDED.labels(stage=stage).inc()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the request deadline, or None without a deadline."""
+    deadline = deadline_var.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(stage: str) -> None:
+    """Stop the current request's work when its deadline has passed."""
+    if expired():
+        raise DeadlineExceeded(stage)
+
+
+def timeout(default: float, stage: str) -> float:
+    """`default`, capped to the time left for the request; raises when none is left."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded(stage)
+    return min(default, left)
+
+
+def outgoing_headers() -> Dict[str, str]:
+    """Header carrying the current deadline to a downstream service."""
+    left = remaining()
+    return {} if left is None else {DEADLINE_HEADER: f"{time.time() + left:.3f}"}
+
+
+class DeadlineMiddleware:
+    """ASGI middleware binding the request deadline from `X-Request-Deadline`.
+
+    Requests without the header get `request_deadline_seconds` from now; requests
+    arriving after their deadline are answered with 504 without doing any work.
+    """
+
+    def __init__(self, app, default_seconds: Optional[float] = None) -> None:
+        self.app = app
+        self.default_seconds = get_settings().request_deadline_seconds if default_seconds is None else default_seconds
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = DEADLINE_HEADER.lower().encode("latin-1")
+        incoming = next((value for key, value in scope["headers"] if key == header), None)
+        left = self.default_seconds if self.default_seconds > 0 else None
+        if incoming:
+            try:
+                left = float(incoming.decode("latin-1")) - time.time()
+            except ValueError:
+                pass
+        if left is not None and left <= 0:
+            DEADLINE_EXCEEDED.labels(stage="arrival").inc()
+            response = JSONResponse({"detail": "Request deadline exceeded before processing"}, status_code=504)
+            await response(scope, receive, send)
+            return
+
+        token = deadline_var.set(None if left is None else time.monotonic() + left)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            deadline_var.reset(token)
@@ -0,0 +1,49 @@
+import json
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:  # Optional; without it the stdlib encoder is used and only the validation is skipped.
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    # Same output options as FastAPI's JSONResponse.
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(Response):
+    """JSON response that bypasses response model validation.
+
+    FastAPI validates a returned model against `response_model` again and converts it
+    with `jsonable_encoder` before encoding. Validated models and plain data built
+    from validated parts can skip both: models are serialized by pydantic itself,
+    everything else with `dumps`. `by_alias` must match the route's
+    `response_model_by_alias`, so both paths produce the same field names.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content: Any, *args: Any, by_alias: bool = True, **kwargs: Any) -> None:
+        # Set before Response.__init__, which renders the content.
+        self.by_alias = by_alias
+        super().__init__(content, *args, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            dump_json = getattr(content, "model_dump_json", None)
+            if callable(dump_json):
+                return dump_json(by_alias=self.by_alias).encode("utf-8")
+            return content.json(by_alias=self.by_alias).encode("utf-8")
+        return dumps(content)
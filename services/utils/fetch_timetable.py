@@ -1,7 +1,38 @@
+import argparse
 import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
 
 import aiohttp
-from bs4 import BeautifulSoup
+import lxml.html
+
+from ..settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+_TIMESLOT_BLOCKS = (
+    ".//div[contains(concat(' ', normalize-space(@class), ' '), ' timeslot_blue ')"
+    " or contains(concat(' ', normalize-space(@class), ' '), ' timeslot_red ')]"
+)
+_TIME_CELL = ".//td[contains(concat(' ', normalize-space(@class), ' '), ' time ')]"
+_PLAN_BODY = "//tbody[contains(concat(' ', normalize-space(@class), ' '), ' plan ')]"
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]")
+# Part of the digest, so cached plans are re-parsed when the parsed layout changes.
+_PARSER_VERSION = 2
+
+
+def _stripped_strings(element) -> List[str]:
+    return [text.strip() for text in element.itertext() if text.strip()]
+
+
+def _digest(html: str) -> str:
+    return hashlib.blake2b(f"{_PARSER_VERSION}:{html}".encode("utf-8"), digest_size=16).hexdigest()
 
 
 class TimetableFetcher:
@@ -12,28 +43,27 @@ class TimetableFetcher:
 
     @staticmethod
     def timetable_to_dict(html: str):
-        soup = BeautifulSoup(html, "lxml")
-
         timetable = []
-        plan = soup.find("tbody", {"class": "plan"})
-        if not plan:
+        plans = lxml.html.fromstring(html).xpath(_PLAN_BODY)
+        if not plans:
             return timetable
 
-        for row in plan.find_all("tr"):
-            time_cell = row.find("td", class_="time")
-            if not time_cell:
+        for row in plans[0].iter("tr"):
+            time_cells = row.xpath(_TIME_CELL)
+            if not time_cells:
                 continue
-            slot = {"time": time_cell.get_text(strip=True), "courses": []}
-            for td in row.find_all("td"):
-                if td is time_cell:
-                    continue
-                for block in td.select("div.timeslot_blue, div.timeslot_red"):
-                    title = block.select_one("strong a")
-                    details = [t.strip() for t in block.stripped_strings]
+            time_cell = time_cells[0]
+            slot = {"time": "".join(_stripped_strings(time_cell)), "courses": []}
+            # The cells after the time column are the weekdays, Monday first.
+            day_cells = [td for td in row.iterchildren("td") if td is not time_cell]
+            for day, td in enumerate(day_cells):
+                for block in td.xpath(_TIMESLOT_BLOCKS):
+                    title = block.xpath(".//strong//a")
                     slot["courses"].append(
                         {
-                            "title": title.get_text(strip=True) if title else None,
-                            "details": details[2:],
+                            "title": "".join(_stripped_strings(title[0])) if title else None,
+                            "details": _stripped_strings(block)[2:],
+                            "day": day,
                         }
                     )
             timetable.append(slot)
@@ -41,38 +71,176 @@ class TimetableFetcher:
 
     @staticmethod
     def extract_class_ids(html: str):
-        soup = BeautifulSoup(html, "lxml")
-        select = soup.find("select", id="id_group")
-        if not select:
-            return []
         return [
-            {"value": option.get("value", ""), "label": option.get_text(strip=True)}
-            for option in select.find_all("option")
+            {"value": option.get("value", ""), "label": "".join(_stripped_strings(option))}
+            for option in lxml.html.fromstring(html).xpath("//select[@id='id_group']//option")
         ]
 
+    @staticmethod
+    def _extract_csrf_token(html: str) -> str:
+        tokens = lxml.html.fromstring(html).xpath("//input[@name='csrfmiddlewaretoken']/@value")
+        if not tokens:
+            raise ValueError("CSRF token not found in the response")
+        return tokens[0]
+
+    async def _load_form(self, session: aiohttp.ClientSession) -> str:
+        async with session.get(self.request_url) as resp:
+            resp.raise_for_status()
+            return await resp.text()
+
+    async def _post_group(self, session: aiohttp.ClientSession, token: str, group: str) -> str:
+        data = {"csrfmiddlewaretoken": token, "group": group, "module": self.module}
+        headers = {"Referer": self.request_url}
+        async with session.post(self.request_url, data=data, headers=headers) as resp:
+            resp.raise_for_status()
+            return await resp.text()
+
     async def fetch_and_parse_timetable(self):
         async with aiohttp.ClientSession() as session:
-            async with session.get(self.request_url) as resp:
-                html = await resp.text()
-                soup = BeautifulSoup(html, "lxml")
-                token_element = soup.select_one("input[name=csrfmiddlewaretoken]")
-                if token_element is None:
-                    raise ValueError("CSRF token not found in the response")
-                token = token_element["value"]
+            token = self._extract_csrf_token(await self._load_form(session))
+            return self.timetable_to_dict(await self._post_group(session, token, self.group))
+
+
+class TimetableCache:
+    """Parsed timetables on disk, one JSON file per group plus the group list.
+
+    Every entry carries `valid_until`; valid entries are served without touching
+    the network. Expired entries keep the digest of the HTML they were parsed
+    from, so an unchanged plan is only re-downloaded, not parsed again.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float) -> None:
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{_UNSAFE_FILENAME.sub('_', name)}.json")
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(name), encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable timetable cache entry %s", name)
+            return None
+
+    def store(self, name: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        entry = dict(entry, fetched_at=now, valid_until=now + self.ttl_seconds)
+        # Write-and-rename so concurrent readers never see a half-written file.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(entry, fh, ensure_ascii=False)
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return entry
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """All cached group timetables, including expired ones."""
+        groups_entry = self.load("groups")
+        if groups_entry is None:
+            return []
+        entries = (self.load(f"group-{group['value']}") for group in groups_entry["groups"])
+        return [entry for entry in entries if entry is not None]
+
+    @staticmethod
+    def is_valid(entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and entry.get("valid_until", 0) > time.time()
+
+
+class TimetableIngestion:
+    """Fetches the timetables of all groups into a `TimetableCache`.
+
+    One session and CSRF token are shared by all requests, groups are posted
+    concurrently up to `concurrency`, and only groups whose cache entry expired
+    are requested at all.
+    """
+
+    def __init__(self, fetcher: TimetableFetcher, cache: TimetableCache, concurrency: int = 4) -> None:
+        self.fetcher = fetcher
+        self.cache = cache
+        self.concurrency = concurrency
+        self.parsed = 0
+        self.unchanged = 0
+
+    async def run(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Return the cache entries of all groups, keyed by group value."""
+        groups_entry = self.cache.load("groups")
+        if not force and self.cache.is_valid(groups_entry):
+            entries = {group["value"]: self.cache.load(f"group-{group['value']}") for group in groups_entry["groups"]}
+            stale = [value for value, entry in entries.items() if not self.cache.is_valid(entry)]
+            if not stale:
+                logger.info("All %d timetables are cached and valid", len(entries))
+                return entries
+
+        async with aiohttp.ClientSession() as session:
+            html = await self.fetcher._load_form(session)
+            token = self.fetcher._extract_csrf_token(html)
+            groups = [group for group in self.fetcher.extract_class_ids(html) if group["value"]]
+            self.cache.store("groups", {"groups": groups})
+
+            entries = {group["value"]: self.cache.load(f"group-{group['value']}") for group in groups}
+            stale = [group for group in groups if force or not self.cache.is_valid(entries[group["value"]])]
+            logger.info("Refreshing %d of %d timetables", len(stale), len(groups))
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def refresh(group: Dict[str, str]) -> None:
+                async with semaphore:
+                    html = await self.fetcher._post_group(session, token, group["value"])
+                entries[group["value"]] = self._store_group(group, html, entries[group["value"]])
+
+            results = await asyncio.gather(*(refresh(group) for group in stale), return_exceptions=True)
+
+        for group, result in zip(stale, results):
+            if isinstance(result, Exception):
+                logger.warning("Timetable of group %s could not be refreshed: %s", group["label"], result)
+        logger.info("Timetables refreshed: %d parsed, %d unchanged", self.parsed, self.unchanged)
+        return {value: entry for value, entry in entries.items() if entry is not None}
+
+    def _store_group(self, group: Dict[str, str], html: str, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        digest = _digest(html)
+        if previous is not None and previous.get("digest") == digest:
+            self.unchanged += 1
+            timetable = previous["timetable"]
+        else:
+            self.parsed += 1
+            timetable = self.fetcher.timetable_to_dict(html)
+        entry = {"group": group["value"], "label": group["label"], "digest": digest, "timetable": timetable}
+        return self.cache.store(f"group-{group['value']}", entry)
+
 
-            data = {"csrfmiddlewaretoken": token, "group": self.group, "module": self.module}
-            headers = {"Referer": self.request_url}
+def create_ingestion(settings: Optional[Settings] = None) -> TimetableIngestion:
+    settings = settings or get_settings()
+    return TimetableIngestion(
+        fetcher=TimetableFetcher(request_url=settings.timetable_url),
+        cache=TimetableCache(settings.timetable_cache_dir, settings.timetable_cache_ttl_hours * 3600),
+        concurrency=settings.timetable_max_concurrency,
+    )
 
-            async with session.post(self.request_url, data=data, headers=headers) as resp:
-                timetable = self.timetable_to_dict(await resp.text())
-                return timetable
 
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Fetch the timetables of all groups into the on-disk cache")
+    parser.add_argument("--force", action="store_true", help="Refresh every group regardless of validity")
+    parser.add_argument("--group", help="Print the cached timetable of this group value after the run")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
 
-async def main():
-    fetcher = TimetableFetcher()
-    timetable = await fetcher.fetch_and_parse_timetable()
-    print(timetable)
+    started = time.perf_counter()
+    ingestion = create_ingestion()
+    entries = await ingestion.run(force=args.force)
+    print(
+        f"{len(entries)} timetables in {time.perf_counter() - started:.2f}s "
+        f"({ingestion.parsed} parsed, {ingestion.unchanged} unchanged)"
+    )
+    if args.group:
+        print(json.dumps(entries.get(args.group), ensure_ascii=False, indent=2))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from . import server_timing
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+COUNT_BUCKETS = (1, 5, 10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000)
+
+STAGE_DURATION = Histogram(
+    "hm_sense_stage_duration_seconds",
+    "Duration of individual pipeline stages",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+PAYLOAD_BYTES = Histogram(
+    "hm_sense_payload_bytes",
+    "Size of payloads received from upstream services",
+    ["source"],
+    buckets=BYTES_BUCKETS,
+)
+MEASUREMENTS_PER_REQUEST = Histogram(
+    "hm_sense_measurements_per_request",
+    "Number of flattened measurements processed per request",
+    buckets=COUNT_BUCKETS,
+)
+SENSORS_PER_REQUEST = Histogram(
+    "hm_sense_sensors_per_request",
+    "Number of distinct sensors processed per request",
+    buckets=COUNT_BUCKETS,
+)
+FEATURES_IMPUTED = Counter(
+    "hm_sense_features_imputed_total",
+    "Feature values that could not be computed from the look-back window and were filled in, by feature",
+    ["feature"],
+)
+UPSTREAM_ERRORS = Counter(
+    "hm_sense_upstream_errors_total",
+    "Failed calls to upstream services by target and status",
+    ["target", "status"],
+)
+CACHE_REQUESTS = Counter(
+    "hm_sense_cache_requests_total",
+    "Shared cache lookups by cache and result (hit, stale, miss)",
+    ["cache", "result"],
+)
+HTTP_REQUESTS = Counter(
+    "hm_sense_http_requests_total",
+    "Handled HTTP requests by route and status",
+    ["method", "route", "status"],
+)
+HTTP_ERRORS = Counter(
+    "hm_sense_http_errors_total",
+    "HTTP responses with status >= 400 by route and status",
+    ["route", "status"],
+)
+HTTP_IN_FLIGHT = Gauge(
+    "hm_sense_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum",
+)
+HTTP_DURATION = Histogram(
+    "hm_sense_http_request_duration_seconds",
+    "End-to-end HTTP request duration by route",
+    ["route"],
+    buckets=STAGE_BUCKETS,
+)
+STREAM_SUBSCRIBERS = Gauge(
+    "hm_sense_stream_subscribers",
+    "Connected server-sent event clients",
+    multiprocess_mode="livesum",
+)
+DEADLINE_EXCEEDED = Counter(
+    "hm_sense_deadline_exceeded_total",
+    "Requests abandoned because their deadline passed, by the stage that noticed",
+    ["stage"],
+)
+ADMISSION_SHED = Counter(
+    "hm_sense_admission_shed_total",
+    "Requests rejected with 503 by admission control, by reason (queue_full, queue_timeout)",
+    ["reason"],
+)
+ADMISSION_QUEUE_SECONDS = Histogram(
+    "hm_sense_admission_queue_seconds",
+    "Time requests waited in the admission queue for a free slot",
+    buckets=STAGE_BUCKETS,
+)
+STARTUP_SECONDS = Gauge(
+    "hm_sense_startup_seconds",
+    "Time from process start until the warm-up finished and the service reported ready",
+    multiprocess_mode="max",
+)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """Record the stage duration in the Prometheus histogram and the request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.labels(stage=stage).observe(elapsed)
+        server_timing.record(stage, elapsed)
+
+
+def _is_event_stream(message) -> bool:
+    return any(
+        key == b"content-type" and value.startswith(b"text/event-stream")
+        for key, value in message.get("headers", [])
+    )
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording in-flight requests, durations and status codes."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        in_flight = True
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code, in_flight
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if in_flight and _is_event_stream(message):
+                    # Long-lived streams would otherwise inflate the in-flight gauge the HPA scales on.
+                    HTTP_IN_FLIGHT.dec()
+                    in_flight = False
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if in_flight:
+                HTTP_IN_FLIGHT.dec()
+            # Label by route template, never by raw path, to keep cardinality bounded.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            status = str(status_code)
+            HTTP_DURATION.labels(route=route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method=scope["method"], route=route, status=status).inc()
+            if status_code >= 400:
+                HTTP_ERRORS.labels(route=route, status=status).inc()
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Several uvicorn workers: aggregate the per-process files.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,129 @@
+import cProfile
+import io
+import logging
+import pstats
+import random
+import re
+import secrets
+import threading
+import time
+import uuid
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from ..settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.prof$")
+
+
+class RequestProfiler:
+    """Profiles a sampled fraction of requests with cProfile and keeps the newest dumps on disk.
+
+    The sample rate can be changed at runtime through the admin routes; with
+    several uvicorn workers each worker keeps its own rate and dump directory entries.
+    """
+
+    def __init__(self, output_dir: str, sample_rate: float = 0.0, max_profiles: int = 50) -> None:
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+        # Only one cProfile profiler can be active per interpreter at a time.
+        self._active = threading.Lock()
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, label: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if not self.should_sample() or not self._active.acquire(blocking=False):
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._active.release()
+            self._dump(label, profile)
+
+    def _dump(self, label: str, profile: cProfile.Profile) -> None:
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            name = f"{time.strftime('%Y%m%dT%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}.prof"
+            profile.dump_stats(str(self.output_dir / name))
+            logger.info("Stored request profile %s", name)
+            for stale in self.list_profiles()[self.max_profiles:]:
+                (self.output_dir / stale["name"]).unlink(missing_ok=True)
+        except OSError as exc:
+            logger.warning("Unable to store request profile: %s", exc)
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        if not self.output_dir.exists():
+            return []
+        files = sorted(self.output_dir.glob("*.prof"), key=lambda path: path.stat().st_mtime, reverse=True)
+        return [{"name": path.name, "size_bytes": path.stat().st_size} for path in files]
+
+    def profile_path(self, name: str) -> Path:
+        path = self.output_dir / name
+        if not _PROFILE_NAME.match(name) or not path.is_file():
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return path
+
+
+@lru_cache(maxsize=1)
+def get_profiler() -> RequestProfiler:
+    settings = get_settings()
+    return RequestProfiler(
+        output_dir=settings.profiling_output_dir,
+        sample_rate=settings.profiling_sample_rate,
+        max_profiles=settings.profiling_max_profiles,
+    )
+
+
+def profiled(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a synchronous route so sampled calls run under cProfile in the worker thread."""
+    label = func.__name__
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return get_profiler().run(label, func, *args, **kwargs)
+
+    return wrapper
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    expected = get_settings().admin_token
+    if not expected:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin/profiling", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("")
+def profiling_status() -> dict:
+    profiler = get_profiler()
+    return {"sample_rate": profiler.sample_rate, "profiles": profiler.list_profiles()}
+
+
+@router.put("")
+def set_sample_rate(sample_rate: float = Query(..., ge=0.0, le=1.0)) -> dict:
+    profiler = get_profiler()
+    profiler.sample_rate = sample_rate
+    logger.info("Profiling sample rate set to %s", sample_rate)
+    return {"sample_rate": profiler.sample_rate}
+
+
+@router.get("/profiles/{name}")
+def download_profile(name: str, format: str = Query("prof", pattern="^(prof|text)$")):
+    path = get_profiler().profile_path(name)
+    if format == "prof":
+        return FileResponse(path, media_type="application/octet-stream", filename=name)
+    buffer = io.StringIO()
+    pstats.Stats(str(path), stream=buffer).sort_stats("cumulative").print_stats(50)
+    return PlainTextResponse(buffer.getvalue())
@@ -0,0 +1,123 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from ..settings import get_settings
+from .metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_IMPORTED_AT = time.time()
+
+
+def _process_started_at() -> float:
+    """Wall-clock start of this process, so the interpreter and import time are included."""
+    try:
+        with open("/proc/self/stat") as fh:
+            # The command name may contain spaces; fields after it are space separated.
+            start_ticks = int(fh.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return _IMPORTED_AT
+
+
+class Readiness:
+    """Tracks the startup warm-up of a service and backs the `/ready` probe.
+
+    `/health` only says the process is alive; `/ready` fails until the warm-up has
+    built the lazy components and run one synthetic request through them, so new
+    replicas do not receive traffic while their first requests would still be slow.
+    A failed warm-up (e.g. the model volume not mounted yet) is retried with
+    exponential backoff from `retry_seconds` up to `max_retry_seconds`, so the
+    replica becomes ready once the cause is gone instead of needing a restart.
+    """
+
+    def __init__(self, budget_seconds: float, retry_seconds: float = 1.0, max_retry_seconds: float = 60.0) -> None:
+        self.budget_seconds = budget_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.started_at = _process_started_at()
+        self.status = "starting"
+        self.detail: Optional[str] = None
+        self.ready_after: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def start(self, warm_up: Callable[[], None]) -> None:
+        """Run the warm-up in a background thread so the port is served (and /health answers) meanwhile."""
+        if self._thread is not None:
+            return
+        self.status = "warming"
+        self._thread = threading.Thread(target=self._run, args=(warm_up,), name="warm-up", daemon=True)
+        self._thread.start()
+
+    def _run(self, warm_up: Callable[[], None]) -> None:
+        delay = self.retry_seconds
+        for attempt in itertools.count(1):
+            warm_up_started = time.perf_counter()
+            try:
+                warm_up()
+                break
+            except Exception as exc:
+                self.status = "failed"
+                self.detail = f"{type(exc).__name__}: {exc}"
+                logger.exception("Warm-up attempt %d failed; retrying in %.0fs", attempt, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_retry_seconds)
+            self.status = "warming"
+        self.ready_after = time.time() - self.started_at
+        self.detail = None
+        self.status = "ready"
+        self._done.set()
+        STARTUP_SECONDS.set(self.ready_after)
+        logger.info(
+            "Ready %.2fs after process start (warm-up %.2fs, budget %.0fs)",
+            self.ready_after,
+            time.perf_counter() - warm_up_started,
+            self.budget_seconds,
+        )
+        if self.ready_after > self.budget_seconds:
+            logger.warning(
+                "Startup took %.2fs, exceeding the budget of %.0fs",
+                self.ready_after,
+                self.budget_seconds,
+            )
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the warm-up succeeded or `timeout` passed; returns whether the service is ready."""
+        if self._thread is not None:
+            self._done.wait(timeout)
+        return self.ready
+
+
+@lru_cache(maxsize=1)
+def get_readiness() -> Readiness:
+    return Readiness(budget_seconds=get_settings().startup_budget_seconds)
+
+
+router = APIRouter()
+
+
+@router.get("/ready", tags=["health"])
+def ready() -> JSONResponse:
+    readiness = get_readiness()
+    body = {"status": readiness.status}
+    if readiness.ready:
+        body["startup_seconds"] = round(readiness.ready_after, 3)
+        return JSONResponse(body)
+    if readiness.detail:
+        body["detail"] = readiness.detail
+    return JSONResponse(body, status_code=503)
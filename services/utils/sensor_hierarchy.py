@@ -0,0 +1,72 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# HM room names: building letters, floor number, dot, room number (R1.006, T-1.012).
+_ROOM_PATTERN = re.compile(r"^(?P<building>[A-Za-z]+)(?P<floor>-?\d+)\.")
+UNASSIGNED = "unassigned"
+
+
+@dataclass(frozen=True)
+class HierarchyLayout:
+    """Group indices of a fixed sensor list, ready for vectorized reductions."""
+
+    room_ids: np.ndarray
+    sensor_room: np.ndarray
+    floor_ids: np.ndarray
+    room_floor: np.ndarray
+    building_ids: np.ndarray
+    floor_building: np.ndarray
+
+
+class SensorHierarchy:
+    """Maps sensors to rooms, rooms to floors and floors to buildings.
+
+    Sensors without a `sensor_rooms` entry are their own room. Floors and
+    buildings come from the HM room naming (`R1.006` is on floor `R1` of building
+    `R`) unless `room_floors` or `floor_buildings` says otherwise; anything else
+    is `unassigned`.
+    """
+
+    def __init__(
+        self,
+        sensor_rooms: Optional[Mapping[str, str]] = None,
+        room_floors: Optional[Mapping[str, str]] = None,
+        floor_buildings: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        self.sensor_rooms = dict(sensor_rooms or {})
+        self.room_floors = dict(room_floors or {})
+        self.floor_buildings = dict(floor_buildings or {})
+        self._layouts: Dict[Tuple[str, ...], HierarchyLayout] = {}
+
+    def room(self, sensor_id: str) -> str:
+        return self.sensor_rooms.get(sensor_id, sensor_id)
+
+    def floor(self, room: str) -> str:
+        if room in self.room_floors:
+            return self.room_floors[room]
+        match = _ROOM_PATTERN.match(room)
+        return f"{match['building']}{match['floor']}" if match else UNASSIGNED
+
+    def building(self, floor: str) -> str:
+        if floor in self.floor_buildings:
+            return self.floor_buildings[floor]
+        match = re.match(r"^[A-Za-z]+", floor)
+        return match.group(0) if match and floor != UNASSIGNED else UNASSIGNED
+
+    def layout(self, sensor_ids: Sequence[str]) -> HierarchyLayout:
+        """Group indices for `sensor_ids`; cached, since the sensor list rarely changes between cycles."""
+        key = tuple(sensor_ids)
+        layout = self._layouts.get(key)
+        if layout is None:
+            room_ids, sensor_room = np.unique(np.array([self.room(sensor_id) for sensor_id in key], dtype=str), return_inverse=True)
+            floor_ids, room_floor = np.unique(np.array([self.floor(room) for room in room_ids], dtype=str), return_inverse=True)
+            building_ids, floor_building = np.unique(
+                np.array([self.building(floor) for floor in floor_ids], dtype=str), return_inverse=True
+            )
+            layout = HierarchyLayout(room_ids, sensor_room, floor_ids, room_floor, building_ids, floor_building)
+            # Only the current sensor list is worth keeping.
+            self._layouts = {key: layout}
+        return layout
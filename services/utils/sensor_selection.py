@@ -0,0 +1,35 @@
+from typing import Dict, Iterable, List, Optional
+
+
+def resolve_sensor_selection(
+    sensor_id: Optional[str],
+    sensor_ids: Optional[Iterable[str]],
+    group: Optional[str],
+    sensor_groups: Dict[str, List[str]],
+) -> Optional[List[str]]:
+    """Combine the sensor filters of a request into one ordered, de-duplicated list.
+
+    `sensor_ids` entries may themselves be comma separated. Returns None when no
+    filter was given (all sensors); raises ValueError for an unknown group or an
+    empty selection.
+    """
+    if not sensor_id and not sensor_ids and not group:
+        return None
+    selected: List[str] = []
+    if sensor_id:
+        selected.append(sensor_id)
+    for entry in sensor_ids or []:
+        selected.extend(part.strip() for part in entry.split(",") if part.strip())
+    if group:
+        try:
+            selected.extend(sensor_groups[group])
+        except KeyError:
+            raise ValueError(f"Unknown sensor group: {group}") from None
+    if not selected:
+        raise ValueError("No sensors selected")
+    return list(dict.fromkeys(selected))
+
+
+def selection_key(sensor_ids: Optional[List[str]]) -> str:
+    """Stable cache key fragment for a selection; `*` stands for all sensors."""
+    return ",".join(sorted(sensor_ids)) if sensor_ids is not None else "*"
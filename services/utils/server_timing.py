@@ -0,0 +1,75 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Per-request stage durations in seconds; None outside of a request handled by the middleware.
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("server_timings", default=None)
+_lock = threading.Lock()
+
+
+def record(name: str, duration_seconds: float) -> None:
+    """Add a stage duration to the current request; repeated stages are summed."""
+    timings = _timings.get()
+    if timings is not None:
+        # Stages of one request may finish concurrently on pool threads.
+        with _lock:
+            timings[name] = timings.get(name, 0.0) + duration_seconds
+
+
+def format_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+def parse_header(value: Optional[str]) -> List[Tuple[str, float]]:
+    """Parse `Server-Timing` entries into (name, seconds); entries without `dur` are skipped."""
+    entries: List[Tuple[str, float]] = []
+    if not value:
+        return entries
+    for metric in value.split(","):
+        name, *params = (part.strip() for part in metric.split(";"))
+        for param in params:
+            key, _, raw = param.partition("=")
+            if key.strip().lower() == "dur":
+                try:
+                    entries.append((name, float(raw.strip().strip('"')) / 1000))
+                except ValueError:
+                    pass
+                break
+    return entries
+
+
+def record_remote(prefix: str, header_value: Optional[str]) -> None:
+    """Merge timings reported by a downstream service under `prefix-<name>`."""
+    for name, seconds in parse_header(header_value):
+        record(f"{prefix}-{name}", seconds)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware attaching collected stage durations as a `Server-Timing` header."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                entries = dict(timings)
+                entries["total"] = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", format_header(entries).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
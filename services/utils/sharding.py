@@ -0,0 +1,61 @@
+import bisect
+import hashlib
+import re
+import socket
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+_ORDINAL_SUFFIX = re.compile(r"-(\d+)$")
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring assigning sensor ids to a fixed number of shards.
+
+    Producer replicas and the model consumer build the same ring from the shard
+    count alone, so both sides agree on ownership without coordination.
+    """
+
+    def __init__(self, shard_count: int, virtual_nodes: int = 64) -> None:
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1")
+        self.shard_count = shard_count
+        points = sorted(
+            (_hash(f"shard-{shard}#{replica}"), shard)
+            for shard in range(shard_count)
+            for replica in range(virtual_nodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> int:
+        if self.shard_count == 1:
+            return 0
+        idx = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._shards[idx]
+
+    def owned_by(self, shard: int, keys: Iterable[str]) -> List[str]:
+        return [key for key in keys if self.shard_for(key) == shard]
+
+    def partition(self, keys: Iterable[str]) -> Dict[int, List[str]]:
+        parts: Dict[int, List[str]] = defaultdict(list)
+        for key in keys:
+            parts[self.shard_for(key)].append(key)
+        return dict(parts)
+
+
+def resolve_shard_index(shard_index: Optional[int], shard_count: int) -> int:
+    """Use the configured index or derive it from a StatefulSet hostname like `feature-producer-2`."""
+    if shard_count <= 1:
+        return 0
+    if shard_index is None:
+        match = _ORDINAL_SUFFIX.search(socket.gethostname())
+        if match is None:
+            raise ValueError("shard_index is not set and cannot be derived from the hostname")
+        shard_index = int(match.group(1))
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index {shard_index} is outside of 0..{shard_count - 1}")
+    return shard_index
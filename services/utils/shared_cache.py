@@ -0,0 +1,350 @@
+import errno
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from ..settings import Settings, get_settings
+from . import deadline
+from .deadline import DeadlineExceeded
+from .metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"HMSCACHE"
+_LAYOUT_VERSION = 2
+# magic, layout version, slot count, slot size
+_FILE_HEADER = struct.Struct("<8sIIQ")
+# seq, key hash, expires at (epoch seconds), payload length
+_SLOT_HEADER = struct.Struct("<QQdI4x")
+_SEQ = struct.Struct("<Q")
+_READ_RETRIES = 5
+# Slots a key may occupy; an entry is only evicted by keys written after it to the same set.
+_WAYS = 4
+# Refresh locks are byte-range locks past the end of the file, one byte per stripe.
+_REFRESH_STRIPES = 1024
+# How often a request waiting for another worker's refresh checks the lock and its deadline.
+_LOCK_POLL_SECONDS = 0.01
+
+
+def _private_directory(path: str) -> str:
+    """Create `path` if needed and make sure only the service's user can write into it.
+
+    The cache is unpickled and the locks elect who writes it, so files another
+    user could plant in the directory must be ruled out before anything is opened.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise PermissionError(f"{path} must be a directory owned and only writable by uid {os.getuid()}")
+    return path
+
+
+def _open_owned(path: str) -> int:
+    """Open or create a regular file of the service's user that no one else can write, without following links."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600)
+    info = os.fstat(fd)
+    if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        os.close(fd)
+        raise PermissionError(f"{path} must be a regular file owned and only writable by uid {os.getuid()}")
+    return fd
+
+
+def _key_hash(key: str) -> int:
+    # Python's hash() is salted per process, so workers would disagree on slots.
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big") or 1
+
+
+class SharedCache:
+    """Fixed-size cache in an mmap'd file shared by all worker processes of a service.
+
+    The slots form sets of `_WAYS`; a key lives in any slot of the set its hash
+    picks and replaces the entry written longest ago, so a burst of one-off keys
+    needs several writes to push out a hot entry. Readers never lock: each slot
+    carries a sequence number that a writer makes odd while it updates the slot (a
+    seqlock), so a reader that raced a write retries. Writes to a set are
+    serialized with a short `lockf` lock on its slots. Refreshes are serialized
+    per key (striped over `_REFRESH_STRIPES` lock bytes), so when an entry expires
+    exactly one worker recomputes it while the others keep serving the stale value.
+    """
+
+    def __init__(self, path: str, slot_count: int = 32, slot_size: int = 1 << 20, ttl_seconds: float = 15.0) -> None:
+        if slot_size <= _SLOT_HEADER.size:
+            raise ValueError(f"slot_size must be larger than {_SLOT_HEADER.size} bytes")
+        self.path = path
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.ttl_seconds = ttl_seconds
+        self.set_count = max(1, slot_count // _WAYS)
+        self._size = _FILE_HEADER.size + slot_count * slot_size
+        self._fd = self._open()
+        self._mm = mmap.mmap(self._fd, self._size)
+        # lockf locks belong to the process, so threads of one worker also need local locks.
+        self._set_locks = [threading.Lock() for _ in range(self.set_count)]
+        self._refresh_locks = [threading.Lock() for _ in range(_REFRESH_STRIPES)]
+
+    def _open(self) -> int:
+        """Open the cache file, first replacing it when it is new or has another layout."""
+        expected = _FILE_HEADER.pack(_MAGIC, _LAYOUT_VERSION, self.slot_count, self.slot_size)
+        while True:
+            fd = _open_owned(self.path)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX, _FILE_HEADER.size, 0)
+                try:
+                    # Another worker may have replaced the file while we waited for the lock.
+                    if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                        if os.pread(fd, _FILE_HEADER.size, 0) == expected:
+                            return fd
+                        self._replace(expected)
+                finally:
+                    fcntl.lockf(fd, fcntl.LOCK_UN, _FILE_HEADER.size, 0)
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+    def _replace(self, header: bytes) -> None:
+        # A new file renamed over the old one: truncating a file other workers still
+        # have mapped would make their next access raise SIGBUS.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path), suffix=".tmp")
+        try:
+            # Reserve the pages now: a full tmpfs then fails here instead of raising SIGBUS on a later write.
+            os.posix_fallocate(fd, 0, self._size)
+            os.pwrite(fd, header, 0)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        finally:
+            os.close(fd)
+        logger.info("Initialized shared cache %s (%d slots of %d bytes)", self.path, self.slot_count, self.slot_size)
+
+    def _offset(self, slot: int) -> int:
+        return _FILE_HEADER.size + slot * self.slot_size
+
+    def _set_of(self, key_hash: int) -> int:
+        return key_hash % self.set_count
+
+    def _slots(self, set_index: int) -> range:
+        # The last set also takes the slots left over when slot_count is not a multiple of _WAYS.
+        first = set_index * _WAYS
+        last = first + _WAYS if set_index < self.set_count - 1 else self.slot_count
+        return range(first, last)
+
+    def _read(self, slot: int, key_hash: int) -> Tuple[Optional[bytes], float]:
+        offset = self._offset(slot)
+        for _ in range(_READ_RETRIES):
+            seq, stored_hash, expires_at, length = _SLOT_HEADER.unpack_from(self._mm, offset)
+            if seq % 2:
+                time.sleep(0)
+                continue
+            if stored_hash != key_hash:
+                return None, 0.0
+            start = offset + _SLOT_HEADER.size
+            data = self._mm[start:start + length]
+            if _SEQ.unpack_from(self._mm, offset)[0] == seq:
+                return data, expires_at
+        return None, 0.0
+
+    def _write(self, slot: int, key_hash: int, data: bytes, expires_at: float) -> None:
+        offset = self._offset(slot)
+        seq = _SEQ.unpack_from(self._mm, offset)[0]
+        _SEQ.pack_into(self._mm, offset, seq + 1)
+        _SLOT_HEADER.pack_into(self._mm, offset, seq + 1, key_hash, expires_at, len(data))
+        start = offset + _SLOT_HEADER.size
+        self._mm[start:start + len(data)] = data
+        _SEQ.pack_into(self._mm, offset, seq + 2)
+
+    def _victim(self, set_index: int, key_hash: int) -> int:
+        """The key's own slot in the set, else an empty one, else the one written longest ago."""
+        oldest, oldest_expiry = -1, float("inf")
+        for slot in self._slots(set_index):
+            _, stored_hash, expires_at, _ = _SLOT_HEADER.unpack_from(self._mm, self._offset(slot))
+            if stored_hash == key_hash:
+                return slot
+            if stored_hash == 0:
+                expires_at = float("-inf")
+            if expires_at < oldest_expiry:
+                oldest, oldest_expiry = slot, expires_at
+        return oldest
+
+    def get(self, key: str) -> Tuple[Any, bool]:
+        """Return (value, fresh); value is None when the key is not cached."""
+        key_hash = _key_hash(key)
+        for slot in self._slots(self._set_of(key_hash)):
+            data, expires_at = self._read(slot, key_hash)
+            if data is not None:
+                break
+        else:
+            return None, False
+        try:
+            value = pickle.loads(data)
+        except Exception as exc:
+            logger.warning("Dropping unreadable shared cache entry %s: %s", key, exc)
+            return None, False
+        return value, time.time() < expires_at
+
+    def put(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """Store a value, replacing the entry written longest ago in the key's set if it is full."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.slot_size - _SLOT_HEADER.size:
+            logger.warning("Not caching %s: %d bytes exceed the slot size of %d", key, len(data), self.slot_size)
+            return False
+        key_hash = _key_hash(key)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        set_index = self._set_of(key_hash)
+        slots = self._slots(set_index)
+        start, length = self._offset(slots[0]), len(slots) * self.slot_size
+        with self._set_locks[set_index]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                self._write(self._victim(set_index, key_hash), key_hash, data, time.time() + ttl)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+        return True
+
+    def _acquire(self, stripe: int, blocking: bool) -> bool:
+        """Take a refresh lock; a blocking wait gives up at the request deadline with `DeadlineExceeded`."""
+        left = deadline.remaining() if blocking else 0.0
+        local = self._refresh_locks[stripe]
+        if not local.acquire(timeout=-1 if left is None else max(left, 0.0)):
+            if blocking:
+                raise DeadlineExceeded("shared_cache")
+            return False
+        try:
+            if left is None:
+                # No deadline to honour: wait for the other worker's refresh however long it takes.
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._size + stripe)
+                return True
+            while True:
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, self._size + stripe)
+                    return True
+                except OSError as exc:
+                    if exc.errno not in (errno.EACCES, errno.EAGAIN):
+                        raise
+                left = deadline.remaining() if blocking else 0.0
+                if left is None or left <= 0:
+                    break
+                time.sleep(min(_LOCK_POLL_SECONDS, left))
+        except BaseException:
+            local.release()
+            raise
+        local.release()
+        if blocking:
+            raise DeadlineExceeded("shared_cache")
+        return False
+
+    def _release(self, stripe: int) -> None:
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._size + stripe)
+        self._refresh_locks[stripe].release()
+
+    def get_or_refresh(self, key: str, compute: Callable[[], Any], cache: str = "default") -> Any:
+        """Return the cached value, recomputing it in exactly one worker once it expired.
+
+        While another worker refreshes an expired entry the stale value is returned;
+        without any value the caller waits for that refresh instead of repeating it,
+        at most until its request deadline.
+        """
+        value, fresh = self.get(key)
+        if fresh:
+            CACHE_REQUESTS.labels(cache=cache, result="hit").inc()
+            return value
+        stripe = _key_hash(key) % _REFRESH_STRIPES
+        if not self._acquire(stripe, blocking=value is None):
+            CACHE_REQUESTS.labels(cache=cache, result="stale").inc()
+            return value
+        try:
+            # Another worker may have refreshed the entry while we waited for the lock.
+            value, fresh = self.get(key)
+            if fresh:
+                CACHE_REQUESTS.labels(cache=cache, result="hit").inc()
+                return value
+            CACHE_REQUESTS.labels(cache=cache, result="miss").inc()
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            self._release(stripe)
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+
+class LeaderLock:
+    """Elects one worker process of a pod to run a background job.
+
+    The leader holds an exclusive `lockf` lock on the file for as long as it
+    lives; the kernel drops it when that process exits, so the next worker that
+    calls `try_acquire` takes over.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd = _open_owned(path)
+        self._lock = threading.Lock()
+        self.held = False
+
+    def try_acquire(self) -> bool:
+        """Return True if this process is (or just became) the leader."""
+        with self._lock:
+            if not self.held:
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self.held = True
+                    logger.info("Took over leader lock %s in process %d", self.path, os.getpid())
+                except OSError:
+                    pass
+            return self.held
+
+    def close(self) -> None:
+        """Give up leadership; closing the file drops the lock for the other workers."""
+        with self._lock:
+            if self._fd < 0:
+                return
+            os.close(self._fd)
+            self._fd = -1
+            if self.held:
+                self.held = False
+                logger.info("Released leader lock %s in process %d", self.path, os.getpid())
+
+
+def open_leader_lock(name: str, settings: Optional[Settings] = None) -> Optional[LeaderLock]:
+    """Open the pod-wide leader lock `name` next to the shared cache, or None when the directory is unusable."""
+    settings = settings or get_settings()
+    path = os.path.join(settings.shared_cache_dir, f"hm-sense-{name}.lock")
+    try:
+        _private_directory(settings.shared_cache_dir)
+        return LeaderLock(path)
+    except OSError as exc:
+        logger.warning("Leader lock %s unavailable, every worker runs %s itself: %s", path, name, exc)
+        return None
+
+
+def open_shared_cache(name: str, settings: Optional[Settings] = None) -> Optional[SharedCache]:
+    """Open the service's shared cache, or return None when caching is disabled or unavailable."""
+    settings = settings or get_settings()
+    if settings.shared_cache_ttl_seconds <= 0:
+        return None
+    path = os.path.join(settings.shared_cache_dir, f"hm-sense-{name}.cache")
+    try:
+        _private_directory(settings.shared_cache_dir)
+        return SharedCache(
+            path,
+            slot_count=settings.shared_cache_slots,
+            slot_size=settings.shared_cache_slot_bytes,
+            ttl_seconds=settings.shared_cache_ttl_seconds,
+        )
+    except OSError as exc:
+        logger.warning("Shared cache %s unavailable, continuing without it: %s", path, exc)
+        return None
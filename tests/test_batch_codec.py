@@ -0,0 +1,96 @@
+import io
+import random
+
+import numpy as np
+import pytest
+
+from services.entities.sensor import Sensor
+from services.feature_producer.batch_codec import BatchCodec
+from services.feature_producer.measurement_parser import MEASUREMENT_TYPES
+
+
+def _value(rng: random.Random):
+    kind = rng.random()
+    if kind < 0.2:
+        return None
+    if kind < 0.5:
+        # Fixed precision, including negative zero and large magnitudes.
+        return rng.choice([0.0, -0.0, 1e12, -3.5]) if rng.random() < 0.1 else round(rng.uniform(-1e4, 1e4), rng.randint(0, 6))
+    if kind < 0.6:
+        return rng.choice([float("inf"), float("-inf"), 5e-324, 1.7976931348623157e308])
+    return rng.uniform(-1e6, 1e6)
+
+
+def _sensors(rng: random.Random):
+    sensors = []
+    for sensor_idx in range(rng.randint(1, 4)):
+        sensor_id = rng.choice(["a", "sensor-ü", "x" * 40]) + str(sensor_idx)
+        timestamp = rng.randint(-10**6, 2 * 10**9)
+        for _ in range(rng.randint(1, 40)):
+            sensors.append(
+                Sensor(
+                    sensor_id=sensor_id,
+                    timestamp=timestamp,
+                    schema_version=rng.choice([1, 2]),
+                    **{kind: _value(rng) for kind in MEASUREMENT_TYPES},
+                )
+            )
+            # Irregular gaps, repeated timestamps and the occasional large jump.
+            timestamp += rng.choice([0, 1, 60, 61, rng.randint(0, 10**6)])
+    rng.shuffle(sensors)
+    return sensors
+
+
+def _key(sensor: Sensor):
+    return sensor.sensor_id, sensor.schema_version, sensor.timestamp
+
+
+def _same(decoded, expected) -> None:
+    assert len(decoded) == len(expected)
+    # The codec sorts stably per (sensor, schema version), so repeated timestamps keep their order.
+    for got, want in zip(sorted(decoded, key=_key), sorted(expected, key=_key)):
+        assert _key(got) == _key(want)
+        for kind in MEASUREMENT_TYPES:
+            got_value, want_value = getattr(got, kind), getattr(want, kind)
+            if want_value is None:
+                assert got_value is None
+            else:
+                # Bit for bit, so -0.0 and the extremes survive as well.
+                assert np.float64(got_value).tobytes() == np.float64(want_value).tobytes()
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_round_trip(seed):
+    rng = random.Random(seed)
+    sensors = _sensors(rng)
+    codec = BatchCodec(frame_rows=rng.choice([1, 3, 16, 4096]), max_decimals=rng.randint(0, 6))
+    _same(codec.decode(codec.encode(sensors)), sensors)
+
+    stream = io.BytesIO()
+    codec.write(sensors, stream)
+    stream.seek(0)
+    _same([sensor for series in codec.iter_series(stream) for sensor in series.to_sensors()], sensors)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_filtered_decode_matches_filtered_input(seed):
+    rng = random.Random(seed)
+    sensors = _sensors(rng)
+    codec = BatchCodec(frame_rows=rng.choice([1, 5, 4096]))
+    # Concatenated batches decode like one.
+    payload = codec.encode(sensors[: len(sensors) // 2]) + codec.encode(sensors[len(sensors) // 2:])
+    timestamps = sorted(sensor.timestamp for sensor in sensors)
+    start, end = sorted(rng.choice(timestamps) + rng.randint(-5, 5) for _ in range(2))
+    sensor_ids = rng.sample(sorted({sensor.sensor_id for sensor in sensors}), 1)
+    expected = [sensor for sensor in sensors if start <= sensor.timestamp <= end and sensor.sensor_id in sensor_ids]
+    _same(codec.decode(payload, start=start, end=end, sensor_ids=sensor_ids), expected)
+
+
+def test_corrupt_frame_is_rejected():
+    codec = BatchCodec()
+    payload = bytearray(codec.encode([Sensor(sensor_id="a", timestamp=1, co2=400.0)]))
+    payload[-1] ^= 0xFF
+    with pytest.raises(ValueError):
+        codec.decode(bytes(payload))
+    with pytest.raises(ValueError):
+        codec.decode(bytes(payload[:10]))
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from services.model_consumer.batch_endpoint import BatchScorer, ndjson_chunks
+
+
+class _Predictor:
+    feature_cols = ["co2"]
+    state_labels = ["empty", "occupied"]
+
+    def predict_values(self, values):
+        probs = np.column_stack([1.0 - values[:, 0] / 1000.0, values[:, 0] / 1000.0])
+        return probs.argmax(axis=1), probs
+
+
+async def _body(lines):
+    for line in lines:
+        yield line
+
+
+def _score(lines, chunk_rows=2):
+    scorer = BatchScorer(_Predictor(), chunk_rows=chunk_rows, workers=1)
+
+    async def scenario():
+        sensor_ids, error = [], None
+        try:
+            async for part in scorer.score(ndjson_chunks(_body(lines), scorer.predictor.feature_cols, chunk_rows)):
+                sensor_ids += [json.loads(line)["sensor_id"] for line in part.splitlines()]
+        except ValueError as exc:
+            error = exc
+        return sensor_ids, error
+
+    return asyncio.run(scenario())
+
+
+def _line(idx, co2=500.0):
+    return (json.dumps({"sensor_id": f"s{idx}", "timestamp": idx, "co2": co2}) + "\n").encode()
+
+
+def test_results_keep_input_order():
+    sensor_ids, error = _score([_line(idx) for idx in range(7)])
+    assert error is None
+    assert sensor_ids == [f"s{idx}" for idx in range(7)]
+
+
+def test_failed_chunk_ends_the_stream_before_later_chunks():
+    lines = [_line(idx) for idx in range(8)]
+    lines[2] = _line(2, co2="not a number")
+    sensor_ids, error = _score(lines)
+    assert isinstance(error, ValueError)
+    # The chunk with the bad row and every chunk after it are missing; the stream is a prefix of the input.
+    assert sensor_ids == ["s0", "s1"]
+
+
+def test_invalid_input_still_yields_the_results_before_it():
+    scorer = BatchScorer(_Predictor(), chunk_rows=2, workers=1)
+
+    async def chunks():
+        for start in (0, 2):
+            yield np.array([f"s{start}", f"s{start + 1}"], dtype=object), np.array([start, start + 1]), np.full((2, 1), 500.0)
+        raise ValueError("Non-finite feature values")
+
+    async def scenario():
+        parts = []
+        with pytest.raises(ValueError):
+            async for part in scorer.score(chunks()):
+                parts.append(part)
+        return [json.loads(line)["sensor_id"] for part in parts for line in part.splitlines()]
+
+    assert asyncio.run(scenario()) == ["s0", "s1", "s2", "s3"]
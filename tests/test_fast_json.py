@@ -0,0 +1,58 @@
+import warnings
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.json_responses import _PRODUCER_URL, _StaticAdapter, _latest_vectors
+from services.entities.sensor import Sensor
+from services.feature_producer import feature_endpoint
+from services.feature_producer.api_client import APIClient
+from services.feature_producer.app import app as producer_app
+from services.feature_producer.featurizer import Featurizer
+from services.model_consumer import prediction_endpoint
+from services.model_consumer.app import app as consumer_app
+from services.model_consumer.feature_vector_client import FeatureVectorClient
+from services.model_consumer.model_consumer import HMMPredictor
+from services.settings import get_settings
+from services.utils.fast_json import FastJSONResponse
+
+
+@pytest.fixture
+def settings():
+    settings = get_settings()
+    yield settings
+    settings.fast_json_responses = False
+    producer_app.dependency_overrides.clear()
+    consumer_app.dependency_overrides.clear()
+
+
+def _bodies(settings, fast: bool):
+    settings.fast_json_responses = fast
+    vectors = _latest_vectors(20)
+    producer_endpoint = feature_endpoint.FeatureEndpoint(APIClient(base_url="http://upstream.invalid"), Featurizer())
+    producer_endpoint.cached_vectors = lambda **kwargs: vectors
+    producer_app.dependency_overrides[feature_endpoint.get_endpoint] = lambda: producer_endpoint
+    produced = TestClient(producer_app).get("/api/feature-vectors")
+
+    client = FeatureVectorClient(base_url=_PRODUCER_URL, settings=settings)
+    client.session.mount(_PRODUCER_URL, _StaticAdapter(produced.content))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        endpoint = prediction_endpoint.PredictionEndpoint(client, HMMPredictor())
+    consumer_app.dependency_overrides[prediction_endpoint.get_endpoint] = lambda: endpoint
+    predicted = TestClient(consumer_app).get("/predictions", params={"end": 1_717_408_800})
+    assert produced.status_code == predicted.status_code == 200
+    return produced.content, predicted.content
+
+
+def test_fast_path_is_byte_identical(settings):
+    validated = _bodies(settings, fast=False)
+    fast = _bodies(settings, fast=True)
+    assert b'"current_sensors":[{' in validated[0]
+    assert fast == validated
+
+
+def test_fast_response_honours_alias_setting():
+    sensor = Sensor(sensorId="R1.006", timestamp=1_717_408_800, co2=612.0)
+    assert b'"sensorId":"R1.006"' in FastJSONResponse(sensor).body
+    assert b'"sensor_id":"R1.006"' in FastJSONResponse(sensor, by_alias=False).body
@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from services.entities.feature_matrix import FeatureMatrix
+from services.model_consumer.feature_vector_client import FeatureEndpointError, FeatureVectorClient
+from services.settings import Settings
+from services.utils import deadline
+from services.utils.deadline import DeadlineExceeded
+
+_SHARD_URLS = ["http://shard-0.invalid/api", "http://shard-1.invalid/api"]
+
+
+def _body(shard: int) -> bytes:
+    record = {"sensor_id": f"sensor-{shard}", "timestamp": 1_717_408_800, "schema_version": 1}
+    record.update({col: float(shard) for col in FeatureMatrix.columns_for(1)})
+    partial = {"sensor_id": f"sensor-{shard}", "timestamp": 1_717_408_800, "window_minutes": [120, 180]}
+    return json.dumps({"feature_vectors": [record], "current_sensors": [], "partial_windows": [partial]}).encode()
+
+
+class _ShardAdapter(requests.adapters.BaseAdapter):
+    """Answers like a producer replica, computing whichever partition `?shard=` asks for."""
+
+    def __init__(self, delay: float = 0.0, statuses=None, unreachable: bool = False) -> None:
+        super().__init__()
+        self.delay = delay
+        # Status answered per partition; partitions not listed succeed.
+        self.statuses = statuses or {}
+        self.unreachable = unreachable
+
+    def send(self, request, **kwargs) -> requests.Response:
+        time.sleep(self.delay)
+        if self.unreachable:
+            raise requests.exceptions.ConnectionError("connection refused")
+        shard = int(parse_qs(urlsplit(request.url).query)["shard"][0])
+        response = requests.Response()
+        response.status_code = self.statuses.get(shard, 200)
+        response._content = _body(shard) if response.status_code == 200 else b'{"detail": "failed"}'
+        response.url = request.url
+        response.request = request
+        return response
+
+
+def _client(*adapters: requests.adapters.BaseAdapter) -> FeatureVectorClient:
+    """A client of both shards; with one adapter both replicas answer alike."""
+    client = FeatureVectorClient(settings=Settings(feature_endpoint_shard_urls=_SHARD_URLS))
+    for url, adapter in zip(_SHARD_URLS, adapters * len(_SHARD_URLS)):
+        client.session.mount(url, adapter)
+    return client
+
+
+def test_scatter_gathers_every_shard():
+    result = _client(_ShardAdapter()).fetch_feature_vectors()
+    assert sorted(result.feature_matrix.sensor_ids.tolist()) == ["sensor-0", "sensor-1"]
+    # Every shard's partial-window report is carried into the merged result.
+    assert sorted((report.sensor_id, report.window_minutes) for report in result.partial_windows) == [
+        ("sensor-0", [120, 180]),
+        ("sensor-1", [120, 180]),
+    ]
+
+
+def test_concurrent_requests_do_not_queue_behind_each_other():
+    client = _client(_ShardAdapter(delay=0.2))
+    barrier = threading.Barrier(4)
+
+    def fetch():
+        barrier.wait()
+        return client.fetch_feature_vectors()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as requests_pool:
+        results = list(requests_pool.map(lambda _: fetch(), range(4)))
+    # Four requests of two shard calls each; a pool of one thread per shard would take four rounds.
+    assert time.monotonic() - started < 0.6
+    assert all(len(result.feature_matrix) == 2 for result in results)
+
+
+@pytest.mark.parametrize("status", [400, 422])
+def test_client_errors_fail_the_request(status):
+    with pytest.raises(FeatureEndpointError) as raised:
+        _client(_ShardAdapter(statuses={1: status})).fetch_feature_vectors()
+    assert raised.value.status_code == status
+
+
+def test_partition_without_data_is_empty():
+    result = _client(_ShardAdapter(statuses={1: 404})).fetch_feature_vectors()
+    assert result.feature_matrix.sensor_ids.tolist() == ["sensor-0"]
+
+
+@pytest.mark.parametrize("adapters", [
+    # Shard 1 is unreachable and shard 0 fails to compute its partition.
+    (_ShardAdapter(statuses={1: 503}), _ShardAdapter(unreachable=True)),
+    # Both replicas fail shard 1's partition with a server error.
+    (_ShardAdapter(statuses={1: 500}),),
+])
+def test_unavailable_shard_is_served_as_a_partial_result(adapters):
+    result = _client(*adapters).fetch_feature_vectors()
+    assert result.feature_matrix.sensor_ids.tolist() == ["sensor-0"]
+
+
+def test_server_error_after_the_deadline_fails_the_request():
+    client = _client(_ShardAdapter(delay=0.05, statuses={1: 504}))
+    token = deadline.deadline_var.set(time.monotonic() + 0.08)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            client.fetch_feature_vectors()
+    finally:
+        deadline.deadline_var.reset(token)
@@ -0,0 +1,106 @@
+import random
+
+import numpy as np
+import pytest
+
+from benchmarks.payload_generator import PayloadConfig, PayloadGenerator
+from services.entities.feature_matrix import FeatureMatrix
+from services.entities.sensor import Sensor
+from services.feature_producer.featurizer import Featurizer
+from services.feature_producer.measurement_parser import flatten_measurements
+
+
+def _history(interval_seconds: int):
+    config = PayloadConfig(sensor_count=3, window_seconds=12 * 3600, interval_seconds=interval_seconds)
+    sensors = flatten_measurements(PayloadGenerator(config).generate())
+    rng = random.Random(interval_seconds)
+    # Gaps, repeated timestamps and missing readings, which the windows must handle like the per-row path.
+    gaps = [sensor for idx, sensor in enumerate(sensors) if idx % 11]
+    repeats = [
+        Sensor(**{**sensor.model_dump(), "co2": None if rng.random() < 0.5 else sensor.co2, "humidity": None})
+        for sensor in sensors[::7]
+    ]
+    return gaps + repeats, config.end - config.window_seconds + 3 * 3600, config.end
+
+
+def _per_row(featurizer: Featurizer, sensors, start: int, end: int) -> FeatureMatrix:
+    """Reference: `_build_features` on an explicitly sliced window per row."""
+    columns = FeatureMatrix.columns_for(1)
+    sensor_ids, timestamps, rows = [], [], []
+    for sensor_id, series, df, current in featurizer._series_frames(sensors):
+        series_ts = df["timestamp"].to_numpy()
+        window_starts = np.searchsorted(series_ts, series_ts - featurizer.max_lookback_seconds, side="left")
+        for idx in np.flatnonzero((series_ts >= start) & (series_ts <= end)):
+            features = featurizer._build_features(series[idx], df.iloc[window_starts[idx]:idx + 1], current[idx])
+            sensor_ids.append(sensor_id)
+            timestamps.append(series[idx].timestamp)
+            rows.append([features[col] for col in columns])
+    return featurizer._to_matrix(sensor_ids, timestamps, rows)
+
+
+@pytest.mark.parametrize("imputation", Featurizer.IMPUTATIONS)
+@pytest.mark.parametrize("interval_seconds", [60, 300])
+def test_history_matches_per_row_features(interval_seconds, imputation):
+    featurizer = Featurizer(imputation=imputation)
+    sensors, start, end = _history(interval_seconds)
+    expected = _per_row(featurizer, sensors, start, end)
+    matrix = featurizer.extract_history(sensors, start, end)
+    assert len(matrix) == len(expected) > 0
+    assert list(matrix.sensor_ids) == list(expected.sensor_ids)
+    assert np.array_equal(matrix.timestamps, expected.timestamps)
+    # Rolling variance differs from the two-pass one in the last digits.
+    np.testing.assert_allclose(matrix.values, expected.values, rtol=1e-6, atol=1e-5)
+
+
+def test_history_outside_range_is_empty():
+    sensors, start, _ = _history(300)
+    assert len(Featurizer().extract_history(sensors, 0, start - 4 * 3600)) == 0
+
+
+def test_missing_readings_and_empty_windows_are_zero():
+    start = 1_700_000_000
+    # co2 was last reported 90 minutes ago: the current reading and the 60-minute co2 window have no value.
+    sensors = [Sensor(sensor_id="a", timestamp=start, co2=800.0, temperature=21.0, humidity=40.0, motion=1.0)]
+    sensors += [
+        Sensor(sensor_id="a", timestamp=start + minutes * 60, temperature=21.0, humidity=40.0, motion=1.0)
+        for minutes in range(60, 91, 10)
+    ]
+    sensors.append(Sensor(sensor_id="b", timestamp=start, temperature=20.0))
+    featurizer = Featurizer()
+    for matrix in (featurizer.extract_matrix(sensors), featurizer.extract_history(sensors, start + 90 * 60, start + 90 * 60)):
+        columns = list(matrix.columns)
+        values = {sensor_id: dict(zip(columns, row)) for sensor_id, row in zip(matrix.sensor_ids, matrix.values.tolist())}
+        assert np.isfinite(matrix.values).all()
+        assert values["a"]["co2"] == values["a"]["avg_co2_60m"] == values["a"]["max_co2_60m"] == 0.0
+        assert values["a"]["temperature"] == values["a"]["avg_temperature"] == 21.0
+    matrix = featurizer.extract_matrix(sensors)
+    current = dict(zip(matrix.columns, matrix.values[list(matrix.sensor_ids).index("b")].tolist()))
+    assert current["humidity"] == current["avg_humidity_60m"] == current["std_humidity"] == 0.0
+
+
+def test_carry_forward_fills_from_the_latest_reading_in_the_look_back():
+    start = 1_700_000_000
+    # co2 was last reported 90 minutes ago: the current reading carries it, the 60-minute levels fall back to it.
+    sensors = [Sensor(sensor_id="a", timestamp=start, co2=800.0, temperature=21.0, humidity=40.0, motion=1.0)]
+    sensors += [
+        Sensor(sensor_id="a", timestamp=start + minutes * 60, temperature=21.0, humidity=40.0, motion=1.0)
+        for minutes in range(60, 91, 10)
+    ]
+    # Sensor b's only co2 reading is older than the look-back, so nothing is carried across it or from sensor a.
+    sensors += [
+        Sensor(sensor_id="b", timestamp=start - 4 * 3600, co2=600.0),
+        Sensor(sensor_id="b", timestamp=start + 90 * 60, temperature=20.0),
+    ]
+    featurizer = Featurizer(imputation="carry_forward")
+    for matrix in (featurizer.extract_matrix(sensors), featurizer.extract_history(sensors, start + 90 * 60, start + 90 * 60)):
+        columns = list(matrix.columns)
+        values = {sensor_id: dict(zip(columns, row)) for sensor_id, row in zip(matrix.sensor_ids, matrix.values.tolist())}
+        assert np.isfinite(matrix.values).all()
+        assert values["a"]["co2"] == values["a"]["avg_co2_60m"] == values["a"]["max_co2_60m"] == 800.0
+        assert values["a"]["std_co2_60m"] == values["a"]["delta_60m_co2"] == values["a"]["residual_co2"] == 0.0
+        assert values["b"]["co2"] == values["b"]["avg_co2_60m"] == values["b"]["humidity"] == 0.0
+
+
+def test_unknown_imputation_is_rejected():
+    with pytest.raises(ValueError):
+        Featurizer(imputation="mean")
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from services.model_consumer.model_consumer import HMMPredictor
+
+hmm = pytest.importorskip("hmmlearn.hmm")
+
+
+def _predictor(startprob, means):
+    model = hmm.GaussianHMM(n_components=len(startprob), covariance_type="diag")
+    model.startprob_ = np.asarray(startprob, dtype=np.float64)
+    model.transmat_ = np.full((len(startprob), len(startprob)), 1.0 / len(startprob))
+    model.n_features = len(means[0])
+    model.means_ = np.asarray(means, dtype=np.float64)
+    model.covars_ = np.ones_like(model.means_)
+    predictor = HMMPredictor.__new__(HMMPredictor)
+    predictor._scaler = type("Identity", (), {"transform": staticmethod(lambda values: values)})()
+    predictor._model = model
+    predictor._state_label_map = {}
+    predictor._feature_cols = ["co2"]
+    return predictor
+
+
+def test_scores_match_the_posterior_of_a_single_observation():
+    predictor = _predictor([0.3, 0.7], [[0.0], [2.0]])
+    observations = np.array([[-1.0], [0.9], [3.0]])
+    states, probs = predictor.predict_values(observations)
+    for row, observation in enumerate(observations):
+        np.testing.assert_allclose(probs[row], predictor._model.predict_proba(observation[None, :])[0])
+    assert states.tolist() == [0, 1, 1]
+
+
+def test_rows_only_unstartable_states_emit_fall_back_to_emissions():
+    # The squared distance to states 0 and 2 overflows, so only state 1 (which cannot start) emits the first row.
+    predictor = _predictor([1.0, 0.0, 0.0], [[0.0], [1e160], [-1e160]])
+    states, probs = predictor.predict_values(np.array([[1e160], [0.0]]))
+    assert np.isfinite(probs).all()
+    assert states.tolist() == [1, 0]
+    np.testing.assert_allclose(probs.sum(axis=1), 1.0)
+
+
+def test_rows_no_state_can_emit_are_uniform():
+    predictor = _predictor([1.0, 0.0], [[0.0], [-1e160]])
+    _, probs = predictor.predict_values(np.array([[1e160]]))
+    np.testing.assert_allclose(probs, [[0.5, 0.5]])
+
+
+def test_shipped_model_was_trained_with_zero_imputation():
+    assert HMMPredictor("model").feature_imputation == "zero"
+
+
+def test_endpoint_refuses_a_model_trained_with_another_imputation(monkeypatch):
+    from services.model_consumer import prediction_endpoint
+    from services.settings import Settings
+
+    monkeypatch.setattr(prediction_endpoint, "get_settings", lambda: Settings(feature_imputation="carry_forward"))
+    with pytest.raises(ValueError, match="carry_forward"):
+        prediction_endpoint.get_endpoint.__wrapped__()
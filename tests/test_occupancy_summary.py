@@ -0,0 +1,43 @@
+import asyncio
+
+from services.entities.occupancy_summary import OccupancySummary
+from services.model_consumer.occupancy_summary import OccupancySummaryCache
+
+
+def _cache(calls):
+    def compute():
+        calls.append(1)
+        return OccupancySummary(computed_at=len(calls), sensor_count=0, state_labels=[], buildings=[], floors=[], rooms=[])
+
+    return OccupancySummaryCache(compute, refresh_seconds=0.02, idle_seconds=0.1)
+
+
+def test_refresh_loop_stops_when_idle_and_restarts_on_request():
+    calls = []
+
+    async def scenario():
+        cache = _cache(calls)
+        await cache.body(None)
+        await asyncio.sleep(0.3)
+        assert cache._task is None
+        stopped_at = len(calls)
+        await asyncio.sleep(0.1)
+        assert len(calls) == stopped_at
+        await cache.body("room")
+        assert cache._task is not None and len(calls) > stopped_at
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_the_refresh_loop():
+    calls = []
+
+    async def scenario():
+        cache = _cache(calls)
+        await cache.body(None)
+        task = cache._task
+        await cache.close()
+        assert task.cancelled() and cache._task is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,30 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.utils import readiness
+from services.utils.readiness import Readiness
+
+
+def test_failed_warm_up_is_retried_until_ready(monkeypatch):
+    attempts = []
+
+    def warm_up():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FileNotFoundError("model not mounted yet")
+
+    state = Readiness(budget_seconds=60, retry_seconds=0.01, max_retry_seconds=0.02)
+    monkeypatch.setattr(readiness, "get_readiness", lambda: state)
+    app = FastAPI()
+    app.include_router(readiness.router)
+    state.start(warm_up)
+    assert state.wait(timeout=5)
+    assert len(attempts) == 3 and state.detail is None
+    assert TestClient(app).get("/ready").json()["status"] == "ready"
+
+
+def test_failure_is_reported_while_retrying():
+    state = Readiness(budget_seconds=60, retry_seconds=10)
+    state.start(lambda: (_ for _ in ()).throw(RuntimeError("upstream down")))
+    assert not state.wait(timeout=0.2)
+    assert state.status == "failed" and state.detail == "RuntimeError: upstream down"
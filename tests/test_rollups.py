@@ -0,0 +1,174 @@
+import multiprocessing
+import random
+
+import numpy as np
+import pytest
+
+from services.entities.sensor import Sensor
+from services.feature_producer import aggregate_endpoint
+from services.feature_producer.rollups import ROLLUP_LEVELS, RollupStore, bucket_statistics
+from services.settings import get_settings
+from services.utils.shared_cache import LeaderLock
+
+_START = 1_700_000_000
+_SPAN = 3 * 86400
+
+
+def _measurements(rng: random.Random):
+    """Readings of two sensors with irregular gaps; every reading lacks some measurement types."""
+    sensors = []
+    for sensor_id in ("a", "b"):
+        timestamp = _START + rng.randint(0, 3600)
+        while timestamp < _START + _SPAN:
+            sensors.append(
+                Sensor(
+                    sensor_id=sensor_id,
+                    timestamp=timestamp,
+                    co2=round(rng.uniform(400, 2000), 1) if rng.random() < 0.8 else None,
+                    temperature=rng.gauss(21, 2) if rng.random() < 0.5 else None,
+                )
+            )
+            timestamp += rng.choice([1, 30, 59, 60, 61, 900, rng.randint(1, 7200)])
+    return sensors
+
+
+def _ingest_in_chunks(store: RollupStore, sensors, rng: random.Random) -> None:
+    """Ingest like the background fetch: time-ordered chunks that overlap the previous one."""
+    cursor = _START
+    while cursor < _START + _SPAN:
+        until = cursor + rng.randint(60, 6 * 3600)
+        overlap = rng.randint(0, 3600)
+        chunk = [sensor for sensor in sensors if cursor - overlap <= sensor.timestamp < until]
+        rng.shuffle(chunk)
+        store.ingest(chunk)
+        cursor = until
+
+
+def _brute_force(sensors, sensor_id, kind, start, end, step):
+    samples = sorted(
+        (sensor.timestamp, getattr(sensor, kind))
+        for sensor in sensors
+        if sensor.sensor_id == sensor_id and getattr(sensor, kind) is not None and start <= sensor.timestamp < end
+    )
+    groups = {}
+    for timestamp, value in samples:
+        groups.setdefault(start if step is None else timestamp // step * step, []).append(value)
+    expected = {}
+    for group, values in groups.items():
+        values = np.array(values)
+        expected[group] = {
+            "count": len(values),
+            "sum": values.sum(),
+            "min": values.min(),
+            "max": values.max(),
+            "first": values[0],
+            "last": values[-1],
+            "mean": values.mean(),
+            "std": values.std(ddof=1) if len(values) > 1 else 0.0,
+        }
+    return expected
+
+
+def _assert_matches(store: RollupStore, sensors, start, end, step) -> None:
+    plan = store.plan(start, end, step)
+    for sensor_id in ("a", "b"):
+        for kind in ("co2", "temperature", "humidity"):
+            starts, rows = store.query(plan, sensor_id, kind)
+            expected = _brute_force(sensors, sensor_id, kind, plan.start, plan.end, step)
+            assert starts.tolist() == sorted(expected)
+            statistics = bucket_statistics(rows)
+            for idx, group in enumerate(starts.tolist()):
+                for name, value in expected[group].items():
+                    # The running sums lose a few digits against the two-pass numpy results.
+                    assert statistics[name][idx] == pytest.approx(value, rel=1e-9, abs=1e-6), (group, name)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_queries_match_brute_force(seed):
+    rng = random.Random(seed)
+    sensors = _measurements(rng)
+    store = RollupStore()
+    _ingest_in_chunks(store, sensors, rng)
+    for _ in range(20):
+        start = _START + rng.randint(-3600, _SPAN)
+        end = start + rng.randint(1, _SPAN)
+        # Whole-range buckets mix all levels at the edges; steps are served from the coarsest dividing level.
+        _assert_matches(store, sensors, start, end, None)
+        _assert_matches(store, sensors, start, end, rng.choice([60, 120, 900, 1800, 3600, 7200, 86400]))
+
+
+def test_window_statistics_match_brute_force():
+    rng = random.Random(7)
+    sensors = _measurements(rng)
+    store = RollupStore()
+    _ingest_in_chunks(store, sensors, rng)
+    end = _START + _SPAN // 2 + 37
+    plan, statistics = store.window_statistics(["a", "b", "missing"], "co2", end, 4 * 3600)
+    for idx, sensor_id in enumerate(["a", "b"]):
+        (expected,) = _brute_force(sensors, sensor_id, "co2", plan.start, plan.end, None).values()
+        for name, value in expected.items():
+            assert statistics[name][idx] == pytest.approx(value, rel=1e-9, abs=1e-6)
+    assert statistics["count"][2] == 0 and np.isnan(statistics["mean"][2])
+
+
+def test_snapshot_round_trip_continues_ingesting(tmp_path):
+    rng = random.Random(3)
+    sensors = _measurements(rng)
+    middle = _START + _SPAN // 2
+    store = RollupStore()
+    store.ingest([sensor for sensor in sensors if sensor.timestamp < middle])
+    path = str(tmp_path / "rollups" / "rollups.npz")
+    store.save(path)
+
+    restored = RollupStore()
+    assert restored.load(path)
+    assert restored.bucket_count() == store.bucket_count()
+    assert restored.latest_timestamp == store.latest_timestamp
+    for level in ROLLUP_LEVELS:
+        assert restored._series[level].keys() == store._series[level].keys()
+        for key, (starts, rows) in store._series[level].items():
+            assert np.array_equal(restored._series[level][key][0], starts)
+            assert np.array_equal(restored._series[level][key][1], rows)
+    # The restored watermarks skip what the snapshot already holds.
+    assert restored.ingest([sensor for sensor in sensors if sensor.timestamp < middle]) == 0
+    restored.ingest(sensors)
+    _assert_matches(restored, sensors, _START, _START + _SPAN, 900)
+    _assert_matches(restored, sensors, _START + 123, _START + _SPAN - 45, None)
+
+
+def test_missing_or_foreign_snapshot_is_ignored(tmp_path):
+    store = RollupStore()
+    assert not store.load(str(tmp_path / "missing.npz"))
+    junk = tmp_path / "junk.npz"
+    junk.write_bytes(b"not an archive")
+    assert not store.load(str(junk))
+    assert store.bucket_count() == 0
+
+
+def _try_lock(path: str) -> bool:
+    return LeaderLock(path).try_acquire()
+
+
+def test_stopping_rollups_ends_ingestion_and_hands_over_the_lock(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "rollup_snapshot_path", str(tmp_path / "rollups.npz"))
+    monkeypatch.setattr(settings, "shared_cache_dir", str(tmp_path / "hm-sense"))
+    monkeypatch.setattr(settings, "rollup_refresh_seconds", 0.01)
+    monkeypatch.setattr(aggregate_endpoint, "_fetch_owned", lambda start, end: [])
+    aggregate_endpoint.stop_rollups()
+    aggregate_endpoint.start_rollups()
+    ingestion, leader = aggregate_endpoint.get_rollups(), aggregate_endpoint._rollups_leader()
+    thread = ingestion._thread
+    try:
+        assert thread.is_alive()
+        assert leader.try_acquire()
+    finally:
+        aggregate_endpoint.stop_rollups()
+    assert not thread.is_alive()
+    assert not leader.held
+    # Another worker process can take over once this one is gone.
+    with multiprocessing.get_context("spawn").Pool(1) as other_worker:
+        assert other_worker.apply(_try_lock, (leader.path,))
+    # A reload starts over with a fresh ingestion.
+    assert aggregate_endpoint.get_rollups() is not ingestion
+    aggregate_endpoint.stop_rollups()
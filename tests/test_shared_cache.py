@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from services.settings import Settings
+from services.utils import deadline
+from services.utils.deadline import DeadlineExceeded
+from services.utils.shared_cache import (
+    _REFRESH_STRIPES,
+    _WAYS,
+    LeaderLock,
+    SharedCache,
+    _key_hash,
+    open_leader_lock,
+    open_shared_cache,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SharedCache(str(tmp_path / "test.cache"), slot_count=8, slot_size=4096, ttl_seconds=60)
+    yield cache
+    cache.close()
+
+
+def _keys_in_set(cache: SharedCache, set_index: int, count: int):
+    keys = (f"vectors:{n}" for n in range(100_000))
+    return [key for key in keys if cache._set_of(_key_hash(key)) == set_index][:count]
+
+
+def test_hot_entry_survives_fewer_new_keys_than_ways(cache):
+    hot, *others = _keys_in_set(cache, 0, _WAYS + 1)
+    cache.put(hot, "latest")
+    for key in others[:_WAYS - 1]:
+        cache.put(key, key)
+    assert cache.get(hot) == ("latest", True)
+    # Rewriting the hot entry makes the next one-off key evict the oldest other entry instead.
+    cache.put(hot, "latest")
+    cache.put(others[-1], "one-off")
+    assert cache.get(hot) == ("latest", True)
+    assert cache.get(others[0]) == (None, False)
+    assert all(cache.get(key)[0] == key for key in others[1:_WAYS - 1])
+
+
+def test_overwrite_keeps_one_slot(cache):
+    key, *others = _keys_in_set(cache, 1, _WAYS)
+    for value in range(5):
+        cache.put(key, value)
+    for other in others:
+        cache.put(other, other)
+    assert cache.get(key) == (4, True)
+
+
+def test_get_or_refresh_computes_once(cache):
+    calls = []
+    compute = lambda: calls.append(1) or "value"  # noqa: E731
+    assert cache.get_or_refresh("predictions:latest", compute) == "value"
+    assert cache.get_or_refresh("predictions:latest", compute) == "value"
+    assert len(calls) == 1
+
+
+def test_layout_change_replaces_file_without_truncating(cache):
+    cache.put("predictions:latest", "old layout")
+    inode = os.stat(cache.path).st_ino
+    resized = SharedCache(cache.path, slot_count=16, slot_size=4096, ttl_seconds=60)
+    try:
+        assert os.stat(cache.path).st_ino != inode
+        assert resized.get("predictions:latest") == (None, False)
+        # A worker still on the old layout keeps its intact mapping instead of hitting SIGBUS.
+        assert cache.get("predictions:latest") == ("old layout", True)
+        resized.put("predictions:latest", "new layout")
+        reopened = SharedCache(cache.path, slot_count=16, slot_size=4096, ttl_seconds=60)
+        # The same layout reuses the file and its entries.
+        assert reopened.get("predictions:latest") == ("new layout", True)
+        reopened.close()
+    finally:
+        resized.close()
+
+
+def _hold_refresh_lock(cache: SharedCache, key: str, held, release) -> None:
+    stripe = _key_hash(key) % _REFRESH_STRIPES
+    cache._acquire(stripe, blocking=True)
+    held.set()
+    release.wait(10)
+    cache._release(stripe)
+
+
+def _hold_in_process(path: str, key: str, held, release) -> None:
+    _hold_refresh_lock(SharedCache(path, slot_count=8, slot_size=4096, ttl_seconds=60), key, held, release)
+
+
+@pytest.mark.parametrize("other_process", [False, True])
+def test_waiting_for_a_refresh_ends_at_the_deadline(cache, other_process):
+    key = "vectors:latest"
+    if other_process:
+        context = multiprocessing.get_context("spawn")
+        held, release = context.Event(), context.Event()
+        holder = context.Process(target=_hold_in_process, args=(cache.path, key, held, release))
+    else:
+        held, release = threading.Event(), threading.Event()
+        holder = threading.Thread(target=_hold_refresh_lock, args=(cache, key, held, release))
+    holder.start()
+    try:
+        assert held.wait(30)
+        token = deadline.deadline_var.set(time.monotonic() + 0.1)
+        try:
+            started = time.monotonic()
+            with pytest.raises(DeadlineExceeded):
+                cache.get_or_refresh(key, lambda: "value")
+            assert time.monotonic() - started < 1.0
+        finally:
+            deadline.deadline_var.reset(token)
+    finally:
+        release.set()
+        holder.join(10)
+    # Once the other refresh is done the lock is free again.
+    assert cache.get_or_refresh(key, lambda: "value") == "value"
+
+
+def test_private_directory_is_created_owner_only(tmp_path):
+    directory = tmp_path / "hm-sense"
+    cache = open_shared_cache("test", Settings(shared_cache_dir=str(directory)))
+    assert cache is not None
+    cache.close()
+    assert directory.stat().st_mode & 0o777 == 0o700
+    assert os.stat(cache.path).st_mode & 0o777 == 0o600
+
+
+def test_writable_by_others_directory_is_refused(tmp_path):
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    directory.chmod(0o1777)
+    settings = Settings(shared_cache_dir=str(directory))
+    assert open_shared_cache("test", settings) is None
+    assert open_leader_lock("test", settings) is None
+    assert not any(directory.iterdir())
+
+
+@pytest.mark.parametrize("opener", [lambda path: SharedCache(path, slot_count=8, slot_size=4096), LeaderLock])
+def test_planted_files_are_refused(tmp_path, opener):
+    planted = tmp_path / "planted"
+    planted.write_bytes(b"")
+    planted.chmod(0o666)
+    with pytest.raises(PermissionError):
+        opener(str(planted))
+    link = tmp_path / "link"
+    link.symlink_to(tmp_path / "target")
+    with pytest.raises(OSError):
+        opener(str(link))
+    assert not (tmp_path / "target").exists()
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason="planting another user's file needs root")
+def test_file_of_another_user_is_refused(tmp_path):
+    planted = tmp_path / "hm-sense-test.cache"
+    planted.write_bytes(b"")
+    os.chown(planted, 65534, 65534)
+    with pytest.raises(PermissionError):
+        SharedCache(str(planted), slot_count=8, slot_size=4096)